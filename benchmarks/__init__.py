@@ -0,0 +1,51 @@
+"""Benchmarks for the hot paths of sensebook.
+
+Run from the repository root with `python -m benchmarks`, see `--help`.
+"""
+
+import attr
+import gc
+import timeit
+
+from typing import Any, Callable, Dict, List, Optional
+
+
+@attr.s(slots=True, kw_only=True, frozen=True)
+class Benchmark:
+    name = attr.ib(type=str)
+    #: Called once, returns the function to time
+    setup = attr.ib(type=Callable[[], Callable[[], Any]])
+    #: The size of the input, to report throughput
+    size = attr.ib(None, type=Optional[int])
+
+
+BENCHMARKS = []  # type: List[Benchmark]
+
+
+def benchmark(name: str, *, size: Optional[int] = None):
+    """Register a benchmark. The decorated function returns the function to time."""
+
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name=name, setup=setup, size=size))
+        return setup
+
+    return register
+
+
+def run(bench: Benchmark, *, repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    func = bench.setup()
+    timer = timeit.Timer(func)
+    # Find a number of calls which take at least `min_time`
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    gc.collect()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    result = {"seconds": best, "calls": number, "repeat": repeat}
+    if bench.size is not None:
+        result["bytes"] = bench.size
+        result["bytes_per_second"] = bench.size / best
+    return result
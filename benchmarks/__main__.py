@@ -0,0 +1,61 @@
+"""Run the benchmarks, and write the results as JSON.
+
+python -m benchmarks --output new.json --compare old.json [PATTERN ...]
+"""
+
+import argparse
+import fnmatch
+import json
+import platform
+import sys
+
+import sensebook
+
+from . import BENCHMARKS, run
+from . import pull, url, login, imports  # Register the benchmarks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("patterns", nargs="*", help="Only run matching benchmarks")
+    parser.add_argument("-o", "--output", help="Write the results to this file")
+    parser.add_argument("-c", "--compare", help="Compare with earlier results")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for bench in BENCHMARKS:
+        if args.patterns and not any(
+            fnmatch.fnmatch(bench.name, pattern) for pattern in args.patterns
+        ):
+            continue
+        result = results[bench.name] = run(bench, repeat=args.repeat)
+        line = "{:<28} {:>12.2f} us".format(bench.name, result["seconds"] * 1e6)
+        if bench.name in baseline:
+            # Positive means slower than the baseline
+            change = result["seconds"] / baseline[bench.name]["seconds"] - 1
+            line += "  {:>+7.1%}".format(change)
+        print(line, file=sys.stderr)
+
+    output = {
+        "sensebook": sensebook.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+if __name__ == "__main__":
+    main()
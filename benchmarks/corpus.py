@@ -0,0 +1,119 @@
+"""Synthetic, but realistically shaped, data for the benchmarks."""
+
+import json
+import random
+
+from typing import Any, Dict, List
+
+_WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def new_message(rng: random.Random, i: int, *, words: int = 12) -> Dict[str, Any]:
+    """A `NewMessage` delta, as found in the `ms` array of a `msg` pull frame."""
+    thread_id = str(rng.randrange(10 ** 15, 10 ** 16))
+    actor_id = str(rng.randrange(10 ** 14, 10 ** 15))
+    return {
+        "type": "delta",
+        "iseq": i,
+        "delta": {
+            "attachments": [],
+            "body": text(rng, words),
+            "irisSeqId": str(i),
+            "messageMetadata": {
+                "actorFbId": actor_id,
+                "folderId": {"systemFolderId": "INBOX"},
+                "messageId": "mid.$" + "{:032x}".format(rng.getrandbits(128)),
+                "offlineThreadingId": str(rng.getrandbits(63)),
+                "skipBumpThread": False,
+                "tags": ["source:messenger:web"],
+                "threadKey": {"otherUserFbId": thread_id},
+                "threadReadStateEffect": 1,
+                "timestamp": str(1542333064162 + i * 1000),
+            },
+            "requestContext": {"apiArgs": {}},
+            "class": "NewMessage",
+        },
+    }
+
+
+def typing(rng: random.Random, i: int) -> Dict[str, Any]:
+    return {
+        "type": "typ",
+        "from": rng.randrange(10 ** 14, 10 ** 15),
+        "st": i % 2,
+        "to": rng.randrange(10 ** 14, 10 ** 15),
+    }
+
+
+def frames(n: int, *, seed: int = 0, words: int = 12) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        new_message(rng, i, words=words) if i % 4 else typing(rng, i)
+        for i in range(n)
+    ]
+
+
+def msg(n: int, *, seq: int = 1, **kwargs: Any) -> Dict[str, Any]:
+    return {"t": "msg", "seq": seq, "ms": frames(n, **kwargs)}
+
+
+def batched(batches: int, per_batch: int, **kwargs: Any) -> Dict[str, Any]:
+    return {
+        "t": "batched",
+        "batches": [msg(per_batch, seq=i, seed=i, **kwargs) for i in range(batches)],
+    }
+
+
+def body(data: Dict[str, Any]) -> bytes:
+    """Encode pull data like Facebook's servers do."""
+    return b"for(;;);" + json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def graphql_batch(queries: int, messages: int) -> bytes:
+    """A `graphqlbatch` response, with a thread of `messages` deltas per query."""
+    parts = [
+        json.dumps(
+            {"q{}".format(i): {"response": {"message_thread": frames(messages)}}},
+            separators=(",", ":"),
+        )
+        for i in range(queries)
+    ]
+    stats = {"successful_results": queries, "error_results": 0, "skipped_results": 0}
+    parts.append(json.dumps(stats))
+    return b"for (;;);" + "\r\n".join(parts).encode("utf-8")
+
+
+def login_page(*, filler: int = 200) -> str:
+    """A mobile login page, with `filler` blocks of unrelated markup."""
+    rng = random.Random(0)
+    blocks = [
+        '<div class="x{}"><span>{}</span><a href="/p/{}">{}</a></div>'.format(
+            i, text(rng, 8), i, text(rng, 2)
+        )
+        for i in range(filler)
+    ]
+    half = len(blocks) // 2
+    return """<!DOCTYPE html><html><head><title>Facebook</title>
+<script>require("ServerJSDefine").handleDefines([["SiteData",[],{{"server_revision":4567890,"client_revision":4567890,"tier":""}}]]);</script>
+</head><body>{}
+<form method="post" action="https://m.facebook.com/login/device-based/regular/login/?refsrc=https%3A%2F%2Fm.facebook.com%2F&amp;lwv=100" class="be bf" id="login_form" novalidate="1">
+<input type="hidden" name="lsd" value="AVqAE5Wf" autocomplete="off" />
+<input type="hidden" name="jazoest" value="2710" autocomplete="off" />
+<input type="hidden" name="m_ts" value="1542333064" />
+<input type="hidden" name="li" value="iDDvW_bnkmEp0rq6" />
+<input type="hidden" name="try_number" value="0" />
+<input type="hidden" name="unrecognized_tries" value="0" />
+<input autocorrect="off" autocapitalize="off" class="bl bm bn" autocomplete="on" id="m_login_email" name="email" type="text" />
+<input autocorrect="off" autocapitalize="off" class="bl bm bo bp" autocomplete="on" name="pass" type="password" />
+<input value="Log In" type="submit" name="login" class="n t o bq br bs" />
+<input value="Create New Account" type="submit" name="sign_up" class="n t o bz br ca" />
+</form>{}
+<input type="hidden" name="fb_dtsg" value="AQHx7c2bJ5dE:AQFv3cJ8SgCx" autocomplete="off" />
+<script>bigPipe.onPageletArrive({{"content":"<form><input type=\\"hidden\\" name=\\"h\\" value=\\"AfeDRK0nPbBmDL3q\\"></form>"}});</script>
+</body></html>""".format(
+        "\n".join(blocks[:half]), "\n".join(blocks[half:])
+    )
@@ -0,0 +1,164 @@
+"""End to end benchmark of a driver, against `sensebook.testing.FakePullServer`.
+
+The server runs in its own process, so it doesn't compete with the driver for the
+GIL. Reports frames per second, and percentiles of the latency from the server
+sending a frame to the driver's `on_frame` callback.
+
+python -m benchmarks.e2e --driver aio --clients 100 --duration 10 [--fault 503=0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import threading
+import time
+
+from typing import Any, Dict, List
+
+import sensebook
+import sensebook.testing
+
+
+def _serve(options: Dict[str, Any], conn) -> None:
+    server = sensebook.testing.FakePullServer(**options)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(server.start())
+    conn.send(server.port)
+    loop.run_forever()
+
+
+def percentile(values: List[float], p: float) -> float:
+    """The `p`th percentile of the sorted values, by the nearest rank."""
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Collector:
+    def __init__(self) -> None:
+        self.latencies = []  # type: List[float]
+        self.errors = 0
+
+    def on_frame(self, *args: Any) -> None:
+        frame = args[-1]
+        self.latencies.append(time.monotonic() - frame["sent"])
+
+    def on_error(self, *args: Any) -> None:
+        self.errors += 1
+
+
+def run_aio(server, clients: int, duration: float, collector: Collector) -> None:
+    import sensebook.aio
+
+    async def main():
+        pool = server.connection_pool(max_idle=clients)
+        tasks = [
+            asyncio.ensure_future(
+                sensebook.aio.run(
+                    server.handler(),
+                    pool,
+                    on_frame=collector.on_frame,
+                    on_error=collector.on_error,
+                )
+            )
+            for _ in range(clients)
+        ]
+        await asyncio.sleep(duration)
+        pending = set(tasks)
+        while pending:
+            # `asyncio.wait_for` may swallow a cancellation, before Python 3.12
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=0.1)
+        pool.close()
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def run_sync(server, clients: int, duration: float, collector: Collector) -> None:
+    import sensebook.sync
+
+    pool = sensebook.sync.SessionPool(max_connections=clients)
+    stop = threading.Event()
+    threading.Timer(duration, stop.set).start()
+    sensebook.sync.run_many(
+        {i: server.handler() for i in range(clients)},
+        pool,
+        on_frame=collector.on_frame,
+        on_error=collector.on_error,
+        stop=stop,
+    )
+    pool.close()
+
+
+DRIVERS = {"aio": run_aio, "sync": run_sync}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.e2e")
+    parser.add_argument("--driver", choices=sorted(DRIVERS), default="aio")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--interval", type=float, default=0.0)
+    parser.add_argument("--frames", type=int, default=1)
+    parser.add_argument("--payload-size", type=int, default=64)
+    parser.add_argument("--batched", type=float, default=0.0)
+    parser.add_argument(
+        "--fault",
+        type=sensebook.testing._parse_fault,
+        action="append",
+        default=[],
+        metavar="NAME=PROBABILITY",
+    )
+    args = parser.parse_args(argv)
+
+    options = {
+        "interval": args.interval,
+        "frames_per_response": args.frames,
+        "payload_size": args.payload_size,
+        "batched": args.batched,
+        "faults": dict(args.fault),
+        "seed": 0,
+    }
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(options, child), daemon=True)
+    process.start()
+    try:
+        server = sensebook.testing.FakePullServer(port=parent.recv())
+        collector = Collector()
+        start = time.monotonic()
+        DRIVERS[args.driver](server, args.clients, args.duration, collector)
+        elapsed = time.monotonic() - start
+    finally:
+        process.terminate()
+        process.join()
+
+    latencies = sorted(collector.latencies)
+    output = {
+        "driver": args.driver,
+        "clients": args.clients,
+        "server": options,
+        "seconds": elapsed,
+        "frames": len(latencies),
+        "frames_per_second": len(latencies) / elapsed,
+        "errors": collector.errors,
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else float("nan"),
+        },
+    }
+    json.dump(output, sys.stdout, indent=2, sort_keys=True)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import importlib
+import sys
+
+from . import benchmark
+
+
+def _purge():
+    for name in list(sys.modules):
+        if name.split(".")[0] in ("sensebook", "bs4", "soupsieve"):
+            del sys.modules[name]
+
+
+def _import(use):
+    def func():
+        _purge()
+        sensebook = importlib.import_module("sensebook")
+        use(sensebook)
+
+    return func
+
+
+@benchmark("import/pull")
+def import_pull():
+    def use(sensebook):
+        sensebook.PullHandler().next_request()
+        assert "bs4" not in sys.modules
+
+    return _import(use)
+
+
+@benchmark("import/parse_form")
+def import_parse_form():
+    return _import(lambda sensebook: sensebook.parse_form("<form action='/'>"))
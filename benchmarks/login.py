@@ -0,0 +1,35 @@
+import sensebook
+
+from . import benchmark, corpus
+
+PAGE = corpus.login_page()
+
+
+@benchmark("parse_form", size=len(PAGE))
+def parse_form():
+    return lambda: sensebook.parse_form(PAGE)
+
+
+@benchmark("get_revision", size=len(PAGE))
+def get_revision():
+    return lambda: sensebook._login.get_revision(PAGE)
+
+
+@benchmark("get_fb_dtsg", size=len(PAGE))
+def get_fb_dtsg():
+    return lambda: sensebook._login.get_fb_dtsg(PAGE)
+
+
+@benchmark("get_logout_h", size=len(PAGE))
+def get_logout_h():
+    return lambda: sensebook._login.get_logout_h(PAGE)
+
+
+@benchmark("extract_form", size=len(PAGE))
+def extract_form():
+    return lambda: sensebook.extract_form(PAGE)
+
+
+@benchmark("get_tokens", size=len(PAGE))
+def get_tokens():
+    return lambda: sensebook._login.get_tokens(PAGE)
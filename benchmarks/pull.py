@@ -0,0 +1,194 @@
+import json
+import pickle
+import sensebook
+
+from . import benchmark, corpus
+
+SMALL = corpus.body(corpus.msg(1))
+LARGE = corpus.body(corpus.msg(500, words=40))
+BATCHED = corpus.body(corpus.batched(20, 10))
+
+
+@benchmark("parse_body/small", size=len(SMALL))
+def parse_body_small():
+    return lambda: sensebook._pull_handler.parse_body(SMALL)
+
+
+@benchmark("parse_body/large", size=len(LARGE))
+def parse_body_large():
+    return lambda: sensebook._pull_handler.parse_body(LARGE)
+
+
+@benchmark("parse_body/batched", size=len(BATCHED))
+def parse_body_batched():
+    return lambda: sensebook._pull_handler.parse_body(BATCHED)
+
+
+@benchmark("ParseOffloader/unpickle-large", size=len(LARGE))
+def offload_unpickle_large():
+    # What the caller still pays for an offloaded body, compare to parse_body/large
+    data = pickle.dumps(sensebook._pull_handler.parse_body(LARGE))
+    return lambda: pickle.loads(data)
+
+
+def _handle(body, **kwargs):
+    handler = sensebook.PullHandler(**kwargs)
+    return lambda: list(handler.handle(200, body))
+
+
+@benchmark("handle/small", size=len(SMALL))
+def handle_small():
+    return _handle(SMALL)
+
+
+@benchmark("handle/large", size=len(LARGE))
+def handle_large():
+    return _handle(LARGE)
+
+
+@benchmark("handle/batched", size=len(BATCHED))
+def handle_batched():
+    return _handle(BATCHED)
+
+
+@benchmark("handle/small+metrics", size=len(SMALL))
+def handle_small_metrics():
+    return _handle(SMALL, metrics=sensebook.InMemoryMetrics())
+
+
+@benchmark("handle/batched+metrics", size=len(BATCHED))
+def handle_batched_metrics():
+    return _handle(BATCHED, metrics=sensebook.InMemoryMetrics())
+
+
+def _handle_data(data):
+    handler = sensebook.PullHandler()
+    return lambda: list(handler.handle_data(data))
+
+
+@benchmark("handle_data/heartbeat")
+def handle_data_heartbeat():
+    return _handle_data({"t": "heartbeat"})
+
+
+@benchmark("handle_data/msg")
+def handle_data_msg():
+    return _handle_data(corpus.msg(1))
+
+
+@benchmark("handle_data/msg_large")
+def handle_data_msg_large():
+    return _handle_data(corpus.msg(500, words=40))
+
+
+@benchmark("handle_data/msg_large+dedup")
+def handle_data_msg_large_dedup():
+    handler = sensebook.PullHandler(dedup=sensebook.Deduplicator())
+    data = corpus.msg(500, words=40)
+    return lambda: list(handler.handle_data(data))
+
+
+@benchmark("handle_data/batched")
+def handle_data_batched():
+    return _handle_data(corpus.batched(20, 10))
+
+
+@benchmark("PullHandler.snapshot")
+def snapshot():
+    handler = sensebook.PullHandler(sticky_token="1234", sticky_pool="abc", seq=1234)
+    return handler.snapshot
+
+
+@benchmark("PullHandler.restore")
+def restore():
+    handler = sensebook.PullHandler(sticky_token="1234", sticky_pool="abc", seq=1234)
+    data = handler.snapshot()
+    return lambda: handler.restore(data)
+
+
+@benchmark("write_checkpoints/10000")
+def write_checkpoints():
+    import os
+    import tempfile
+
+    handlers = {str(i): sensebook.PullHandler(seq=i) for i in range(10000)}
+    path = os.path.join(tempfile.mkdtemp(), "checkpoints")
+    return lambda: sensebook.write_checkpoints(path, handlers)
+
+
+@benchmark("replay/100", size=100 * len(BATCHED))
+def replay():
+    import os
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "recording")
+    recorder = sensebook.Recorder(handler=sensebook.PullHandler(), path=path)
+    for _ in range(100):
+        list(recorder.handle(200, BATCHED))
+    recorder.close()
+    handlers = [sensebook.PullHandler()]
+    return lambda: sensebook.replay(path, handlers)
+
+
+@benchmark("handle_data/msg_large+typed")
+def handle_data_msg_large_typed():
+    handler = sensebook.PullHandler(typed_frames=True)
+    data = corpus.msg(500, words=40)
+    return lambda: [
+        frame.author_id
+        for frame in handler.handle_data(data)
+        if isinstance(frame, sensebook.Typing)
+    ]
+
+
+@benchmark("handle/batched+incremental", size=len(BATCHED))
+def handle_batched_incremental():
+    return _handle(BATCHED, incremental=True)
+
+
+GRAPHQL_BATCH = corpus.graphql_batch(50, 20)
+
+
+@benchmark("GraphQLBatchRequest.parse/50", size=len(GRAPHQL_BATCH))
+def graphql_batch_parse():
+    batcher = sensebook.GraphQLBatcher()
+    for i in range(50):
+        batcher.catch_up(str(i))
+    [request] = batcher.requests()
+    return lambda: request.parse(GRAPHQL_BATCH)
+
+
+FRAMES = corpus.frames(500, words=40)
+
+
+@benchmark("rows/500")
+def rows():
+    # The conversion `FrameColumns` replaces, with a `datetime` per message
+    def row(frame):
+        if frame["type"] != "delta":
+            return {"type": frame["type"], "actor_id": int(frame["from"])}
+        metadata = frame["delta"]["messageMetadata"]
+        thread_key = metadata["threadKey"]
+        return {
+            "type": frame["delta"]["class"],
+            "timestamp": sensebook.time_from_millis(metadata["timestamp"]),
+            "thread_id": int(
+                thread_key.get("threadFbId") or thread_key["otherUserFbId"]
+            ),
+            "actor_id": int(metadata["actorFbId"]),
+            "payload": json.dumps(frame),
+        }
+
+    return lambda: [row(frame) for frame in FRAMES]
+
+
+@benchmark("FrameColumns.extend/500")
+def frame_columns_extend():
+    columns = sensebook.FrameColumns()
+    return lambda: (columns.extend(FRAMES), columns.flush())
+
+
+@benchmark("FrameColumns.extend/500+payloads")
+def frame_columns_extend_payloads():
+    columns = sensebook.FrameColumns(payloads=True)
+    return lambda: (columns.extend(FRAMES), columns.flush())
@@ -0,0 +1,38 @@
+import sensebook
+
+from . import benchmark
+
+PARAMS = {
+    "clientid": "1a2b3c4d",
+    "sticky_token": "1234",
+    "sticky_pool": "atn2c06_chatproxy-regional",
+    "msgs_recv": 0,
+    "seq": 1234,
+    "state": "active",
+}
+
+
+@benchmark("build_url")
+def build_url():
+    host = sensebook.PullRequest.host
+    target = sensebook.PullRequest.target
+    return lambda: sensebook.build_url(host=host, target=target, params=PARAMS)
+
+
+@benchmark("PullRequest.url")
+def pull_request_url():
+    handler = sensebook.PullHandler(
+        clientid=PARAMS["clientid"],
+        sticky_token=PARAMS["sticky_token"],
+        sticky_pool=PARAMS["sticky_pool"],
+        seq=PARAMS["seq"],
+    )
+    return lambda: handler.next_request().url
+
+
+@benchmark("RequestTemplate.url")
+def request_template_url():
+    template = sensebook.RequestTemplate(
+        sensebook.PullRequest.host, sensebook.PullRequest.target, PARAMS, ["seq"]
+    )
+    return lambda: template.url(PARAMS)
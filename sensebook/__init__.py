@@ -1,20 +1,89 @@
 """Making sense of Facebooks undocumented API."""
 
+import importlib
+import sys
+
 from ._utils import (
     default_user_agent,
     parse_form,
+    extract_form,
     build_url,
     strip_json_cruft,
+    strip_json_cruft_bytes,
     load_json,
+    set_json_backend,
+    JSON_BACKENDS,
     time_from_millis,
     random_hex,
     safe_status_code,
 )
-from ._abc import State, Request
-
-from ._login import LoginError
+from ._abc import State, Request, RequestTemplate
 from ._pull_handler import ProtocolError, Backoff, PullRequest, PullHandler
+from ._multiplexer import PullMultiplexer
+from ._coordinator import BackoffCoordinator
+from ._timeouts import AdaptiveTimeouts
+from ._dedup import Deduplicator, frame_key
+from ._frames import (
+    Frame,
+    DeltaFrame,
+    NewMessage,
+    Typing,
+    FRAME_TYPES,
+    DELTA_TYPES,
+    frame_type,
+    wrap_frame,
+    wrap_frames,
+)
+from ._metrics import Metrics, InMemoryMetrics
+from ._checkpoint import (
+    dump_checkpoints,
+    load_checkpoints,
+    write_checkpoints,
+    read_checkpoints,
+    restore_checkpoints,
+)
+from ._cache import StateData, StateCache, FileStateCache, SQLiteStateCache
+from ._replay import Record, Recorder, ReplayStats, iter_recording, replay
+from ._graphql import (
+    GraphQLQuery,
+    GraphQLBatchRequest,
+    GraphQLBatchResult,
+    GraphQLBatcher,
+    thread_messages_query,
+    parse_batch_response,
+)
+from ._columns import ColumnBatch, FrameColumns, TYPE_CODES
 
 __version__ = "0.2.0"
 
+#: Attributes loaded on first access, so e.g. pull workers don't pay for importing
+#: the login code or `multiprocessing`. Maps the name to the module defining it, or
+#: `None` for modules
+_LAZY = {
+    "LoginError": "_login",
+    "ParseOffloader": "_offload",
+    "_login": None,
+    "aio": None,
+    "sync": None,
+    "testing": None,
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    module = importlib.import_module("." + (_LAZY[name] or name), __name__)
+    value = module if _LAZY[name] is None else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+if sys.version_info < (3, 7):  # No module level `__getattr__`
+    from ._login import LoginError
+    from ._offload import ParseOffloader
+
 __all__ = ()
@@ -1,6 +1,7 @@
 import abc
 import attr
-from typing import Dict, Any, Optional
+import urllib.parse
+from typing import Dict, Any, Optional, Hashable, Iterable, List, Union
 
 from ._utils import build_url
 
@@ -50,6 +51,95 @@ class Request(metaclass=abc.ABCMeta):
     def connect_timeout(self) -> Optional[float]:
         return None
 
+    @property
+    def body(self) -> Optional[bytes]:
+        """The form-encoded body, if any."""
+        return None
+
     @property
     def url(self) -> str:
         return build_url(host=self.host, target=self.target, params=self.params)
+
+    @property
+    def url_bytes(self) -> bytes:
+        """The URL, ready to be written by a driver."""
+        return self.url.encode("ascii")
+
+    @property
+    def routing_key(self) -> Optional[Hashable]:
+        """Requests with the same key share a backend, so drivers can group them."""
+        return None
+
+
+def _encode_value(value: Any) -> str:
+    # Same as `urllib.parse.urlencode`, with a fast path for integers
+    if type(value) is int:
+        return str(value)
+    if isinstance(value, (str, bytes)):
+        return urllib.parse.quote_plus(value)
+    return urllib.parse.quote_plus(str(value))
+
+
+class _Name(str):
+    """The name of a dynamic parameter, in `RequestTemplate._parts`."""
+
+    __slots__ = ()
+
+
+@attr.s(slots=True, frozen=True)
+class RequestTemplate:
+    """Pre-encodes the URL of a request, except for the `dynamic` parameters.
+
+    `url(params)` gives the same result as `build_url`, as long as the static
+    parameters have the values the template was created with.
+    """
+
+    host = attr.ib(type=str)
+    target = attr.ib(type=str)
+    params = attr.ib(type=Dict[str, Any])
+    dynamic = attr.ib(type=Iterable[str], converter=frozenset)
+    #: The static parts of the URL, and the names of the dynamic parameters between
+    _parts = attr.ib(init=False, type=List[Union[str, Any]])
+    _parts_bytes = attr.ib(init=False, type=List[Union[bytes, Any]])
+
+    @_parts.default
+    def _build_parts(self):
+        url = build_url(host=self.host, target=self.target, params={})
+        if not self.params:
+            return [url]
+        parts = []
+        static = url + "?"
+        for i, (name, value) in enumerate(self.params.items()):
+            static += "&" if i else ""
+            static += urllib.parse.quote_plus(str(name)) + "="
+            if name in self.dynamic:
+                parts.append(static)
+                parts.append(_Name(name))
+                static = ""
+            else:
+                static += _encode_value(value)
+        parts.append(static)
+        return parts
+
+    @_parts_bytes.default
+    def _build_parts_bytes(self):
+        return [
+            part if isinstance(part, _Name) else part.encode("ascii")
+            for part in self._parts
+        ]
+
+    def url(self, params: Dict[str, Any]) -> str:
+        return "".join(
+            _encode_value(params[part]) if isinstance(part, _Name) else part
+            for part in self._parts
+        )
+
+    def url_bytes(self, params: Dict[str, Any]) -> bytes:
+        return b"".join(
+            (
+                _encode_value(params[part]).encode("ascii")
+                if isinstance(part, _Name)
+                else part
+            )
+            for part in self._parts_bytes
+        )
@@ -0,0 +1,265 @@
+import abc
+import attr
+import hashlib
+import json
+import os
+import time
+
+from typing import Any, Callable, Dict, Optional
+
+from . import _abc
+
+#: Bumped when the format of `StateData.dump` changes
+STATE_FORMAT_VERSION = 1
+
+
+@attr.s(slots=True, kw_only=True, frozen=True)
+class StateData:
+    """The serializable parts of a `State`, and when they were created."""
+
+    revision = attr.ib(type=str)
+    fb_dtsg = attr.ib(type=str)
+    cookies = attr.ib(type=Dict[str, str])
+    #: Unix timestamp
+    created = attr.ib(type=float, factory=time.time)
+
+    @classmethod
+    def from_state(cls, state: _abc.State, **kwargs: Any) -> "StateData":
+        return cls(
+            revision=state.revision,
+            fb_dtsg=state.fb_dtsg,
+            cookies=dict(state.cookies),
+            **kwargs
+        )
+
+    def dump(self) -> bytes:
+        data = [
+            STATE_FORMAT_VERSION,
+            self.revision,
+            self.fb_dtsg,
+            self.cookies,
+            self.created,
+        ]
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def load(cls, data: bytes) -> "StateData":
+        """Inverse of `dump`.
+
+        Raise:
+            `ValueError` if the data is invalid, or of an unknown version.
+        """
+        try:
+            version, revision, fb_dtsg, cookies, created = json.loads(
+                data.decode("utf-8")
+            )
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid state data: {!r}".format(data)) from e
+        if version != STATE_FORMAT_VERSION:
+            raise ValueError("Unknown state format version: {!r}".format(version))
+        return cls(revision=revision, fb_dtsg=fb_dtsg, cookies=cookies, created=created)
+
+
+@attr.s(slots=True, kw_only=True)
+class StateCache(metaclass=abc.ABCMeta):
+    """Persists `StateData` per account, so restarts can skip logging in.
+
+    Entries older than `ttl` seconds, or rejected by `validate`, are dropped when
+    read, and the least recently used entries are evicted beyond `max_entries`.
+    """
+
+    ttl = attr.ib(None, type=Optional[float])
+    max_entries = attr.ib(None, type=Optional[int])
+    #: Called with cached data before it's returned, return `False` if it's stale
+    validate = attr.ib(None, type=Optional[Callable[[StateData], bool]])
+    clock = attr.ib(time.time, type=Callable[[], float])
+
+    # Storage, implemented by subclasses
+
+    @abc.abstractmethod
+    def _load(self, key: str) -> Optional[bytes]:
+        """Return the stored data, and mark it as recently used."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _store(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _evict(self, max_entries: int) -> None:
+        """Delete the least recently used entries, keeping at most `max_entries`."""
+        raise NotImplementedError
+
+    # Public methods
+
+    def get(self, key: str) -> Optional[StateData]:
+        """Return the cached data, or `None` if missing, expired or stale."""
+        raw = self._load(key)
+        if raw is None:
+            return None
+        try:
+            data = StateData.load(raw)
+        except ValueError:
+            self._delete(key)
+            return None
+        if self.ttl is not None and data.created + self.ttl <= self.clock():
+            self._delete(key)
+            return None
+        if self.validate is not None and not self.validate(data):
+            self._delete(key)
+            return None
+        return data
+
+    def set(self, key: str, data: StateData) -> None:
+        self._store(key, data.dump())
+        if self.max_entries is not None:
+            self._evict(self.max_entries)
+
+    def invalidate(self, key: str) -> None:
+        """Forget the data, e.g. because Facebook logged the session out."""
+        self._delete(key)
+
+    def get_or_create(self, key: str, create: Callable[[], StateData]) -> StateData:
+        """Return the cached data, or call `create` to log in, and cache the result."""
+        data = self.get(key)
+        if data is None:
+            data = create()
+            self.set(key, data)
+        return data
+
+
+@attr.s(slots=True, kw_only=True)
+class FileStateCache(StateCache):
+    """Stores each entry in a file in `directory`, using the mtime for LRU.
+
+    The directory and files are only accessible by the owner, as they contain
+    session cookies. To not scan the directory on every `set`, the entries are
+    counted when evicting, and a tenth more than needed are evicted. Entries added
+    by other processes are noticed at the next scan.
+    """
+
+    directory = attr.ib(type=str)
+    #: The number of entries, as of the last scan, or `None` before one
+    _entries = attr.ib(None, init=False)  # type: Optional[int]
+    _suffix = ".state"
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest() + self._suffix
+        return os.path.join(self.directory, name)
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, (self.clock(), self.clock()))
+        except FileNotFoundError:
+            return None
+        return data
+
+    def _store(self, key, data):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = self._path(key)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "wb") as f:
+            f.write(data)
+        os.utime(tmp_path, (self.clock(), self.clock()))
+        if self._entries is not None and not os.path.exists(path):
+            self._entries += 1
+        os.replace(tmp_path, path)  # Atomic, so readers never see partial data
+
+    def _delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            return
+        if self._entries is not None:
+            self._entries -= 1
+
+    def _evict(self, max_entries):
+        if self._entries is not None and self._entries <= max_entries:
+            return
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(self._suffix)
+            ]
+        except FileNotFoundError:
+            self._entries = 0
+            return
+        if len(entries) > max_entries:
+            keep = max_entries - max_entries // 10
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[: len(entries) - keep]:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+            entries = entries[len(entries) - keep :]
+        self._entries = len(entries)
+
+
+@attr.s(slots=True, kw_only=True)
+class SQLiteStateCache(StateCache):
+    """Stores the entries in a SQLite database at `path`."""
+
+    path = attr.ib(type=str)
+    _connection = attr.ib(init=False)
+
+    @_connection.default
+    def _connect(self):
+        import sqlite3  # Only when used, it's slow to import
+
+        if self.path != ":memory:":
+            # Create the file only accessible by the owner, SQLite keeps the mode
+            os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600))
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS states"
+                " (key TEXT PRIMARY KEY, data BLOB NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS states_accessed ON states (accessed)"
+            )
+        return connection
+
+    def _load(self, key):
+        with self._connection:
+            row = self._connection.execute(
+                "SELECT data FROM states WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE states SET accessed = ? WHERE key = ?", (self.clock(), key)
+            )
+        return bytes(row[0])
+
+    def _store(self, key, data):
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO states (key, data, accessed) VALUES (?, ?, ?)",
+                (key, data, self.clock()),
+            )
+
+    def _delete(self, key):
+        with self._connection:
+            self._connection.execute("DELETE FROM states WHERE key = ?", (key,))
+
+    def _evict(self, max_entries):
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM states WHERE key NOT IN"
+                " (SELECT key FROM states ORDER BY accessed DESC LIMIT ?)",
+                (max_entries,),
+            )
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,84 @@
+import os
+import struct
+
+from typing import Dict, Iterable, Mapping, Tuple
+
+from ._pull_handler import PullHandler
+
+_MAGIC = b"SBCP"
+#: Bumped when the file format changes
+CHECKPOINT_VERSION = 1
+_HEADER = struct.Struct("<4sHI")  # Magic, version, number of records
+_RECORD = struct.Struct("<HH")  # Key length, snapshot length
+
+
+def dump_checkpoints(snapshots: Iterable[Tuple[str, bytes]]) -> bytes:
+    """Pack many `PullHandler.snapshot`s, keyed by account, into a single blob."""
+    parts = [b""]
+    for key, snapshot in snapshots:
+        encoded = key.encode("utf-8")
+        parts.append(_RECORD.pack(len(encoded), len(snapshot)))
+        parts.append(encoded)
+        parts.append(snapshot)
+    parts[0] = _HEADER.pack(_MAGIC, CHECKPOINT_VERSION, (len(parts) - 1) // 3)
+    return b"".join(parts)
+
+
+def load_checkpoints(data: bytes) -> Dict[str, bytes]:
+    """Inverse of `dump_checkpoints`.
+
+    Raise:
+        `ValueError` if the data is invalid, or of an unknown version.
+    """
+    view = memoryview(data)
+    try:
+        magic, version, count = _HEADER.unpack_from(view)
+    except struct.error as e:
+        raise ValueError("Invalid checkpoint data") from e
+    if magic != _MAGIC:
+        raise ValueError("Invalid checkpoint data")
+    if version != CHECKPOINT_VERSION:
+        raise ValueError("Unknown checkpoint version: {!r}".format(version))
+    offset = _HEADER.size
+    rtn = {}
+    for _ in range(count):
+        try:
+            key_length, snapshot_length = _RECORD.unpack_from(view, offset)
+        except struct.error as e:
+            raise ValueError("Truncated checkpoint data") from e
+        offset += _RECORD.size
+        end = offset + key_length + snapshot_length
+        if end > len(view):
+            raise ValueError("Truncated checkpoint data")
+        key = str(view[offset : offset + key_length], "utf-8")
+        rtn[key] = bytes(view[offset + key_length : end])
+        offset = end
+    return rtn
+
+
+def write_checkpoints(path: str, handlers: Mapping[str, PullHandler]) -> None:
+    """Snapshot all the handlers, and write them to `path` in one atomic write."""
+    data = dump_checkpoints(
+        (key, handler.snapshot()) for key, handler in handlers.items()
+    )
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_checkpoints(path: str) -> Dict[str, bytes]:
+    """Read the snapshots written by `write_checkpoints`, keyed by account."""
+    with open(path, "rb") as f:
+        return load_checkpoints(f.read())
+
+
+def restore_checkpoints(path: str, handlers: Mapping[str, PullHandler]) -> int:
+    """Restore the handlers that have a checkpoint in `path`, and return how many."""
+    snapshots = read_checkpoints(path)
+    restored = 0
+    for key, handler in handlers.items():
+        if key in snapshots:
+            handler.restore(snapshots[key])
+            restored += 1
+    return restored
@@ -0,0 +1,249 @@
+import array
+import attr
+import json
+import time
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+#: Codes of the `type_code` column, by frame `type`, or delta `class` for deltas.
+#: Unknown types are 0, and unknown deltas 1
+TYPE_CODES = {
+    "unknown": 0,
+    "delta": 1,
+    "NewMessage": 2,
+    "typ": 3,
+    "ttyp": 4,
+    "chatproxy-presence": 5,
+    "buddylist_overlay": 6,
+    "inbox": 7,
+    "mercury": 8,
+    "messaging": 9,
+    "ReadReceipt": 10,
+    "DeliveryReceipt": 11,
+    "MarkRead": 12,
+    "ThreadName": 13,
+    "ParticipantsAddedToGroupThread": 14,
+    "ParticipantLeftGroupThread": 15,
+    "AdminTextMessage": 16,
+    "ForcedFetch": 17,
+    "ClientPayload": 18,
+}  # type: Dict[str, int]
+
+#: The `array` type codes of the columns, and the equivalent NumPy dtypes
+_COLUMNS = (
+    ("source", "I", "uint32"),
+    ("type_code", "B", "uint8"),
+    ("timestamp", "q", "int64"),
+    ("thread_id", "q", "int64"),
+    ("actor_id", "q", "int64"),
+    ("payload_offsets", "q", "int64"),
+)
+
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _int(value: Any) -> int:
+    """Convert an ID or timestamp to an int, or 0 if it isn't a valid int64."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return 0
+    return value if 0 <= value <= _INT64_MAX else 0
+
+
+@attr.s(slots=True, kw_only=True, frozen=True)
+class ColumnBatch:
+    """Frames stored column by column, in `array.array`s.
+
+    Row `i` is the `i`th frame. `source` indexes `sources`, the keys the frames
+    were added with. The JSON of frame `i` is
+    `payload[payload_offsets[i]:payload_offsets[i + 1]]`, and empty if payloads
+    weren't kept. Missing IDs are 0.
+    """
+
+    sources = attr.ib(type=Tuple[Hashable, ...])
+    source = attr.ib(type=array.array)
+    type_code = attr.ib(type=array.array)
+    #: Unix timestamps in milliseconds
+    timestamp = attr.ib(type=array.array)
+    thread_id = attr.ib(type=array.array)
+    actor_id = attr.ib(type=array.array)
+    payload_offsets = attr.ib(type=array.array)
+    payload = attr.ib(type=bytes, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.type_code)
+
+    def payload_at(self, i: int) -> bytes:
+        return self.payload[self.payload_offsets[i] : self.payload_offsets[i + 1]]
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Return the columns as NumPy arrays, sharing memory with the batch.
+
+        `payload` is an array of bytes. Requires the `numpy` extra.
+        """
+        import numpy
+
+        columns = {
+            name: numpy.frombuffer(getattr(self, name), dtype=dtype)
+            for name, _, dtype in _COLUMNS
+        }
+        columns["payload"] = numpy.frombuffer(self.payload, dtype="uint8")
+        return columns
+
+
+@attr.s(slots=True, kw_only=True)
+class FrameColumns:
+    """Accumulates data frames from many handlers into columns, in fixed-size batches.
+
+    Avoids the Python objects of converting every frame into a row: IDs and
+    timestamps are stored as int64, and types as codes from `type_codes`. Frames
+    without a timestamp, e.g. typing notifications, get the time they were added.
+    The JSON of the frames is only encoded if `payloads` is set, which costs more
+    than everything else.
+
+    Not thread safe.
+    """
+
+    batch_size = attr.ib(65536, type=int)
+    payloads = attr.ib(False, type=bool)
+    type_codes = attr.ib(TYPE_CODES, type=Dict[str, int])
+    clock = attr.ib(time.time, type=Callable[[], float])
+    _sources = attr.ib(factory=list, init=False)  # type: List[Hashable]
+    _source_codes = attr.ib(factory=dict, init=False)  # type: Dict[Hashable, int]
+    _columns = attr.ib(init=False)  # type: List[array.array]
+    _payload = attr.ib(factory=bytearray, init=False)
+
+    @_columns.default
+    def _new_columns(self):
+        columns = [array.array(typecode) for _, typecode, _ in _COLUMNS]
+        columns[-1].append(0)  # Offsets have one more element than rows
+        return columns
+
+    @batch_size.validator
+    def _check_batch_size(self, attribute, value):
+        if value < 1:
+            raise ValueError("batch_size must be at least 1")
+
+    def __len__(self) -> int:
+        return len(self._columns[1])
+
+    def _source_code(self, source: Hashable) -> int:
+        code = self._source_codes.get(source)
+        if code is None:
+            code = self._source_codes[source] = len(self._sources)
+            self._sources.append(source)
+        return code
+
+    def extend(
+        self, frames: Iterable[Any], *, source: Hashable = None
+    ) -> List[ColumnBatch]:
+        """Add the frames, e.g. from `PullHandler.handle`, and return full batches.
+
+        `source` identifies where the frames came from, e.g. the handler's key.
+        `Frame` objects are read from their raw frame, so compacted frames are
+        stored as unknown.
+        """
+        source_code = self._source_code(source)
+        now = int(self.clock() * 1000)
+        sources, codes, timestamps, thread_ids, actor_ids, offsets = self._columns
+        get_code = self.type_codes.get
+        payload = self._payload
+        encode = json.JSONEncoder(separators=(",", ":")).encode
+        batches = []
+        for frame in frames:
+            raw = frame if type(frame) is dict else getattr(frame, "raw", frame)
+            try:
+                # Fast path for message deltas, the bulk of the frames
+                delta = raw["delta"]
+                metadata = delta["messageMetadata"]
+                thread_key = metadata["threadKey"]
+                timestamp = int(metadata["timestamp"])
+                thread_id = int(
+                    thread_key.get("threadFbId") or thread_key["otherUserFbId"]
+                )
+                actor_id = int(metadata["actorFbId"])
+                if (
+                    raw["type"] != "delta"
+                    or not 0 <= thread_id <= _INT64_MAX
+                    or not 0 <= actor_id <= _INT64_MAX
+                    or not 0 <= timestamp <= _INT64_MAX
+                ):
+                    raise ValueError
+                code = get_code(delta["class"], 1)
+            except (AttributeError, LookupError, TypeError, ValueError):
+                code, timestamp, thread_id, actor_id = _fields(raw, get_code)
+            if self.payloads and raw is not None:
+                # Encoded first, so a frame that can't be is not half added
+                payload += encode(raw).encode("utf-8")
+            sources.append(source_code)
+            codes.append(code)
+            timestamps.append(timestamp or now)
+            thread_ids.append(thread_id)
+            actor_ids.append(actor_id)
+            offsets.append(len(payload))
+            if len(codes) >= self.batch_size:
+                batches.append(self.flush())
+                sources, codes, timestamps, thread_ids, actor_ids, offsets = (
+                    self._columns
+                )
+                payload = self._payload
+        return batches
+
+    def flush(self) -> Optional[ColumnBatch]:
+        """Return the frames added since the last batch, or `None` if there are none.
+
+        The keys of the sources are kept, so codes stay the same across batches.
+        """
+        if not len(self):
+            return None
+        columns = self._columns
+        batch = ColumnBatch(
+            sources=tuple(self._sources),
+            source=columns[0],
+            type_code=columns[1],
+            timestamp=columns[2],
+            thread_id=columns[3],
+            actor_id=columns[4],
+            payload_offsets=columns[5],
+            payload=bytes(self._payload),
+        )
+        self._columns = self._new_columns()
+        self._payload = bytearray()
+        return batch
+
+
+def _fields(raw: Any, get_code: Callable[[Any, int], int]) -> Tuple[int, int, int, int]:
+    """The type code, timestamp, thread ID and actor ID of a frame, or 0 if missing."""
+    if not isinstance(raw, dict):
+        return 0, 0, 0, 0
+    type_ = raw.get("type")
+    if type_ == "delta":
+        delta = raw.get("delta")
+        if not isinstance(delta, dict):
+            return 1, 0, 0, 0
+        return (get_code(delta.get("class"), 1),) + _delta_fields(delta)
+    actor_id = thread_id = 0
+    if type_ in ("typ", "ttyp"):
+        actor_id = _int(raw.get("from"))
+        thread_id = _int(raw.get("thread_fbid") or raw.get("thread")) or actor_id
+    return get_code(type_, 0), 0, thread_id, actor_id
+
+
+def _delta_fields(delta: Dict[str, Any]) -> Tuple[int, int, int]:
+    """The timestamp, thread ID and actor ID of a delta, or 0 if missing."""
+    metadata = delta.get("messageMetadata")
+    if not isinstance(metadata, dict):
+        metadata = delta  # E.g. read receipts have the fields directly
+    timestamp = _int(
+        metadata.get("timestamp")
+        or delta.get("actionTimestampMs")
+        or delta.get("actionTimestamp")
+    )
+    thread_key = metadata.get("threadKey")
+    thread_id = 0
+    if isinstance(thread_key, dict):
+        thread_id = _int(
+            thread_key.get("threadFbId") or thread_key.get("otherUserFbId")
+        )
+    return timestamp, thread_id, _int(metadata.get("actorFbId"))
@@ -0,0 +1,109 @@
+import attr
+import random
+import threading
+import time
+
+from typing import Callable, Dict, Hashable, Optional
+
+
+@attr.s(slots=True)
+class _Group:
+    tokens = attr.ib(type=float)
+    updated = attr.ib(type=float)
+    #: Consecutive failures
+    failures = attr.ib(0, type=int)
+    #: When the circuit was opened, or `None` if it's closed
+    opened = attr.ib(None, type=Optional[float])
+
+
+@attr.s(slots=True, kw_only=True)
+class BackoffCoordinator:
+    """Shared by many `PullHandler`s, to spread out reconnects after an outage.
+
+    Requests are grouped by a key, usually the host and sticky pool. Each group has
+    a token bucket, which limits the rate of requests to `rate` per second, with
+    bursts of up to `burst`, and a circuit breaker, which opens after
+    `failure_threshold` consecutive failures. While open, no requests are allowed
+    for `reset_timeout` seconds, after which the bucket refills from empty, until a
+    success closes the circuit, or a failure opens it again.
+
+    Requests that are denied get a random delay, spread over the time it takes to
+    refill the bucket, so they don't all come back at once. Thread safe.
+    """
+
+    rate = attr.ib(500.0, type=float)
+    burst = attr.ib(100.0, type=float)
+    failure_threshold = attr.ib(10, type=int)
+    reset_timeout = attr.ib(30.0, type=float)
+    #: Bounds of the delays returned by `failure`
+    base_delay = attr.ib(1.0, type=float)
+    max_delay = attr.ib(320.0, type=float)
+    clock = attr.ib(time.monotonic, type=Callable[[], float])
+    rng = attr.ib(factory=random.Random, type=random.Random)
+    _groups = attr.ib(factory=dict, init=False)  # type: Dict[Hashable, _Group]
+    _lock = attr.ib(factory=threading.Lock, init=False)
+
+    def _group(self, key: Hashable, now: float) -> _Group:
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(self.burst, now)
+        return group
+
+    def _spread(self) -> float:
+        return self.rng.uniform(0, self.burst / self.rate)
+
+    def is_open(self, key: Hashable) -> bool:
+        """Whether the circuit of the group is open, i.e. all requests are denied."""
+        with self._lock:
+            group = self._groups.get(key)
+            return (
+                group is not None
+                and group.opened is not None
+                and self.clock() < group.opened + self.reset_timeout
+            )
+
+    def acquire(self, key: Hashable) -> float:
+        """Return 0 if a request may be sent now, otherwise how long to wait."""
+        with self._lock:
+            now = self.clock()
+            group = self._group(key, now)
+            if group.opened is not None:
+                remaining = group.opened + self.reset_timeout - now
+                if remaining > 0:
+                    return remaining + self._spread()
+                # Half open, the bucket refills from when the circuit was reset
+                group.updated = max(group.updated, group.opened + self.reset_timeout)
+            group.tokens = min(
+                self.burst, group.tokens + (now - group.updated) * self.rate
+            )
+            group.updated = now
+            if group.tokens >= 1:
+                group.tokens -= 1
+                return 0.0
+            return (1 - group.tokens) / self.rate + self._spread()
+
+    def success(self, key: Hashable) -> None:
+        with self._lock:
+            group = self._groups.get(key)
+            if group is not None:
+                group.failures = 0
+                group.opened = None
+
+    def failure(self, key: Hashable, previous_delay: float = 0.0) -> float:
+        """Record a failed request, and return how long the handler should wait.
+
+        The delay uses "decorrelated jitter": a random value between `base_delay`
+        and three times the handler's previous delay, capped at `max_delay`.
+        """
+        with self._lock:
+            now = self.clock()
+            group = self._group(key, now)
+            group.failures += 1
+            if group.opened is not None or group.failures >= self.failure_threshold:
+                # Open the circuit, or re-open it if a request failed after a reset
+                if group.opened is None or now >= group.opened + self.reset_timeout:
+                    group.opened = now
+                    group.tokens = 0.0
+                    group.updated = now
+            upper = max(self.base_delay, previous_delay * 3)
+            return min(self.max_delay, self.rng.uniform(self.base_delay, upper))
@@ -0,0 +1,65 @@
+import attr
+import collections
+import logging
+
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+
+def frame_key(frame: Any) -> Optional[Hashable]:
+    """Return the message id, or offline threading id, of a delta frame."""
+    if not isinstance(frame, dict):
+        return None
+    delta = frame.get("delta")
+    if not isinstance(delta, dict):
+        return None
+    metadata = delta.get("messageMetadata")
+    if not isinstance(metadata, dict):
+        return None
+    return metadata.get("messageId") or metadata.get("offlineThreadingId")
+
+
+@attr.s(slots=True, kw_only=True)
+class Deduplicator:
+    """Drops frames which have already been seen, e.g. after a `fullReload`.
+
+    Remembers the keys of the last `max_size` frames, so memory use is bounded.
+    Frames without a key (see `frame_key`) are always let through.
+    """
+
+    max_size = attr.ib(100000, type=int)
+    key = attr.ib(frame_key, type=Callable[[Any], Optional[Hashable]])
+    _seen = attr.ib(factory=collections.OrderedDict, init=False)
+    #: The number of frames dropped
+    duplicates = attr.ib(0, init=False)
+    #: The number of times `seq` went backwards
+    seq_regressions = attr.ib(0, init=False)
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, frame: Any) -> bool:
+        """Return whether the frame is a duplicate, and remember it otherwise."""
+        key = self.key(frame)
+        if key is None:
+            return False
+        seen = self._seen
+        if key in seen:
+            seen.move_to_end(key)
+            self.duplicates += 1
+            return True
+        seen[key] = None
+        if len(seen) > self.max_size:
+            seen.popitem(last=False)
+        return False
+
+    def filter(self, frames: Iterable[Any]) -> Iterator[Any]:
+        for frame in frames:
+            if not self.seen(frame):
+                yield frame
+
+    def record_seq(self, old: int, new: int) -> None:
+        if new < old:
+            self.seq_regressions += 1
+            log.debug("Sequence regression from %s to %s", old, new)
@@ -0,0 +1,170 @@
+import datetime
+
+from typing import Any, Callable, Container, Dict, Iterable, Iterator, List, Optional
+
+from ._utils import time_from_millis
+
+
+def _lazy(name: str, decode: Callable[[Dict[str, Any]], Any]) -> property:
+    """A property, which decodes the field from `raw` on first access."""
+    slot = "_" + name
+
+    def fget(self):
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            pass
+        try:
+            value = decode(self.raw)
+        except (LookupError, TypeError, ValueError) as e:
+            from ._pull_handler import ProtocolError  # Circular import
+
+            raise ProtocolError("Could not decode {}".format(name), self.raw) from e
+        setattr(self, slot, value)
+        return value
+
+    return property(fget)
+
+
+class Frame:
+    """A data frame from `PullHandler.handle`, with fields decoded on access.
+
+    Check the type with `isinstance`, or `kind`, before accessing the fields, since
+    wrapping a frame doesn't decode anything.
+    """
+
+    __slots__ = ("raw",)
+    #: The names of the lazily decoded fields
+    fields = ()  # type: Iterable[str]
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw  # type: Optional[Dict[str, Any]]
+
+    @property
+    def kind(self) -> Optional[str]:
+        """The frame's `type`, e.g. `"typ"`, or the class of a delta."""
+        return self.raw.get("type")
+
+    def compact(self) -> "Frame":
+        """Decode all the fields, and drop the raw frame, to save memory.
+
+        Frames without fields are left as they are. Return the frame itself.
+        """
+        if self.fields:
+            for name in self.fields:
+                getattr(self, name)
+            self.raw = None
+        return self
+
+    def __repr__(self) -> str:
+        if self.raw is None:
+            values = (
+                "{}={!r}".format(name, getattr(self, name)) for name in self.fields
+            )
+            return "{}({})".format(type(self).__name__, ", ".join(values))
+        return "{}({!r})".format(type(self).__name__, self.raw)
+
+
+class DeltaFrame(Frame):
+    """A frame of type `delta`, the kind being the delta's `class`."""
+
+    __slots__ = ()
+
+    @property
+    def kind(self) -> Optional[str]:
+        return self.raw["delta"].get("class")
+
+
+def _thread_key(raw: Dict[str, Any]) -> Dict[str, Any]:
+    return raw["delta"]["messageMetadata"]["threadKey"]
+
+
+class NewMessage(DeltaFrame):
+    __slots__ = (
+        "_message_id",
+        "_author_id",
+        "_thread_id",
+        "_is_group",
+        "_text",
+        "_attachments",
+        "_timestamp",
+    )
+    kind = "NewMessage"
+    fields = (
+        "message_id",
+        "author_id",
+        "thread_id",
+        "is_group",
+        "text",
+        "attachments",
+        "timestamp",
+    )
+
+    message_id = _lazy(
+        "message_id", lambda raw: raw["delta"]["messageMetadata"]["messageId"]
+    )  # type: str
+    author_id = _lazy(
+        "author_id", lambda raw: raw["delta"]["messageMetadata"]["actorFbId"]
+    )  # type: str
+    thread_id = _lazy(
+        "thread_id",
+        lambda raw: _thread_key(raw).get("threadFbId")
+        or _thread_key(raw)["otherUserFbId"],
+    )  # type: str
+    is_group = _lazy(
+        "is_group", lambda raw: "threadFbId" in _thread_key(raw)
+    )  # type: bool
+    text = _lazy("text", lambda raw: raw["delta"].get("body"))  # type: Optional[str]
+    attachments = _lazy(
+        "attachments", lambda raw: raw["delta"].get("attachments") or []
+    )  # type: List[Dict[str, Any]]
+    timestamp = _lazy(
+        "timestamp",
+        lambda raw: time_from_millis(int(raw["delta"]["messageMetadata"]["timestamp"])),
+    )  # type: datetime.datetime
+
+
+class Typing(Frame):
+    __slots__ = ("_author_id", "_is_typing")
+    kind = "typ"
+    fields = ("author_id", "is_typing")
+
+    author_id = _lazy("author_id", lambda raw: str(raw["from"]))  # type: str
+    is_typing = _lazy("is_typing", lambda raw: bool(raw["st"]))  # type: bool
+
+
+#: Frame classes by `type`, and by delta `class` for deltas
+FRAME_TYPES = {"typ": Typing}  # type: Dict[str, type]
+DELTA_TYPES = {"NewMessage": NewMessage}  # type: Dict[str, type]
+
+
+def frame_type(raw: Any) -> type:
+    """Return the `Frame` class for a raw frame, without decoding anything."""
+    type_ = raw.get("type")
+    if type_ == "delta":
+        delta = raw.get("delta")
+        if isinstance(delta, dict):
+            return DELTA_TYPES.get(delta.get("class"), DeltaFrame)
+        return Frame
+    return FRAME_TYPES.get(type_, Frame)
+
+
+def wrap_frame(raw: Any) -> Any:
+    """Wrap a raw frame in its `Frame` class. Frames that aren't dicts are kept."""
+    if not isinstance(raw, dict):
+        return raw
+    return frame_type(raw)(raw)
+
+
+def wrap_frames(
+    frames: Iterable[Any], types: Optional[Container[type]] = None
+) -> Iterator[Any]:
+    """Wrap the frames, only keeping the ones whose class is in `types`, if given."""
+    for raw in frames:
+        if not isinstance(raw, dict):
+            if types is None:
+                yield raw
+            continue
+        cls = frame_type(raw)
+        if types is None or cls in types:
+            yield cls(raw)
@@ -0,0 +1,212 @@
+import attr
+import json
+import urllib.parse
+
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from . import _abc
+from ._incremental import _skip_whitespace
+from ._pull_handler import ProtocolError, _drop_document
+
+#: The query used by Messenger's web client to load the messages of a thread
+THREAD_MESSAGES_DOC_ID = "1860982147341344"
+
+_DECODER = json.JSONDecoder()
+
+
+@attr.s(slots=True, kw_only=True, frozen=True)
+class GraphQLQuery:
+    """A single query in a `graphqlbatch` request."""
+
+    doc_id = attr.ib(type=str)
+    params = attr.ib(type=Dict[str, Any])
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"doc_id": self.doc_id, "query_params": self.params}
+
+
+def thread_messages_query(
+    thread_id: str, *, limit: int = 20, before: Optional[int] = None
+) -> GraphQLQuery:
+    """Query the last `limit` messages of a thread, before the timestamp `before`."""
+    return GraphQLQuery(
+        doc_id=THREAD_MESSAGES_DOC_ID,
+        params={
+            "id": thread_id,
+            "message_limit": limit,
+            "load_messages": True,
+            "load_read_receipts": False,
+            "before": before,
+        },
+    )
+
+
+@attr.s(slots=True, kw_only=True, frozen=True)
+class GraphQLBatchResult:
+    """The results of a `GraphQLBatchRequest`, by the keys of the queries.
+
+    Queries that failed are in `errors` instead of `responses`, with the error data.
+    """
+
+    responses = attr.ib(type=Dict[Hashable, Any])
+    errors = attr.ib(type=Dict[Hashable, Any])
+
+
+@attr.s(slots=True, kw_only=True, frozen=True)
+class GraphQLBatchRequest(_abc.Request):
+    """Several GraphQL queries, sent as a single form-encoded `POST`.
+
+    `queries` maps the caller's keys to the queries, which are named `q0`, `q1`, ...
+    in the request. `form` is sent along, e.g. `fb_dtsg`.
+    """
+
+    queries = attr.ib(type=Dict[Hashable, GraphQLQuery])
+    form = attr.ib(factory=dict, type=Dict[str, str])
+    params = attr.ib(factory=dict, type=Dict[str, Any])
+    batch_name = attr.ib("MessengerGraphQLThreadFetcher", type=str)
+    method = "POST"
+    host = "www.facebook.com"
+    target = "/api/graphqlbatch/"
+
+    @property
+    def names(self) -> Dict[str, Hashable]:
+        """The keys of the queries, by their name in the request."""
+        return {"q{}".format(i): key for i, key in enumerate(self.queries)}
+
+    @property
+    def body(self) -> bytes:
+        queries = {
+            "q{}".format(i): query.to_json()
+            for i, query in enumerate(self.queries.values())
+        }
+        form = dict(
+            self.form,
+            batch_name=self.batch_name,
+            queries=json.dumps(queries, separators=(",", ":")),
+        )
+        return urllib.parse.urlencode(form).encode("ascii")
+
+    def parse(self, body: bytes) -> GraphQLBatchResult:
+        """Split the response into the results of the queries.
+
+        Raise:
+            `ProtocolError` if the response is invalid, failed as a whole, or is
+            missing any of the queries.
+        """
+        names = self.names
+        responses = {}
+        errors = {}
+        for name, value in parse_batch_response(body):
+            if name not in names:
+                raise ProtocolError("Unknown query in response: {}".format(name), body)
+            key = names.pop(name)
+            if not isinstance(value, dict):
+                raise ProtocolError("Invalid query result", value)
+            if value.get("error") or value.get("errors"):
+                errors[key] = value
+            elif "response" in value:
+                responses[key] = value["response"]
+            elif "data" in value:
+                responses[key] = value["data"]
+            else:
+                raise ProtocolError("Invalid query result", value)
+        if names:
+            missing = ", ".join(sorted(names))
+            raise ProtocolError("Missing queries in response: {}".format(missing), body)
+        return GraphQLBatchResult(responses=responses, errors=errors)
+
+
+def parse_batch_response(body: bytes) -> Iterator[Tuple[str, Any]]:
+    """Yield the query names and results of a `graphqlbatch` response, in order.
+
+    The response is a `for (;;);` prefix, followed by a JSON object per query, like
+    `{"q0": {"response": ...}}`, and a final object with statistics. Every object
+    is decoded once, as the body is read.
+
+    Raise:
+        `ProtocolError` if the body is invalid, or the batch failed as a whole.
+    """
+    try:
+        text = str(body, "utf-8")
+    except UnicodeDecodeError as e:
+        raise ProtocolError("Invalid unicode data", body) from _drop_document(e)
+    pos = text.find("{")
+    if pos == -1:
+        raise ProtocolError("No JSON object found", body)
+    complete = False
+    while pos < len(text):
+        try:
+            obj, pos = _DECODER.raw_decode(text, pos)
+        except ValueError as e:
+            raise ProtocolError("Invalid JSON data", body) from _drop_document(e)
+        pos = _skip_whitespace(text, pos)
+        if not isinstance(obj, dict):
+            raise ProtocolError("Invalid batch response", obj)
+        if "error" in obj:
+            raise ProtocolError("Batch failed", obj)
+        if "successful_results" in obj:
+            complete = True
+            continue
+        for name, value in obj.items():
+            yield name, value
+    if not complete:
+        raise ProtocolError("Batch response ended early", body)
+
+
+def _is_thread_query(query: Optional[GraphQLQuery]) -> bool:
+    return query is not None and query.doc_id == THREAD_MESSAGES_DOC_ID
+
+
+@attr.s(slots=True, kw_only=True)
+class GraphQLBatcher:
+    """Coalesces GraphQL queries into batched requests.
+
+    Every `GraphQLBatchRequest` has at most `max_batch_size` queries. Queries are
+    added with a key, and a query for a key that is already pending replaces it, so
+    e.g. many catch-up requests for the same thread after a `fullReload` are sent
+    once. `form` is sent with every request, e.g. `fb_dtsg`.
+    """
+
+    max_batch_size = attr.ib(50, type=int)
+    form = attr.ib(factory=dict, type=Dict[str, str])
+    _pending = attr.ib(factory=dict, init=False)  # type: Dict[Hashable, GraphQLQuery]
+
+    @max_batch_size.validator
+    def _check_max_batch_size(self, attribute, value):
+        if value < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, key: Hashable, query: GraphQLQuery) -> None:
+        self._pending[key] = query
+
+    def catch_up(
+        self, thread_id: str, *, limit: int = 20, before: Optional[int] = None
+    ) -> None:
+        """Queue fetching the last messages of a thread, keyed by the thread ID.
+
+        Windows with the same `before` are merged, with the larger limit. A window
+        ending elsewhere may not overlap, so it's queued separately, keyed by
+        `(thread_id, before)`, unless the thread ID is free.
+        """
+        key = thread_id  # type: Hashable
+        pending = self._pending.get(key)
+        if _is_thread_query(pending) and pending.params["before"] != before:
+            key = (thread_id, before)
+            pending = self._pending.get(key)
+        if _is_thread_query(pending):
+            limit = max(limit, pending.params["message_limit"])
+        self.add(key, thread_messages_query(thread_id, limit=limit, before=before))
+
+    def requests(self) -> List[GraphQLBatchRequest]:
+        """Return the requests for the pending queries, and clear them."""
+        items = list(self._pending.items())
+        self._pending.clear()
+        return [
+            GraphQLBatchRequest(
+                queries=dict(items[i : i + self.max_batch_size]), form=dict(self.form)
+            )
+            for i in range(0, len(items), self.max_batch_size)
+        ]
@@ -0,0 +1,164 @@
+"""Incremental decoding of pull bodies, one frame at a time.
+
+Values are decoded with `json.JSONDecoder.raw_decode`, which stops at the end of
+the value, so the `ms` and `batches` arrays can be decoded element by element.
+Every error is a `json.JSONDecodeError`, so callers can tell them apart from errors
+in the decoded data.
+
+`raw_decode` needs a `str`, so the whole body is decoded to one first, and kept
+while the arrays are iterated. Python stores it with the width of its widest
+character, so a body with a single emoji takes 4 bytes per character. Peak memory
+for a 2.4 MB body of frames with emoji was ~12 MB, against ~10.7 MB for
+`parse_body`, and ~2.3 MB against ~8.3 MB for a similar ASCII body, or one with
+the non-ASCII characters escaped as `\\uXXXX`.
+"""
+
+import json
+import re
+
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+#: Keys holding arrays which are decoded element by element
+_FRAMES_KEY = "ms"
+_BATCHES_KEY = "batches"
+#: Keys needed before the frames, see `_decode_members`
+_TYPE_KEY = "t"
+_SEQ_KEYS = ("s", "seq")
+
+_Decode = Callable[[str, int], Tuple[Any, int]]
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    return _WHITESPACE_RE.match(text, pos).end()
+
+
+def _expect(text: str, pos: int, char: str) -> int:
+    if not text.startswith(char, pos):
+        raise json.JSONDecodeError("Expected {!r}".format(char), text, pos)
+    return _skip_whitespace(text, pos + 1)
+
+
+def _next_member(text: str, pos: int) -> Tuple[bool, int]:
+    """After a member ending at `pos`, return whether the object ended, and where."""
+    pos = _skip_whitespace(text, pos)
+    if text.startswith("}", pos):
+        return True, pos + 1
+    return False, _expect(text, pos, ",")
+
+
+class _LazyArray:
+    """The elements of an array in an object, decoded one at a time when iterated.
+
+    Once exhausted, the members after the array are decoded into the object, and
+    `end` is set to the end of the object.
+    """
+
+    __slots__ = ("_text", "_pos", "_decode", "_obj", "_pending", "end")
+
+    def __init__(self, text: str, pos: int, decode: _Decode, obj: Dict[str, Any]):
+        self._text = text
+        self._pos = _expect(text, pos, "[")
+        self._decode = decode
+        self._obj = obj
+        #: The previous element, if it's an object that is still being decoded
+        self._pending = None  # type: Optional[_LazyArray]
+        self.end = None  # type: Optional[int]
+        if text.startswith("]", self._pos):
+            self._finish(self._pos + 1)
+
+    def __iter__(self) -> "_LazyArray":
+        return self
+
+    def __next__(self) -> Any:
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._after_element(pending.exhaust())
+        if self.end is not None:
+            raise StopIteration
+        value, pos = self._decode(self._text, self._pos)
+        if isinstance(pos, _LazyArray):
+            self._pending = pos
+        else:
+            self._after_element(pos)
+        return value
+
+    def _after_element(self, pos: int) -> None:
+        pos = _skip_whitespace(self._text, pos)
+        if self._text.startswith("]", pos):
+            self._finish(pos + 1)
+        else:
+            self._pos = _expect(self._text, pos, ",")
+
+    def _finish(self, pos: int) -> None:
+        ended, pos = _next_member(self._text, pos)
+        if not ended:
+            pos = _decode_members(self._text, pos, self._obj, False)
+        self.end = pos
+
+    def exhaust(self) -> int:
+        """Decode (and drop) the remaining elements, and return the end."""
+        for _ in self:
+            pass
+        return self.end
+
+
+def _decode_members(
+    text: str, pos: int, obj: Dict[str, Any], lazy: bool
+) -> Union[int, _LazyArray]:
+    """Decode the members starting at `pos` into `obj`, and return the end.
+
+    If `lazy`, the first `ms` or `batches` array after the keys the handlers need
+    before the frames, e.g. `t`, is decoded lazily, and returned instead. The
+    members after it are decoded when it's exhausted. If those keys come after the
+    array, it's decoded immediately instead, so nothing is decoded twice.
+    """
+    while True:
+        key, pos = _DECODER.raw_decode(text, pos)
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expected a key", text, pos)
+        pos = _expect(text, _skip_whitespace(text, pos), ":")
+        if (
+            lazy
+            and (key == _FRAMES_KEY or key == _BATCHES_KEY)
+            and text.startswith("[", pos)
+            and _TYPE_KEY in obj
+            and (key == _BATCHES_KEY or not obj.keys().isdisjoint(_SEQ_KEYS))
+        ):
+            decode = _DECODER.raw_decode if key == _FRAMES_KEY else _decode_object
+            array = obj[key] = _LazyArray(text, pos, decode, obj)
+            return array if array.end is None else array.end
+        obj[key], pos = _DECODER.raw_decode(text, pos)
+        ended, pos = _next_member(text, pos)
+        if ended:
+            return pos
+
+
+def _decode_object(text: str, pos: int) -> Tuple[Dict[str, Any], Any]:
+    """Decode the object at `pos`, and return it and its end, see `_decode_members`."""
+    obj = {}  # type: Dict[str, Any]
+    pos = _expect(text, pos, "{")
+    if text.startswith("}", pos):
+        return obj, pos + 1
+    return obj, _decode_members(text, pos, obj, True)
+
+
+def load_data(body: bytes) -> Dict[str, Any]:
+    """Like `parse_body`, but `ms` and `batches` are iterators, decoded lazily.
+
+    Every value is decoded once. The arrays are only lazy if `t` and `seq` (or `s`)
+    come before them, as Facebook sends them, otherwise they're decoded
+    immediately. Members after a lazy array are added to its object once it's
+    exhausted, so e.g. an `s` after the frames doesn't override the `seq` before.
+
+    Raise:
+        `UnicodeDecodeError` if the body isn't UTF-8, or `json.JSONDecodeError` if
+        it is invalid, possibly while iterating.
+    """
+    text = str(body, "utf-8")
+    start = text.find("{")
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+    return _decode_object(text, start)[0]
@@ -1,14 +1,18 @@
-import attr
-import bs4
 import re
 
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Optional, Tuple
 
 from . import _utils, State
 
 REVISION_RE = re.compile(r'"client_revision":(.*?),')
 FB_DTSG_RE = re.compile(r'name="fb_dtsg" value="(.*?)"')
 LOGOUT_H_RE = re.compile(r'name=\\"h\\" value=\\"(.*?)\\"')
+#: The text before and after each token, see `get_tokens`
+TOKENS = {
+    "revision": ('"client_revision":', ","),
+    "fb_dtsg": ('name="fb_dtsg" value="', '"'),
+    "logout_h": ('name=\\"h\\" value=\\"', '\\"'),
+}
 LOGIN_URL = "https://m.facebook.com/login"
 HOME_URL = "https://facebook.com/home"
 
@@ -38,11 +42,40 @@ def get_logout_h(html: str) -> str:
     return match.group(1)
 
 
+def _find_token(html: str, before: str, after: str) -> Optional[str]:
+    start = html.find(before)
+    while start != -1:
+        start += len(before)
+        end = html.find(after, start)
+        if end == -1:
+            return None
+        # Like `.*?` in the regexes, tokens can't span multiple lines
+        if html.find("\n", start, end) == -1:
+            return html[start:end]
+        start = html.find(before, start)
+    return None
+
+
+def get_tokens(html: str, names: Iterable[str] = tuple(TOKENS)) -> Dict[str, str]:
+    """Find several tokens at once, with the same results as e.g. `get_revision`.
+
+    Uses `str.find` instead of the regexes. A single regex alternating between the
+    tokens is slower than searching for each, since it can't search for a literal.
+    """
+    found = {}
+    for name in names:
+        token = _find_token(html, *TOKENS[name])
+        if token is None:
+            raise LoginError("Could not find `{}`!".format(name))
+        found[name] = token
+    return found
+
+
 def get_form_data(
     html: str, email: str, password: str
 ) -> Tuple[str, str, Dict[str, str]]:
     try:
-        method, url, data = _utils.parse_form(html)
+        method, url, data = _utils.extract_form(html)
     except ValueError as e:
         raise LoginError from e  # TODO: Better error message
     data["email"] = email
@@ -0,0 +1,126 @@
+import abc
+import attr
+import bisect
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Labels = Optional[Dict[str, str]]
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+#: Covers both parsing times, and backoff delays
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    60.0,
+    300.0,
+)
+
+
+class Metrics(metaclass=abc.ABCMeta):
+    """Receives counters and observations from `PullHandler` and `parse_body`.
+
+    Metrics are only computed if an instance is given, so disabling them is free,
+    apart from a `None` check. Implement this to forward to e.g. StatsD.
+    """
+
+    @abc.abstractmethod
+    def increment(self, name: str, value: float = 1, labels: Labels = None) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def observe(self, name: str, value: float, labels: Labels = None) -> None:
+        raise NotImplementedError
+
+
+def _key(name: str, labels: Labels) -> _Key:
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+@attr.s(slots=True)
+class _Histogram:
+    counts = attr.ib(type=List[int])
+    sum = attr.ib(0.0, type=float)
+    count = attr.ib(0, type=int)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{{{}}}".format(
+        ",".join('{}="{}"'.format(name, _escape(str(value))) for name, value in labels)
+    )
+
+
+@attr.s(slots=True)
+class InMemoryMetrics(Metrics):
+    """Keeps the metrics in memory, and exports them in Prometheus' text format.
+
+    Not thread safe, use one per thread, or wrap it in a lock.
+    """
+
+    buckets = attr.ib(DEFAULT_BUCKETS, type=Sequence[float])
+    counters = attr.ib(factory=dict, init=False)  # type: Dict[_Key, float]
+    histograms = attr.ib(factory=dict, init=False)  # type: Dict[_Key, _Histogram]
+
+    def increment(self, name, value=1, labels=None):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = _key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = _Histogram([0] * len(self.buckets))
+        # Only the first matching bucket, they're made cumulative when exported
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            histogram.counts[index] += 1
+        histogram.sum += value
+        histogram.count += 1
+
+    def counter(self, name: str, labels: Labels = None) -> float:
+        return self.counters.get(_key(name, labels), 0)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                lines.append("# TYPE {} counter".format(name))
+                typed.add(name)
+            lines.append("{}{} {}".format(name, _format_labels(labels), value))
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name not in typed:
+                lines.append("# TYPE {} histogram".format(name))
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                bucket_labels = labels + (("le", repr(float(bound))),)
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        name, _format_labels(bucket_labels), cumulative
+                    )
+                )
+            inf_labels = _format_labels(labels + (("le", "+Inf"),))
+            lines.append("{}_bucket{} {}".format(name, inf_labels, histogram.count))
+            lines.append(
+                "{}_sum{} {}".format(name, _format_labels(labels), histogram.sum)
+            )
+            lines.append(
+                "{}_count{} {}".format(name, _format_labels(labels), histogram.count)
+            )
+        return "\n".join(lines) + "\n"
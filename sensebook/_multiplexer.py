@@ -0,0 +1,159 @@
+import attr
+import heapq
+import itertools
+import logging
+
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from . import _abc
+from ._pull_handler import Backoff, PullHandler
+
+log = logging.getLogger(__name__)
+
+
+@attr.s(slots=True)
+class PullMultiplexer:
+    """Schedules pull requests for many `PullHandler`s, without doing any IO.
+
+    Handlers are identified by a hashable key. Call `ready` to get the requests that
+    should be sent now, and pass the outcome back with the `handle*` methods, keyed
+    by the same key. `Backoff`s are turned into deadlines, and `next_deadline` tells
+    the event loop how long it can sleep. Consecutive errors of a handler, e.g.
+    `ProtocolError`s, are backed off exponentially, like `Backoff.from_tries`.
+
+    Time is whatever the caller says it is, usually `time.monotonic()`.
+    """
+
+    _handlers = attr.ib(factory=dict, init=False)  # type: Dict[Hashable, PullHandler]
+    #: The id of the valid heap entry of each scheduled handler
+    _scheduled = attr.ib(factory=dict, init=False)  # type: Dict[Hashable, int]
+    _heap = attr.ib(factory=list, init=False)  # type: List[Tuple[float, int, Hashable]]
+    _ids = attr.ib(factory=itertools.count, init=False)
+    _in_flight = attr.ib(factory=set, init=False)
+    #: The number of consecutive errors of each handler, if any
+    _errors = attr.ib(factory=dict, init=False)  # type: Dict[Hashable, int]
+
+    def __len__(self) -> int:
+        return len(self._handlers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._handlers
+
+    def __getitem__(self, key: Hashable) -> PullHandler:
+        return self._handlers[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def _schedule(self, key: Hashable, deadline: float) -> None:
+        id_ = next(self._ids)
+        self._scheduled[key] = id_
+        heapq.heappush(self._heap, (deadline, id_, key))
+
+    def add(self, key: Hashable, handler: PullHandler, *, now: float) -> None:
+        if key in self._handlers:
+            raise ValueError("Handler already added: {!r}".format(key))
+        self._handlers[key] = handler
+        self._schedule(key, now)
+
+    def remove(self, key: Hashable) -> PullHandler:
+        # The heap entry is left in place, and skipped when it's reached
+        self._scheduled.pop(key, None)
+        self._in_flight.discard(key)
+        self._errors.pop(key, None)
+        return self._handlers.pop(key)
+
+    def next_deadline(self) -> Optional[float]:
+        """The time at which the next request is ready, or `None` if none are."""
+        heap = self._heap
+        while heap:
+            deadline, id_, key = heap[0]
+            if self._scheduled.get(key) == id_:
+                return deadline
+            heapq.heappop(heap)  # Stale entry
+        return None
+
+    def ready(self, *, now: float) -> List[Tuple[Hashable, _abc.Request]]:
+        """Return the requests that should be sent now, and mark them as in flight."""
+        heap = self._heap
+        scheduled = self._scheduled
+        rtn = []
+        while heap and heap[0][0] <= now:
+            _, id_, key = heapq.heappop(heap)
+            if scheduled.get(key) != id_:
+                continue  # Stale entry
+            del scheduled[key]
+            try:
+                request = self._handlers[key].next_request()
+            except Backoff as e:
+                # E.g. throttled by a `BackoffCoordinator`
+                self._schedule(key, now + e.delay)
+                continue
+            self._in_flight.add(key)
+            rtn.append((key, request))
+        return rtn
+
+    def _complete(
+        self, key: Hashable, now: float, method: str, *args: Any, **kwargs: Any
+    ) -> List[Any]:
+        if key not in self._in_flight:
+            raise ValueError("No request in flight for {!r}".format(key))
+        self._in_flight.remove(key)
+        handler = self._handlers[key]
+
+        frames = []  # type: List[Any]
+        delay = 0.0
+        try:
+            result = getattr(handler, method)(*args, **kwargs)
+            if result is not None:
+                # Collect one by one, to keep the frames yielded before a `Backoff`
+                for frame in result:
+                    frames.append(frame)
+        except Backoff as e:
+            log.debug("Backing off %r for %.1f seconds: %s", key, e.delay, e)
+            delay = e.delay
+            self._errors.pop(key, None)
+        except Exception as e:
+            tries = self._errors[key] = self._errors.get(key, 0) + 1
+            delay = Backoff.from_tries(str(e), tries=tries).delay
+            log.debug("Backing off %r for %.1f seconds after an error", key, delay)
+            raise
+        else:
+            self._errors.pop(key, None)
+        finally:
+            # Even if something else was raised, the handler should keep pulling
+            self._schedule(key, now + delay)
+        return frames
+
+    def handle(
+        self, key: Hashable, status_code: int, body: bytes, *, now: float
+    ) -> List[Any]:
+        """Handle the response to a request, and return the data frames.
+
+        Raise:
+            `ProtocolError` from `PullHandler.handle`. The handler is rescheduled
+            regardless, after a delay that grows with consecutive errors.
+        """
+        return self._complete(key, now, "handle", status_code, body)
+
+    def handle_parsed(
+        self,
+        key: Hashable,
+        status_code: int,
+        data: Dict[str, Any],
+        *,
+        size: int = 0,
+        now: float
+    ) -> List[Any]:
+        """Like `handle`, for a body parsed elsewhere, see `ParseOffloader`."""
+        return self._complete(key, now, "handle_parsed", status_code, data, size=size)
+
+    def handle_connection_error(self, key: Hashable, *, now: float) -> None:
+        self._complete(key, now, "handle_connection_error")
+
+    def handle_connect_timeout(self, key: Hashable, *, now: float) -> None:
+        self._complete(key, now, "handle_connect_timeout")
+
+    def handle_read_timeout(self, key: Hashable, *, now: float) -> None:
+        self._complete(key, now, "handle_read_timeout")
@@ -0,0 +1,82 @@
+import attr
+import concurrent.futures
+
+from typing import Any, Dict
+
+from ._pull_handler import PullHandler, parse_body
+from . import _utils
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Before Python 3.8
+    shared_memory = None
+
+
+def _parse_shared(name: str, size: int) -> Dict[str, Any]:
+    # Runs in a worker process. Attaching registers the block with the resource
+    # tracker shared with the parent, which unregisters it when unlinking
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return parse_body(bytes(shm.buf[:size]))
+    finally:
+        shm.close()
+
+
+@attr.s(slots=True, kw_only=True)
+class ParseOffloader:
+    """Parses large pull bodies in worker processes, to not stall the caller.
+
+    Bodies of at least `threshold` bytes are copied into shared memory, instead of
+    being pickled to the worker. Only `parse_body` is offloaded, the parsed data
+    must be handed back with `PullHandler.handle_parsed`, so the handler's state is
+    updated in the order the responses arrived. Smaller bodies, and streamed or
+    unsuccessful responses, should be given to `PullHandler.handle` as usual.
+
+    The parsed data is pickled back, and unpickling it stalls the caller too. For a
+    280 KB body, the standard library parses it in 1.6 ms, and unpickling takes
+    0.9 ms. orjson parses it in 0.7 ms, so nothing is offloaded while it's the JSON
+    backend, see `set_json_backend`.
+    """
+
+    executor = attr.ib(
+        factory=concurrent.futures.ProcessPoolExecutor,
+        type=concurrent.futures.Executor,
+    )
+    threshold = attr.ib(128 * 1024, type=int)
+
+    def wants(self, handler: PullHandler, status_code: int, body: bytes) -> bool:
+        """Whether the response should be parsed with `parse`."""
+        return (
+            len(body) >= self.threshold
+            and _utils._json_backend is not _utils.JSON_BACKENDS.get("orjson")
+            and not handler.stream
+            and _utils.safe_status_code(status_code)
+        )
+
+    def parse(self, body: bytes) -> "concurrent.futures.Future[Dict[str, Any]]":
+        """Parse the body in a worker, with the result of `parse_body` as a future.
+
+        If the future fails, give the body to `PullHandler.handle` instead, to raise
+        the error from the handler, or to parse it inline if the pool broke.
+        """
+        if shared_memory is None or not body:
+            return self.executor.submit(parse_body, body)
+        size = len(body)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            shm.buf[:size] = body
+            future = self.executor.submit(_parse_shared, shm.name, size)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def release(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(release)
+        return future
+
+    def close(self) -> None:
+        self.executor.shutdown()
@@ -1,26 +1,100 @@
 import attr
+import hashlib
+import json
+import os
 import random
+import re
 import logging
+import time
+import traceback
 
-from typing import Optional, Dict, Iterable, Any, List
-
-from . import _utils, _abc
+from typing import Optional, Dict, Iterable, Any, List, Callable
 
+from . import _utils, _abc, _coordinator, _dedup, _frames, _incremental, _metrics
+from . import _timeouts
 
 log = logging.getLogger(__name__)
 
 
+def _serialize(data: Any) -> bytes:
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    if isinstance(data, str):
+        return data.encode("utf-8", "replace")
+    try:
+        return json.dumps(data, default=repr).encode("utf-8", "replace")
+    except ValueError:  # Circular references
+        return repr(data).encode("utf-8", "replace")
+
+
 class ProtocolError(Exception):
-    """Raised if some assumption we made about Facebook's protocol is incorrect."""
+    """Raised if some assumption we made about Facebook's protocol is incorrect.
+
+    Errors are often kept around, e.g. by error reporters, so only a bounded capture
+    of the offending data is kept: a `preview` of the first `max_preview` bytes, and
+    the `size` and SHA-256 `digest` of the whole. `data` is only kept if it's no
+    larger than the preview.
+
+    If `sample_dir` is set, the whole data is written to `<digest>.bin` in it, with
+    probability `sample_rate`, and the path kept as `sample_path`.
+    """
+
+    max_preview = 1024
+    sample_dir = None  # type: Optional[str]
+    sample_rate = 1.0
 
     def __init__(self, msg, data=None):
-        self.data = data
         if isinstance(data, dict):
             self.type = data.get("t")
         else:
             self.type = None
+        raw = _serialize(data) if data is not None else b""
+        self.size = len(raw)
+        self.digest = hashlib.sha256(raw).hexdigest()
+        self.preview = raw[: self.max_preview].decode("utf-8", "replace")
+        self.data = data if self.size <= self.max_preview else None
+        self.sample_path = None  # type: Optional[str]
+        if self.sample_dir is not None and random.random() < self.sample_rate:
+            self.sample_path = self._write_sample(raw)
         super().__init__(msg)
 
+    def _write_sample(self, raw: bytes) -> Optional[str]:
+        path = os.path.join(self.sample_dir, self.digest + ".bin")
+        try:
+            with open(path, "wb") as f:
+                f.write(raw)
+        except OSError:
+            log.warning("Could not write sample to %s", path, exc_info=True)
+            return None
+        return path
+
+    def clear_frames(self) -> None:
+        """Clear the local variables in the traceback, of this error and its causes.
+
+        The frames hold e.g. the body being handled, so call this before keeping the
+        error around. Done by the drivers after `on_error` returns.
+        """
+        error = self  # type: Optional[BaseException]
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if error.__traceback__ is not None:
+                traceback.clear_frames(error.__traceback__)
+            error = error.__cause__ or error.__context__
+
+
+def _drop_document(error: ValueError) -> ValueError:
+    """Drop the document kept by `json.JSONDecodeError` or `UnicodeDecodeError`.
+
+    It's usually the whole body. The position of the error is kept.
+    """
+    if isinstance(error, UnicodeDecodeError):
+        error.object = b""
+        error.args = (error.encoding, b"", error.start, error.end, error.reason)
+    elif isinstance(getattr(error, "doc", None), (str, bytes)):
+        error.doc = error.doc[:0]
+    return error
+
 
 class Backoff(Exception):
     """Raised to signal the client to wait for the time specified by `delay`."""
@@ -49,35 +123,197 @@ class PullRequest(_abc.Request):
     """Handles polling for events."""
 
     params = attr.ib(type=Dict[str, Any])
+    #: Pre-encoded URL, see `PullHandler.next_request`
+    template = attr.ib(None, type=Optional[_abc.RequestTemplate], eq=False, repr=False)
+    #: The server holds the request open for 50 seconds
+    read_timeout = attr.ib(60, type=float)
+    #: Slighty over a multiple of 3, see `TCP packet retransmission window`. Lowered
+    #: on good networks by `AdaptiveTimeouts`
+    connect_timeout = attr.ib(10, type=float)
     method = "GET"
     host = "0-edge-chat.facebook.com"
     target = "/pull"
-    #: The server holds the request open for 50 seconds
-    read_timeout = 60
-    #: Slighty over a multiple of 3, see `TCP packet retransmission window`
-    connect_timeout = 10  # TODO: Might be a bit too high
 
+    @property
+    def url(self) -> str:
+        if self.template is None:
+            return super().url
+        return self.template.url(self.params)
+
+    @property
+    def url_bytes(self) -> bytes:
+        if self.template is None:
+            return super().url_bytes
+        return self.template.url_bytes(self.params)
 
-def parse_body(body: bytes) -> Dict[str, Any]:
+    @property
+    def routing_key(self) -> Optional[str]:
+        """The sticky pool, from the last `lb` message."""
+        return self.params.get("sticky_pool")
+
+
+def parse_body(
+    body: bytes, metrics: Optional[_metrics.Metrics] = None
+) -> Dict[str, Any]:
+    try:
+        if metrics is None:
+            return _utils.load_json(_utils.strip_json_cruft_bytes(body))
+        start = time.perf_counter()
+        rtn = _utils.load_json(_utils.strip_json_cruft_bytes(body))
+        metrics.observe("sensebook_parse_body_seconds", time.perf_counter() - start)
+        metrics.increment("sensebook_parse_body_bytes_total", len(body))
+        return rtn
+    except ValueError as e:
+        error = _drop_document(e)
+    # Only decode the body when something went wrong, to tell the errors apart
     try:
         decoded = body.decode("utf-8")
     except UnicodeDecodeError as e:
-        raise ProtocolError("Invalid unicode data", body) from e
-    try:
-        return _utils.load_json(_utils.strip_json_cruft(decoded))
-    except ValueError as e:
-        raise ProtocolError("Invalid JSON data", decoded) from e
+        raise ProtocolError("Invalid unicode data", body) from _drop_document(e)
+    raise ProtocolError("Invalid JSON data", decoded) from error
+
+
+#: Characters that change the nesting depth, or start a string
+_STRUCTURE_RE = re.compile(rb'["{}]')
+#: Characters that end a string, or escape the next character
+_STRING_RE = re.compile(rb'["\\]')
+
+
+@attr.s(slots=True)
+class StreamParser:
+    """Incrementally split a stream of (cruft-prefixed) JSON objects.
+
+    Chunks can be split at any byte, including inside strings and escape sequences.
+    """
+
+    _buffer = attr.ib(factory=bytearray, init=False)
+    _start = attr.ib(None, init=False)
+    _pos = attr.ib(0, init=False)
+    _depth = attr.ib(0, init=False)
+    _in_string = attr.ib(False, init=False)
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+
+    def next_document(self) -> Optional[bytes]:
+        """Return the next complete JSON object, or `None` if more data is needed."""
+        buf = self._buffer
+        while True:
+            if self._start is None:
+                # Skip `for(;;);`, and anything else between the objects
+                start = buf.find(b"{", self._pos)
+                if start == -1:
+                    del buf[:]
+                    self._pos = 0
+                    return None
+                self._start = self._pos = start
+                self._depth = 0
+
+            if self._in_string:
+                match = _STRING_RE.search(buf, self._pos)
+                if not match:
+                    self._pos = len(buf)
+                    return None
+                if match.group() == b'"':
+                    self._in_string = False
+                    self._pos = match.end()
+                elif match.end() < len(buf):
+                    # Skip the escaped character
+                    self._pos = match.end() + 1
+                else:
+                    # The escaped character is in the next chunk
+                    self._pos = match.start()
+                    return None
+                continue
+
+            match = _STRUCTURE_RE.search(buf, self._pos)
+            if not match:
+                self._pos = len(buf)
+                return None
+            self._pos = match.end()
+            char = match.group()
+            if char == b'"':
+                self._in_string = True
+            elif char == b"{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    document = bytes(buf[self._start : self._pos])
+                    del buf[: self._pos]
+                    self._start = None
+                    self._pos = 0
+                    return document
+
+    def __iter__(self):
+        while True:
+            document = self.next_document()
+            if document is None:
+                return
+            yield document
+
+    def reset(self) -> None:
+        """Drop any buffered data, e.g. after an error."""
+        self._buffer = bytearray()
+        self._start = None
+        self._pos = self._depth = 0
+        self._in_string = False
+
+    def end(self) -> None:
+        """Reset the parser, raising if the stream ended inside a JSON object."""
+        incomplete = self._start is not None
+        data = bytes(self._buffer)
+        self.reset()
+        if incomplete:
+            raise ProtocolError("Stream ended inside a JSON object", data)
+
+
+#: Bumped when the format of `PullHandler.snapshot` changes
+SNAPSHOT_VERSION = 1
+
+_TYPE_HANDLER_PREFIX = "_handle_type_"
+
+#: A function handling a protocol message, `func(handler, data) -> frames`
+TypeHandler = Callable[[Any, Dict[str, Any]], Optional[Iterable[Any]]]
 
 
 @attr.s(slots=True, kw_only=True)
 class PullHandler:
     # _state = attr.ib(type=_abc.State)
     mark_alive = attr.ib(False, type=bool)
+    #: Use `mode=stream`, and feed the response body to `feed` as it arrives
+    stream = attr.ib(False, type=bool)
+    #: Drop duplicate frames, and count sequence regressions
+    dedup = attr.ib(None, type=Optional[_dedup.Deduplicator])
+    #: Receives counters and timings, see `Metrics`
+    metrics = attr.ib(None, type=Optional[_metrics.Metrics])
+    #: Yield `Frame`s instead of raw dicts, see `wrap_frame`
+    typed_frames = attr.ib(False, type=bool)
+    #: Decode `ms` and `batches` one frame at a time, so the decoded frames are never
+    #: all in memory at once. A `str` copy of the body is kept while the frames are
+    #: iterated, which takes 1, 2 or 4 bytes per character, depending on the widest
+    #: one, so e.g. an emoji makes it 4x the body. Only saves memory on mostly ASCII
+    #: bodies, but is slower. Type handlers get iterators instead of lists
+    incremental = attr.ib(False, type=bool)
+    #: Shared between handlers, to spread out reconnects, see `BackoffCoordinator`
+    coordinator = attr.ib(None, type=Optional[_coordinator.BackoffCoordinator])
+    #: Adapts the request timeouts to the observed timings
+    timeouts = attr.ib(None, type=Optional[_timeouts.AdaptiveTimeouts])
     _backoff_tries = attr.ib(0, type=int)
     _clientid = attr.ib(type=str)
     _sticky_token = attr.ib(None, type=str)
     _sticky_pool = attr.ib(None, type=str)
     _seq = attr.ib(0, type=int)
+    _stream_parser = attr.ib(factory=StreamParser, init=False, repr=False)
+    #: The template for `next_request`, and the public settings it was made with
+    _template = attr.ib(None, init=False, repr=False, eq=False)
+    _template_key = attr.ib(None, init=False, repr=False, eq=False)
+    #: The last delay given by the coordinator, for its decorrelated jitter
+    _failure_delay = attr.ib(0.0, init=False, repr=False, eq=False)
+    #: When the last request was made, according to the clock of `timeouts`
+    _sent_at = attr.ib(None, init=False, repr=False, eq=False)
+    #: The latency of the last response, until it's known whether the poll was idle
+    _latency = attr.ib(None, init=False, repr=False, eq=False)
 
     @_clientid.default
     def _default_client_id(self):
@@ -96,12 +332,44 @@ class PullHandler:
             return int(data["seq"])
         return self._seq
 
+    def _update_seq(self, data: Any) -> None:
+        seq = self._parse_seq(data)
+        if self.dedup is not None:
+            self.dedup.record_seq(self._seq, seq)
+        self._seq = seq
+
+    def _backoff(self, backoff: Backoff) -> Backoff:
+        if self.metrics is not None:
+            labels = {"reason": str(backoff)}
+            self.metrics.increment("sensebook_pull_backoffs_total", labels=labels)
+            self.metrics.observe(
+                "sensebook_pull_backoff_delay_seconds", backoff.delay, labels=labels
+            )
+        return backoff
+
+    def _observe_latency(self) -> None:
+        # Only reported to `timeouts` if the poll turns out to have been idle
+        if self.timeouts is not None and self._sent_at is not None:
+            self._latency = self.timeouts.clock() - self._sent_at
+            self._sent_at = None
+
+    def _coordinator_key(self) -> Any:
+        return PullRequest.host, self._sticky_pool
+
+    def _coordinated_failure(self, message: str) -> Backoff:
+        self._failure_delay = self.coordinator.failure(
+            self._coordinator_key(), self._failure_delay
+        )
+        return self._backoff(Backoff(message, delay=self._failure_delay))
+
     def _handle_status(self, status_code, body):
         if status_code == 503:
+            if self.coordinator is not None:
+                raise self._coordinated_failure("Server is unavailable")
             # In Facebook's JS code, this delay is set by their servers on every call to
             # `/ajax/presence/reconnect.php`, as `proxy_down_delay_millis`, but we'll
             # just set a sensible default
-            raise Backoff("Server is unavailable", delay=60)
+            raise self._backoff(Backoff("Server is unavailable", delay=60))
         else:
             raise ProtocolError(
                 "Unknown server error response: {}".format(status_code), body
@@ -111,13 +379,32 @@ class PullHandler:
 
     def _handle_type_backoff(self, data):
         self._backoff_tries += 1
-        raise Backoff.from_tries(
-            "Server told us to back off", tries=self._backoff_tries
+        raise self._backoff(
+            Backoff.from_tries("Server told us to back off", tries=self._backoff_tries)
         )
 
     def _handle_type_batched(self, data):
-        for item in data["batches"]:
-            yield from self.handle_data(item)
+        # Flatten (nested) batches with a stack of iterators, and dispatch the items
+        # directly, instead of recursing through `handle_data`
+        table = self.type_handlers()
+        stack = [iter(data["batches"])]
+        while stack:
+            for item in stack[-1]:
+                self._update_seq(item)
+                type_ = item.get("t")
+                if self.metrics is not None:
+                    self._count_frame(type_)
+                if type_ == "batched":
+                    stack.append(iter(item["batches"]))
+                    break
+                method = table.get(type_)
+                if method is None:
+                    raise ProtocolError("Unknown protocol message", item)
+                frames = method(self, item)
+                if frames:
+                    yield from frames
+            else:
+                stack.pop()
 
     def _handle_type_continue(self, data):
         self._backoff_tries = 0
@@ -126,7 +413,7 @@ class PullHandler:
     def _handle_type_fullReload(self, data):
         # Not yet sure what consequence this has.
         # But I know that if this is sent, then some messages/events may not have been
-        # sent to us, so we should query for them with a graphqlbatch-something.
+        # sent to us, so we should query for them, see `GraphQLBatcher.catch_up`.
         self._backoff_tries = 0
         if "ms" in data:
             return data["ms"]
@@ -134,12 +421,22 @@ class PullHandler:
     def _handle_type_heartbeat(self, data):
         # Request refresh, no need to do anything
         log.debug("Heartbeat")
+        if self.timeouts is not None and self._latency is not None:
+            # The server held the poll until now, since nothing happened
+            self.timeouts.observe_hold(self._latency)
+            self._latency = None
 
     def _handle_type_lb(self, data):
         lb_info = data["lb_info"]
+        if self.metrics is not None:
+            if lb_info["sticky"] != self._sticky_token:
+                self.metrics.increment("sensebook_pull_sticky_token_changes_total")
+            if lb_info.get("pool", self._sticky_pool) != self._sticky_pool:
+                self.metrics.increment("sensebook_pull_sticky_pool_changes_total")
         self._sticky_token = lb_info["sticky"]
         if "pool" in lb_info:
             self._sticky_pool = lb_info["pool"]
+        self._template = None
 
     def _handle_type_msg(self, data):
         self._backoff_tries = 0
@@ -158,42 +455,186 @@ class PullHandler:
     def _handle_type_test_streaming(self, data):
         raise ProtocolError("Unused protocol message `test_streaming`", data)
 
+    # Type handler registry
+
+    @classmethod
+    def _build_type_handlers(cls) -> Dict[str, TypeHandler]:
+        table = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                if name.startswith(_TYPE_HANDLER_PREFIX):
+                    table[name[len(_TYPE_HANDLER_PREFIX) :]] = value
+            table.update(vars(klass).get("_registered_type_handlers", {}))
+        cls._type_handlers = table
+        return table
+
+    @classmethod
+    def type_handlers(cls) -> Dict[str, TypeHandler]:
+        """Return the dispatch table, mapping `t` types to their handler function.
+
+        Built once per class, from the `_handle_type_*` methods and the handlers
+        registered with `register_type_handler`.
+        """
+        return cls.__dict__.get("_type_handlers") or cls._build_type_handlers()
+
+    @classmethod
+    def register_type_handler(cls, type_: str, func: TypeHandler = None):
+        """Register, or override, the handler function for a `t` type.
+
+        The function is called as `func(handler, data)`, and should return an
+        iterable of data frames, or `None`. Applies to subclasses as well, unless they
+        define their own handler. Can be used as a decorator.
+        """
+
+        def register(func):
+            if "_registered_type_handlers" not in cls.__dict__:
+                cls._registered_type_handlers = {}
+            cls._registered_type_handlers[type_] = func
+            # Invalidate the tables of this class, and all subclasses
+            classes = [cls]
+            while classes:
+                klass = classes.pop()
+                if "_type_handlers" in klass.__dict__:
+                    delattr(klass, "_type_handlers")
+                classes.extend(klass.__subclasses__())
+            return func
+
+        return register if func is None else register(func)
+
+    def _count_frame(self, type_: Any) -> None:
+        labels = {"type": str(type_)}
+        self.metrics.increment("sensebook_pull_frames_total", labels=labels)
+
     # Public methods
 
     def handle_data(self, data: Dict[str, Any]) -> Iterable[Any]:
         # Don't worry if you've never seen a lot of these types, this is implemented
         # based on reading the JS source for Facebook's `ChannelManager`
-        self._seq = self._parse_seq(data)
-
+        self._update_seq(data)
         type_ = data.get("t")
-        method = getattr(self, "_handle_type_{}".format(type_), None)
-        if method:
-            return method(data) or ()
-        else:
+        if self.metrics is not None:
+            self._count_frame(type_)
+
+        cls = type(self)
+        table = cls.__dict__.get("_type_handlers") or cls._build_type_handlers()
+        method = table.get(type_)
+        if method is None:
             raise ProtocolError("Unknown protocol message", data)
+        frames = method(self, data)
+        if not frames:
+            return ()
+        if self.dedup is not None:
+            frames = self.dedup.filter(frames)
+        if self.typed_frames:
+            return map(_frames.wrap_frame, frames)
+        return frames
+
+    def snapshot(self) -> bytes:
+        """Serialize the connection state, so it can be resumed with `restore`.
+
+        Cheap enough to call after every pull.
+        """
+        data = [
+            SNAPSHOT_VERSION,
+            self._clientid,
+            self._sticky_token,
+            self._sticky_pool,
+            self._seq,
+            self._backoff_tries,
+        ]
+        return json.dumps(data, separators=(",", ":")).encode("ascii")
+
+    def restore(self, snapshot: bytes) -> None:
+        """Resume the connection state from `snapshot`.
+
+        Raise:
+            `ValueError` if the snapshot is invalid, or of an unknown version.
+        """
+        try:
+            data = json.loads(snapshot.decode("ascii"))
+            version = data[0]
+        except (TypeError, ValueError, LookupError) as e:
+            raise ValueError("Invalid snapshot: {!r}".format(snapshot)) from e
+        if version != SNAPSHOT_VERSION:
+            raise ValueError("Unknown snapshot version: {!r}".format(version))
+        try:
+            (
+                _,
+                self._clientid,
+                self._sticky_token,
+                self._sticky_pool,
+                self._seq,
+                self._backoff_tries,
+            ) = data
+        except ValueError as e:
+            raise ValueError("Invalid snapshot: {!r}".format(snapshot)) from e
+        self._template = None
 
     def next_request(self) -> _abc.Request:
+        """Return the next request to send.
+
+        Raise:
+            `Backoff` if the coordinator doesn't allow a request yet.
+        """
+        if self.coordinator is not None:
+            delay = self.coordinator.acquire(self._coordinator_key())
+            if delay > 0:
+                raise self._backoff(Backoff("Throttled by coordinator", delay=delay))
+        params = {
+            "clientid": self._clientid,
+            "sticky_token": self._sticky_token,
+            "sticky_pool": self._sticky_pool,
+            "msgs_recv": 0,
+            "seq": self._seq,
+            "state": "active" if self.mark_alive else "offline",
+        }
+        if self.stream:
+            params["mode"] = "stream"
+            params["format"] = "json"
+        # Only `seq` changes between most requests, so the rest of the URL is encoded
+        # once, until the sticky parameters or settings change
+        key = (self.mark_alive, self.stream)
+        if self._template is None or self._template_key != key:
+            self._template = _abc.RequestTemplate(
+                PullRequest.host, PullRequest.target, params, dynamic=["seq"]
+            )
+            self._template_key = key
+        if self.timeouts is None:
+            return PullRequest(params=params, template=self._template)
+        self._sent_at = self.timeouts.clock()
+        self._latency = None
         return PullRequest(
-            params={
-                "clientid": self._clientid,
-                "sticky_token": self._sticky_token,
-                "sticky_pool": self._sticky_pool,
-                "msgs_recv": 0,
-                "seq": self._seq,
-                "state": "active" if self.mark_alive else "offline",
-            }
+            params=params,
+            template=self._template,
+            read_timeout=self.timeouts.read_timeout,
+            connect_timeout=self.timeouts.connect_timeout,
         )
 
     def handle_connection_error(self) -> None:
+        if self.coordinator is not None:
+            raise self._coordinated_failure("Could not pull")
         self._backoff_tries += 1
-        raise Backoff.from_tries("Could not pull", tries=self._backoff_tries)  # Unsure
+        raise self._backoff(
+            Backoff.from_tries("Could not pull", tries=self._backoff_tries)  # Unsure
+        )
+
+    def observe_connect(self, seconds: float) -> None:
+        """Called by drivers with the time it took to establish a new connection."""
+        if self.timeouts is not None:
+            self.timeouts.observe_connect(seconds)
 
     def handle_connect_timeout(self) -> None:
+        if self.timeouts is not None:
+            self.timeouts.connect_timed_out()
+        if self.coordinator is not None:
+            raise self._coordinated_failure("Connection lost")
         # Keep trying every minute
-        raise Backoff("Connection lost", delay=60)
+        raise self._backoff(Backoff("Connection lost", delay=60))
 
     def handle_read_timeout(self) -> None:
         log.debug("Read timeout")
+        if self.timeouts is not None:
+            self.timeouts.read_timed_out()
         # The server might not send data for a while, so we just try again
 
     def handle(self, status_code: int, body: bytes) -> Iterable[Any]:
@@ -203,29 +644,104 @@ class PullHandler:
             `ProtocolError` if some assumption we made about Facebook's protocol was
             wrong.
         """
+        if self.metrics is not None:
+            labels = {"status": str(status_code)}
+            self.metrics.increment("sensebook_pull_responses_total", labels=labels)
+
         if not _utils.safe_status_code(status_code):
             self._handle_status(status_code, body)
             return
 
-        data = parse_body(body)
+        if self.coordinator is not None:
+            self.coordinator.success(self._coordinator_key())
+            self._failure_delay = 0.0
+
+        self._observe_latency()
+
+        if self.stream:
+            # A whole body, so nothing is left of an earlier one, if it was abandoned
+            self._stream_parser.reset()
+            yield from self.feed(body)
+            yield from self.end()
+            return
+
+        if self.metrics is not None:
+            self.metrics.increment("sensebook_pull_bytes_total", len(body))
+
+        if self.incremental:
+            yield from self._handle_incremental(body)
+            return
+
+        data = parse_body(body, self.metrics)
 
         yield from self.handle_data(data)
 
+    def _handle_incremental(self, body: bytes) -> Iterable[Any]:
+        # Only decoding errors are wrapped, `ms` and `batches` are decoded while the
+        # frames are iterated, so they may also come from `handle_data`
+        try:
+            data = _incremental.load_data(body)
+            yield from self.handle_data(data)
+        except json.JSONDecodeError as e:
+            raise ProtocolError("Invalid JSON data", body) from _drop_document(e)
+        except UnicodeDecodeError as e:
+            raise ProtocolError("Invalid unicode data", body) from _drop_document(e)
+
+    def handle_parsed(
+        self, status_code: int, data: Dict[str, Any], *, size: int = 0
+    ) -> Iterable[Any]:
+        """Like `handle`, for a successful body already parsed with `parse_body`.
+
+        Used when the parsing is done elsewhere, e.g. by a `ParseOffloader`. `size`
+        is the length of the body, for metrics.
+
+        Raise:
+            `ProtocolError` if some assumption we made about Facebook's protocol was
+            wrong.
+        """
+        if self.metrics is not None:
+            labels = {"status": str(status_code)}
+            self.metrics.increment("sensebook_pull_responses_total", labels=labels)
+            self.metrics.increment("sensebook_pull_bytes_total", size)
+
+        if self.coordinator is not None:
+            self.coordinator.success(self._coordinator_key())
+            self._failure_delay = 0.0
+
+        self._observe_latency()
+
+        yield from self.handle_data(data)
 
-# class StreamingListener(Listener):
-#     """Handles listening for events, using a streaming pull request"""
+    def _handle_stream(self) -> Iterable[Any]:
+        try:
+            for document in self._stream_parser:
+                yield from self.handle_data(parse_body(document, self.metrics))
+        except Exception:
+            # The rest of the body can't be trusted, and mustn't leak into the next
+            self._stream_parser.reset()
+            raise
 
-#     def _get_pull_params(self):
-#         rtn = super()._get_pull_params()
-#         rtn["mode"] = "stream"
-#         rtn["format"] = "json"
-#         return rtn
+    def feed(self, chunk: bytes) -> Iterable[Any]:
+        """Handle a chunk of a streaming pull body, and yield completed data frames.
 
-#     async def pull(self):
-#         try:
-#             r = await self._pull(stream=True)
-#             return list(r.iter_json())
-#         except (requests.ConnectionError, requests.Timeout):
-#             # If we lost our connection, keep trying every minute
-#             await trio.sleep(60)
-#             return None
+        The chunk is buffered immediately, but is only parsed when the result is
+        iterated. Only successful responses should be fed, others should be given to
+        `handle` in full.
+
+        Raise:
+            `ProtocolError` if some assumption we made about Facebook's protocol was
+            wrong.
+        """
+        if self.metrics is not None:
+            self.metrics.increment("sensebook_pull_bytes_total", len(chunk))
+        self._stream_parser.feed(chunk)
+        return self._handle_stream()
+
+    def end(self) -> Iterable[Any]:
+        """Signal the end of a streaming pull body, and yield the remaining frames.
+
+        Raise:
+            `ProtocolError` if the body ended in the middle of a JSON object.
+        """
+        yield from self._handle_stream()
+        self._stream_parser.end()
@@ -0,0 +1,194 @@
+import attr
+import mmap
+import struct
+import time
+
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+from ._pull_handler import Backoff, ProtocolError, PullHandler, PullRequest
+
+_MAGIC = b"SBRC"
+#: Bumped when the file format changes
+RECORDING_VERSION = 1
+_HEADER = struct.Struct("<4sH")  # Magic, version
+_RECORD = struct.Struct("<ddHI")  # Sent, received, status code, body length
+
+
+@attr.s(slots=True, frozen=True)
+class Record:
+    """A recorded response. `body` is a view into the memory-mapped recording."""
+
+    #: Unix timestamps of when the request was sent, and the response received
+    sent = attr.ib(type=float)
+    received = attr.ib(type=float)
+    status_code = attr.ib(type=int)
+    body = attr.ib(type=memoryview, repr=False)
+
+
+@attr.s(slots=True, kw_only=True)
+class Recorder:
+    """Wraps a `PullHandler`, and appends every response it handles to `path`.
+
+    Use it in place of the handler, e.g. with `sensebook.sync.run`. Records are
+    written before they are handled, so responses that raise are recorded as well.
+    Connection errors and timeouts are not recorded.
+
+    Streamed bodies are buffered until `end`, and recorded as a single response.
+    `handle_parsed` raises, as the body isn't available, so don't use a recorder
+    with a `ParseOffloader`.
+    """
+
+    handler = attr.ib(type=PullHandler)
+    path = attr.ib(type=str)
+    clock = attr.ib(time.time, type=Callable[[], float])
+    _file = attr.ib(init=False, repr=False)
+    _sent = attr.ib(None, init=False, type=Optional[float])
+    _stream = attr.ib(factory=bytearray, init=False, repr=False)
+
+    @_file.default
+    def _open(self):
+        f = open(self.path, "ab")
+        if f.tell() == 0:
+            f.write(_HEADER.pack(_MAGIC, RECORDING_VERSION))
+        return f
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.handler, name)
+
+    def next_request(self) -> PullRequest:
+        self._sent = self.clock()
+        return self.handler.next_request()
+
+    def _write(self, status_code: int, body: bytes) -> None:
+        received = self.clock()
+        sent = received if self._sent is None else self._sent
+        self._file.write(_RECORD.pack(sent, received, status_code, len(body)))
+        self._file.write(body)
+        self._file.flush()
+
+    def handle(self, status_code: int, body: bytes) -> Iterable[Any]:
+        self._write(status_code, body)
+        return self.handler.handle(status_code, body)
+
+    def handle_parsed(
+        self, status_code: int, data: Dict[str, Any], *, size: int = 0
+    ) -> Iterable[Any]:
+        """Raise, as the parsed data can't be recorded.
+
+        Raise:
+            `TypeError`
+        """
+        raise TypeError("Can't record parsed data, give the body to `handle`")
+
+    def feed(self, chunk: bytes) -> Iterable[Any]:
+        self._stream += chunk
+        return self.handler.feed(chunk)
+
+    def end(self) -> Iterable[Any]:
+        # Only successful responses are streamed
+        self._write(200, self._stream)
+        self._stream = bytearray()
+        return self.handler.end()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def iter_recording(data: bytes) -> Iterator[Record]:
+    """Yield the records in data written by a `Recorder`, without copying bodies.
+
+    A truncated last record, e.g. from a crash while recording, is ignored.
+
+    Raise:
+        `ValueError` if the data is invalid, or of an unknown version.
+    """
+    view = memoryview(data)
+    try:
+        magic, version = _HEADER.unpack_from(view)
+    except struct.error as e:
+        raise ValueError("Invalid recording data") from e
+    if magic != _MAGIC:
+        raise ValueError("Invalid recording data")
+    if version != RECORDING_VERSION:
+        raise ValueError("Unknown recording version: {!r}".format(version))
+    offset = _HEADER.size
+    unpack_from = _RECORD.unpack_from
+    while offset + _RECORD.size <= len(view):
+        sent, received, status_code, length = unpack_from(view, offset)
+        offset += _RECORD.size
+        if offset + length > len(view):
+            break
+        yield Record(sent, received, status_code, view[offset : offset + length])
+        offset += length
+
+
+@attr.s(slots=True, kw_only=True)
+class ReplayStats:
+    records = attr.ib(0, type=int)
+    frames = attr.ib(0, type=int)
+    backoffs = attr.ib(0, type=int)
+    errors = attr.ib(0, type=int)
+    #: Wall-clock time spent replaying
+    seconds = attr.ib(0.0, type=float)
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds else 0.0
+
+
+def replay(
+    path: str,
+    handlers: Sequence[PullHandler],
+    *,
+    paced: bool = False,
+    speed: float = 1.0,
+    on_frame: Optional[Callable[[Any], Any]] = None,
+    clock: Callable[[], float] = time.perf_counter,
+    sleep: Callable[[float], Any] = time.sleep
+) -> ReplayStats:
+    """Feed the responses recorded in `path` through every handler in turn.
+
+    By default the records are replayed as fast as possible. With `paced`, the
+    delays between the recorded responses are kept, divided by `speed`.
+    `Backoff` and `ProtocolError` are counted, not raised, and backoff delays are
+    not waited for.
+
+    Raise:
+        `ValueError` if the file is not a valid recording.
+    """
+    stats = ReplayStats()
+    with open(path, "rb") as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        start = clock()
+        first = None  # type: Optional[float]
+        for record in iter_recording(m):
+            if paced:
+                if first is None:
+                    first = record.received
+                delay = (record.received - first) / speed - (clock() - start)
+                if delay > 0:
+                    sleep(delay)
+            stats.records += 1
+            # The handlers expect bytes, and must not keep views of the map
+            status_code, body = record.status_code, bytes(record.body)
+            for handler in handlers:
+                try:
+                    for frame in handler.handle(status_code, body):
+                        stats.frames += 1
+                        if on_frame is not None:
+                            on_frame(frame)
+                except Backoff:
+                    stats.backoffs += 1
+                except ProtocolError:
+                    stats.errors += 1
+        stats.seconds = clock() - start
+        record = None
+    finally:
+        try:
+            m.close()
+        except BufferError:
+            # A record is still referenced, e.g. by the traceback of an exception
+            # from `on_frame`, so leave the map to be closed by the garbage collector
+            pass
+    return stats
@@ -0,0 +1,86 @@
+import attr
+import collections
+import time
+
+from typing import Callable, Deque
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(max(value, low), high)
+
+
+@attr.s(slots=True, kw_only=True)
+class AdaptiveTimeouts:
+    """Derives the timeouts of `PullRequest`s from recently observed timings.
+
+    The server holds an idle long poll for a while, then sends a heartbeat. The read
+    timeout is the longest of the last `window` holds, plus a margin of
+    `read_margin` seconds and `rtt_factor` round trips, so a dead connection is
+    noticed soon after the heartbeat should have arrived. The round trip time is
+    estimated by the slowest connect time, which is at least one round trip.
+    Responses with messages return before the hold, so they don't shorten it.
+
+    The connect timeout is the slowest of the last connect times, reported by the
+    driver, multiplied by `connect_factor`. Both are kept within bounds. Until
+    `min_samples` timings are observed, the maximum is used.
+
+    Timeouts widen the window, so a too aggressive timeout corrects itself. Can be
+    shared by the handlers of a single network path.
+    """
+
+    window = attr.ib(20, type=int)
+    min_samples = attr.ib(3, type=int)
+    read_margin = attr.ib(2.0, type=float)
+    rtt_factor = attr.ib(2.0, type=float)
+    connect_factor = attr.ib(3.0, type=float)
+    min_read_timeout = attr.ib(5.0, type=float)
+    max_read_timeout = attr.ib(60.0, type=float)
+    min_connect_timeout = attr.ib(1.0, type=float)
+    max_connect_timeout = attr.ib(10.0, type=float)
+    clock = attr.ib(time.monotonic, type=Callable[[], float])
+    _holds = attr.ib(init=False, repr=False)  # type: Deque[float]
+    _connect_times = attr.ib(init=False, repr=False)  # type: Deque[float]
+
+    @_holds.default
+    def _make_holds(self):
+        return collections.deque(maxlen=self.window)
+
+    @_connect_times.default
+    def _make_connect_times(self):
+        return collections.deque(maxlen=self.window)
+
+    @property
+    def read_timeout(self) -> float:
+        if len(self._holds) < self.min_samples:
+            return self.max_read_timeout
+        rtt = max(self._connect_times, default=0.0)
+        return _clamp(
+            max(self._holds) + self.read_margin + rtt * self.rtt_factor,
+            self.min_read_timeout,
+            self.max_read_timeout,
+        )
+
+    @property
+    def connect_timeout(self) -> float:
+        if len(self._connect_times) < self.min_samples:
+            return self.max_connect_timeout
+        return _clamp(
+            max(self._connect_times) * self.connect_factor,
+            self.min_connect_timeout,
+            self.max_connect_timeout,
+        )
+
+    def observe_hold(self, seconds: float) -> None:
+        """Observe how long the server held an idle poll, e.g. before a heartbeat."""
+        self._holds.append(seconds)
+
+    def observe_connect(self, seconds: float) -> None:
+        self._connect_times.append(seconds)
+
+    def read_timed_out(self) -> None:
+        # The server held the poll for at least as long as the timeout. Pretend it
+        # was twice as long, so the next timeout is longer
+        self._holds.append(self.read_timeout * 2)
+
+    def connect_timed_out(self) -> None:
+        self._connect_times.append(self.connect_timeout * 2 / self.connect_factor)
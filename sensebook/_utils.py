@@ -1,10 +1,20 @@
-import bs4
 import datetime
+import html.parser
 import json
 import random
 import urllib.parse
 
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Union, Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
 
 
 def default_user_agent() -> str:
@@ -14,6 +24,9 @@ def default_user_agent() -> str:
 
 
 def parse_form(html: str) -> Tuple[str, str, Dict[str, str]]:
+    # Imported here, since `bs4` is slow to import, and only needed when logging in
+    import bs4
+
     soup = bs4.BeautifulSoup(html, "html.parser")
     form = soup.form
     if form is None or not form.has_attr("action"):
@@ -26,6 +39,48 @@ def parse_form(html: str) -> Tuple[str, str, Dict[str, str]]:
     return form.get("method", "GET"), form["action"], data
 
 
+class _FormFound(Exception):
+    pass
+
+
+class _FormParser(html.parser.HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.form = None  # type: Optional[Dict[str, str]]
+        self.data = {}  # type: Dict[str, str]
+        self.depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "form":
+            if self.form is None:
+                self.form = {name: value or "" for name, value in attrs}
+            self.depth += 1
+        elif tag == "input" and self.depth:
+            attrs = dict(attrs)
+            if "name" in attrs and "value" in attrs:
+                self.data[attrs["name"] or ""] = attrs["value"] or ""
+
+    def handle_endtag(self, tag):
+        if tag == "form" and self.depth:
+            self.depth -= 1
+            if not self.depth:
+                raise _FormFound  # Stop parsing the rest of the page
+
+
+def extract_form(html: str) -> Tuple[str, str, Dict[str, str]]:
+    """Like `parse_form`, but stops at the end of the first form, without a tree."""
+    parser = _FormParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except _FormFound:
+        pass
+    form = parser.form
+    if form is None or "action" not in form:
+        raise ValueError("Could not find `form` element!")
+    return form.get("method", "GET"), form["action"], parser.data
+
+
 def build_url(
     *, host: str, target: str, params: Dict[str, Any], secure: bool = True
 ) -> str:
@@ -42,8 +97,71 @@ def strip_json_cruft(text: str) -> str:
         raise ValueError("No JSON object found: {!r}".format(text))
 
 
-def load_json(text: str) -> Any:
-    return json.loads(text)
+def strip_json_cruft_bytes(data: bytes) -> memoryview:
+    """Like `strip_json_cruft`, but on bytes, and without copying the data"""
+    start = data.find(b"{")
+    if start == -1:
+        # Not including the data, it may be large
+        raise ValueError("No JSON object found")
+    return memoryview(data)[start:]
+
+
+JSONData = Union[str, bytes, memoryview]
+
+
+def _load_json_stdlib(data: JSONData) -> Any:
+    # Decode explicitly, `json.loads` would otherwise allow surrogates in bytes
+    if not isinstance(data, str):
+        data = str(data, "utf-8")
+    return json.loads(data)
+
+
+def _load_json_orjson(data: JSONData) -> Any:
+    return orjson.loads(data)
+
+
+def _load_json_ujson(data: JSONData) -> Any:
+    if not isinstance(data, str):
+        data = str(data, "utf-8")
+    return ujson.loads(data)
+
+
+#: Available JSON backends, in order of preference
+JSON_BACKENDS = {}  # type: Dict[str, Callable[[JSONData], Any]]
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = _load_json_orjson
+if ujson is not None:
+    JSON_BACKENDS["ujson"] = _load_json_ujson
+JSON_BACKENDS["json"] = _load_json_stdlib
+
+_json_backend = next(iter(JSON_BACKENDS.values()))
+
+
+def set_json_backend(backend: Optional[Union[str, Callable[[JSONData], Any]]]) -> None:
+    """Set the function used by `load_json`.
+
+    Either the name of one of the `JSON_BACKENDS`, a custom function, or `None` to
+    use the fastest installed backend. Custom functions must accept `str`, `bytes`
+    and `memoryview`, and raise `ValueError` on invalid data.
+    """
+    global _json_backend
+    if backend is None:
+        backend = next(iter(JSON_BACKENDS.values()))
+    elif isinstance(backend, str):
+        try:
+            backend = JSON_BACKENDS[backend]
+        except KeyError:
+            raise ValueError("JSON backend not available: {!r}".format(backend))
+    _json_backend = backend
+
+
+def load_json(data: JSONData) -> Any:
+    """Parse JSON from text, or directly from UTF-8 encoded bytes.
+
+    Raise:
+        `ValueError` if the data is not valid UTF-8 or JSON.
+    """
+    return _json_backend(data)
 
 
 def time_from_millis(timestamp_in_milliseconds: int) -> datetime.datetime:
@@ -0,0 +1,388 @@
+"""Reference `asyncio` driver for the pull protocol.
+
+A minimal HTTP/1.1 client with keep-alive connections pooled per `Request.host`,
+and loops mapping the transport's failures to the `PullHandler.handle_*` methods.
+Every account runs as a task, so there's no thread per account::
+
+    pool = sensebook.aio.ConnectionPool(headers={"Cookie": ...})
+    await sensebook.aio.run(sensebook.PullHandler(), pool, on_frame=print)
+"""
+
+import asyncio
+import attr
+import collections
+import inspect
+import logging
+import ssl as _ssl
+
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from . import _abc
+from ._pull_handler import Backoff, PullHandler, ProtocolError
+from ._offload import ParseOffloader
+
+log = logging.getLogger(__name__)
+
+
+class TransportError(Exception):
+    """Raised if the connection failed, or the server sent an invalid response."""
+
+
+class ConnectTimeout(TransportError):
+    """Raised if the connection could not be established within `connect_timeout`."""
+
+
+class ReadTimeout(TransportError):
+    """Raised if the response did not arrive within `read_timeout`."""
+
+
+@attr.s(slots=True)
+class _Connection:
+    reader = attr.ib(type=asyncio.StreamReader)
+    writer = attr.ib(type=asyncio.StreamWriter)
+
+    @property
+    def usable(self) -> bool:
+        return not self.reader.at_eof() and not self.writer.transport.is_closing()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bool, bytes]:
+    status_line = await reader.readuntil(b"\r\n")
+    try:
+        version, status, _ = status_line.decode("latin-1").split(" ", 2)
+        status_code = int(status)
+    except ValueError as e:
+        raise TransportError("Invalid status line: {!r}".format(status_line)) from e
+
+    headers = {}
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = version == "HTTP/1.1" and headers.get("connection") != "close"
+    if "chunked" in headers.get("transfer-encoding", ""):
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")  # Trailers are not supported
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status_code, keep_alive, body
+
+
+@attr.s(slots=True, kw_only=True)
+class ConnectionPool:
+    """Keeps idle keep-alive connections, per `Request.host`.
+
+    Connections are grouped by `Request.routing_key` (the sticky pool), so requests
+    reuse connections warmed up by requests to the same backend. Without one, an
+    idle connection from another group is migrated, instead of connecting anew.
+
+    `addresses` maps a host to the `(host, port)` to actually connect to, e.g. for a
+    local stub server.
+    """
+
+    #: Headers sent with every request, e.g. `Cookie`
+    headers = attr.ib(factory=dict, type=Dict[str, str])
+    secure = attr.ib(True, type=bool)
+    ssl = attr.ib(None, type=Optional[_ssl.SSLContext])
+    addresses = attr.ib(factory=dict, type=Dict[str, Tuple[str, int]])
+    #: Maximum number of idle connections to keep, per host
+    max_idle = attr.ib(100, type=int)
+    #: Idle connections by host and routing key
+    _idle = attr.ib(
+        factory=dict, init=False
+    )  # type: Dict[str, Dict[Optional[Hashable], Deque[_Connection]]]
+    _idle_count = attr.ib(factory=dict, init=False)  # type: Dict[str, int]
+    #: The number of idle connections reused from the request's own group
+    reuses = attr.ib(0, init=False)
+    #: The number of idle connections reused from another group
+    migrations = attr.ib(0, init=False)
+    #: The number of new connections
+    connects = attr.ib(0, init=False)
+
+    def _address(self, host: str) -> Tuple[str, int]:
+        return self.addresses.get(host, (host, 443 if self.secure else 80))
+
+    async def _connect(
+        self,
+        host: str,
+        timeout: Optional[float],
+        on_connect: Optional[Callable[[float], None]] = None,
+    ) -> _Connection:
+        address, port = self._address(host)
+        ssl = (self.ssl or True) if self.secure else None
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    address, port, ssl=ssl, server_hostname=host if ssl else None
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError as e:
+            raise ConnectTimeout("Could not connect to {}".format(host)) from e
+        except OSError as e:
+            raise TransportError("Could not connect to {}".format(host)) from e
+        self.connects += 1
+        if on_connect is not None:
+            on_connect(loop.time() - started)
+        return _Connection(reader, writer)
+
+    def _pop_idle(
+        self, host: str, routes: Dict[Optional[Hashable], Deque[_Connection]], key: Any
+    ) -> Optional[_Connection]:
+        idle = routes.get(key)
+        if idle is None:
+            return None
+        while idle:
+            connection = idle.pop()
+            self._idle_count[host] -= 1
+            if connection.usable:
+                return connection
+            connection.close()
+        del routes[key]
+        return None
+
+    def _acquire_idle(
+        self, host: str, routing_key: Optional[Hashable] = None
+    ) -> Optional[_Connection]:
+        routes = self._idle.get(host)
+        if not routes:
+            return None
+        connection = self._pop_idle(host, routes, routing_key)
+        if connection is not None:
+            self.reuses += 1
+            return connection
+        for key in list(routes):
+            connection = self._pop_idle(host, routes, key)
+            if connection is not None:
+                self.migrations += 1
+                return connection
+        return None
+
+    def _release(
+        self,
+        host: str,
+        connection: _Connection,
+        routing_key: Optional[Hashable] = None,
+    ) -> None:
+        if self._idle_count.get(host, 0) >= self.max_idle:
+            connection.close()
+            return
+        routes = self._idle.setdefault(host, {})
+        routes.setdefault(routing_key, collections.deque()).append(connection)
+        self._idle_count[host] = self._idle_count.get(host, 0) + 1
+
+    def _encode(self, request: _abc.Request, headers: Dict[str, str]) -> bytes:
+        url = request.url_bytes
+        # Everything from the first slash after the scheme's "//"
+        target = url[url.index(b"/", url.index(b"//") + 2) :]
+        body = request.body
+        lines = ["Host: {}".format(request.host)]
+        if body is not None:
+            lines.append("Content-Type: application/x-www-form-urlencoded")
+            lines.append("Content-Length: {}".format(len(body)))
+        for name, value in self.headers.items():
+            lines.append("{}: {}".format(name, value))
+        for name, value in headers.items():
+            lines.append("{}: {}".format(name, value))
+        lines.append("\r\n")
+        return b"".join(
+            (
+                request.method.encode("ascii"),
+                b" ",
+                target,
+                b" HTTP/1.1\r\n",
+                "\r\n".join(lines).encode("latin-1"),
+                body or b"",
+            )
+        )
+
+    async def _send(
+        self, connection: _Connection, data: bytes, timeout: Optional[float]
+    ) -> Tuple[int, bool, bytes]:
+        connection.writer.write(data)
+        try:
+            await connection.writer.drain()
+            return await asyncio.wait_for(_read_response(connection.reader), timeout)
+        except asyncio.TimeoutError as e:
+            raise ReadTimeout("No response within {} seconds".format(timeout)) from e
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            raise TransportError("Connection failed") from e
+        except ValueError as e:
+            # E.g. an invalid chunk size or Content-Length
+            raise TransportError("Invalid response framing") from e
+
+    async def request(
+        self,
+        request: _abc.Request,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        on_connect: Optional[Callable[[float], None]] = None
+    ) -> Tuple[int, bytes]:
+        """Send the request, and return the status code and body of the response.
+
+        If a new connection is made, `on_connect` is called with the time it took.
+
+        Raise:
+            `ConnectTimeout`, `ReadTimeout` or `TransportError`.
+        """
+        data = self._encode(request, headers or {})
+        routing_key = request.routing_key
+        connection = self._acquire_idle(request.host, routing_key)
+        if connection is not None:
+            try:
+                status_code, keep_alive, body = await self._send(
+                    connection, data, request.read_timeout
+                )
+            except ReadTimeout:
+                connection.close()
+                raise
+            except TransportError:
+                # The server probably closed the idle connection, try a fresh one
+                connection.close()
+                connection = None
+        if connection is None:
+            connection = await self._connect(
+                request.host, request.connect_timeout, on_connect
+            )
+            try:
+                status_code, keep_alive, body = await self._send(
+                    connection, data, request.read_timeout
+                )
+            except TransportError:
+                connection.close()
+                raise
+
+        if keep_alive:
+            self._release(request.host, connection, routing_key)
+        else:
+            connection.close()
+        return status_code, body
+
+    def close(self) -> None:
+        for routes in self._idle.values():
+            for idle in routes.values():
+                for connection in idle:
+                    connection.close()
+        self._idle.clear()
+        self._idle_count.clear()
+
+
+async def _pull(
+    handler: PullHandler,
+    pool: ConnectionPool,
+    headers: Optional[Dict[str, str]],
+    offloader: Optional[ParseOffloader] = None,
+) -> Iterable[Any]:
+    request = handler.next_request()
+    try:
+        status_code, body = await pool.request(
+            request, headers=headers, on_connect=handler.observe_connect
+        )
+    except ConnectTimeout:
+        handler.handle_connect_timeout()
+    except ReadTimeout:
+        handler.handle_read_timeout()
+    except TransportError:
+        log.debug("Pull failed", exc_info=True)
+        handler.handle_connection_error()
+    else:
+        if offloader is not None and offloader.wants(handler, status_code, body):
+            try:
+                data = await asyncio.wrap_future(offloader.parse(body))
+            except Exception:
+                log.debug("Offloaded parsing failed", exc_info=True)
+            else:
+                return handler.handle_parsed(status_code, data, size=len(body))
+        return handler.handle(status_code, body)
+    return ()
+
+
+async def pull(
+    handler: PullHandler,
+    pool: ConnectionPool,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    offloader: Optional[ParseOffloader] = None
+) -> List[Any]:
+    """Perform a single pull request, and return the data frames.
+
+    Large bodies are parsed by the `offloader`, if given.
+
+    Raise:
+        `Backoff` if the caller should wait before pulling again.
+        `ProtocolError` if some assumption about Facebook's protocol was wrong.
+    """
+    return list(await _pull(handler, pool, headers, offloader))
+
+
+async def run(
+    handler: PullHandler,
+    pool: ConnectionPool,
+    *,
+    on_frame: Callable[[Any], Any],
+    on_error: Optional[Callable[[ProtocolError], Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    offloader: Optional[ParseOffloader] = None
+) -> None:
+    """Pull forever, sleeping on `Backoff`, and pass every data frame to `on_frame`.
+
+    `on_frame` and `on_error` may be coroutine functions. `ProtocolError`s are
+    raised, unless `on_error` is given, after which their frames are cleared. Large
+    bodies are parsed by the `offloader`, if given, so they don't stall the event
+    loop. Consecutive errors are backed off exponentially, like `Backoff.from_tries`.
+    """
+    errors = 0
+    while True:
+        try:
+            # Frames are passed on as they're parsed, so a `Backoff` in the middle of
+            # a batch doesn't discard the frames before it
+            for frame in await _pull(handler, pool, headers, offloader):
+                result = on_frame(frame)
+                if inspect.isawaitable(result):
+                    await result
+            errors = 0
+        except Backoff as e:
+            errors = 0
+            log.debug("Backing off for %.1f seconds: %s", e.delay, e)
+            await asyncio.sleep(e.delay)
+        except ProtocolError as e:
+            if on_error is None:
+                raise
+            errors += 1
+            try:
+                result = on_error(e)
+                if inspect.isawaitable(result):
+                    await result
+            finally:
+                e.clear_frames()
+            delay = Backoff.from_tries(str(e), tries=errors).delay
+            log.debug("Backing off for %.1f seconds after %d errors", delay, errors)
+            await asyncio.sleep(delay)
@@ -0,0 +1,273 @@
+"""Blocking driver for the pull protocol, using `requests`.
+
+Requires the `sync` extra. Many accounts share a bounded thread pool, and a single
+`requests.Session` whose connection pools are sized for the concurrent long-polls::
+
+    pool = sensebook.sync.SessionPool(max_connections=50)
+    sensebook.sync.run_many(handlers, pool, on_frame=print)
+"""
+
+import attr
+import concurrent.futures
+import logging
+import threading
+import time
+
+import requests
+import requests.adapters
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from . import _abc
+from ._pull_handler import Backoff, PullHandler, ProtocolError
+from ._multiplexer import PullMultiplexer
+from ._offload import ParseOffloader
+
+log = logging.getLogger(__name__)
+
+
+@attr.s(slots=True, kw_only=True)
+class SessionPool:
+    """A `requests.Session` shared between threads, with saturation reporting.
+
+    `max_connections` is the number of concurrent requests per host, usually the
+    number of worker threads. If more requests are in flight than that, the extra
+    connections are discarded after use instead of being kept alive, which is
+    counted in `overflows`.
+    """
+
+    max_connections = attr.ib(type=int)
+    #: Headers sent with every request, e.g. `Cookie`
+    headers = attr.ib(factory=dict, type=Dict[str, str])
+    session = attr.ib(type=requests.Session)
+    _lock = attr.ib(factory=threading.Lock, init=False)
+    _in_flight = attr.ib(factory=dict, init=False)  # type: Dict[str, int]
+    #: The most requests that have been in flight to a single host at once
+    peak = attr.ib(0, init=False)
+    #: The number of requests sent while the pool was saturated
+    overflows = attr.ib(0, init=False)
+
+    @session.default
+    def _default_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=10, pool_maxsize=self.max_connections
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def saturation(self, host: Optional[str] = None) -> float:
+        """The fraction of the connections to `host` (or the busiest host) in use."""
+        with self._lock:
+            if host is None:
+                in_flight = max(self._in_flight.values(), default=0)
+            else:
+                in_flight = self._in_flight.get(host, 0)
+        return in_flight / self.max_connections
+
+    def request(
+        self, request: _abc.Request, *, headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, bytes]:
+        """Send the request, and return the status code and body of the response.
+
+        Raise:
+            `requests.RequestException` subclasses.
+        """
+        host = request.host
+        with self._lock:
+            in_flight = self._in_flight.get(host, 0) + 1
+            self._in_flight[host] = in_flight
+            self.peak = max(self.peak, in_flight)
+            if in_flight > self.max_connections:
+                self.overflows += 1
+                log.warning(
+                    "Connection pool for %s is saturated (%d/%d)",
+                    host,
+                    in_flight,
+                    self.max_connections,
+                )
+        headers = dict(self.headers, **(headers or {}))
+        body = request.body
+        if body is not None:
+            headers.setdefault("Content-Type", "application/x-www-form-urlencoded")
+        try:
+            r = self.session.request(
+                request.method,
+                request.url,
+                data=body,
+                headers=headers,
+                timeout=(request.connect_timeout, request.read_timeout),
+            )
+            return r.status_code, r.content
+        finally:
+            with self._lock:
+                self._in_flight[host] -= 1
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def _failure_method(exception: requests.RequestException) -> str:
+    """The name of the `PullHandler` method that handles the exception."""
+    if isinstance(exception, requests.ConnectTimeout):
+        return "handle_connect_timeout"
+    if isinstance(exception, requests.ReadTimeout):
+        return "handle_read_timeout"
+    log.debug("Pull failed: %s", exception)
+    return "handle_connection_error"
+
+
+def pull(
+    handler: PullHandler, pool: SessionPool, *, headers: Optional[Dict[str, str]] = None
+) -> Iterable[Any]:
+    """Perform a single pull request, and return the data frames.
+
+    Raise:
+        `Backoff` if the caller should wait before pulling again.
+        `ProtocolError` if some assumption about Facebook's protocol was wrong.
+    """
+    try:
+        status_code, body = pool.request(handler.next_request(), headers=headers)
+    except requests.RequestException as e:
+        getattr(handler, _failure_method(e))()
+        return ()
+    return handler.handle(status_code, body)
+
+
+def run(
+    handler: PullHandler,
+    pool: SessionPool,
+    *,
+    on_frame: Callable[[Any], Any],
+    on_error: Optional[Callable[[ProtocolError], Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    stop: Optional[threading.Event] = None
+) -> None:
+    """Pull in the current thread until `stop` is set, sleeping on `Backoff`.
+
+    `ProtocolError`s are raised, unless `on_error` is given, after which their
+    frames are cleared. Consecutive errors are backed off exponentially, like
+    `Backoff.from_tries`.
+    """
+    stop = stop or threading.Event()
+    errors = 0
+    while not stop.is_set():
+        try:
+            for frame in pull(handler, pool, headers=headers):
+                on_frame(frame)
+            errors = 0
+        except Backoff as e:
+            errors = 0
+            log.debug("Backing off for %.1f seconds: %s", e.delay, e)
+            stop.wait(e.delay)
+        except ProtocolError as e:
+            if on_error is None:
+                raise
+            errors += 1
+            try:
+                on_error(e)
+            finally:
+                e.clear_frames()
+            delay = Backoff.from_tries(str(e), tries=errors).delay
+            log.debug("Backing off for %.1f seconds after %d errors", delay, errors)
+            stop.wait(delay)
+
+
+def run_many(
+    handlers: Dict[Hashable, PullHandler],
+    pool: SessionPool,
+    *,
+    on_frame: Callable[[Hashable, Any], Any],
+    on_error: Optional[Callable[[Hashable, ProtocolError], Any]] = None,
+    headers: Optional[Dict[Hashable, Dict[str, str]]] = None,
+    max_workers: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+    offloader: Optional[ParseOffloader] = None
+) -> None:
+    """Pull for every handler on a bounded thread pool, until `stop` is set.
+
+    The requests are sent by up to `max_workers` threads (by default the pool's
+    `max_connections`), while scheduling, `Backoff` and parsing is done in the
+    calling thread, by a `PullMultiplexer`. Large bodies are parsed by the
+    `offloader` instead, if given. Callbacks get the handler's key, and errors are
+    handled as in `run`.
+
+    When stopped, this waits for the requests in flight to finish.
+    """
+    stop = stop or threading.Event()
+    headers = headers or {}
+    mux = PullMultiplexer()
+    now = time.monotonic()
+    for key, handler in handlers.items():
+        mux.add(key, handler, now=now)
+
+    futures = {}  # type: Dict[concurrent.futures.Future, Hashable]
+    #: Offloaded parsing, with the key and the response
+    parsing = {}  # type: Dict[concurrent.futures.Future, Tuple[Hashable, int, bytes]]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers or pool.max_connections
+    ) as executor:
+        while not stop.is_set():
+            for key, request in mux.ready(now=time.monotonic()):
+                future = executor.submit(
+                    pool.request, request, headers=headers.get(key)
+                )
+                futures[future] = key
+
+            deadline = mux.next_deadline()
+            timeout = 1.0 if deadline is None else deadline - time.monotonic()
+            timeout = min(max(timeout, 0), 1.0)  # Check `stop` regularly
+            if not futures and not parsing:
+                stop.wait(timeout)
+                continue
+            done, _ = concurrent.futures.wait(
+                list(futures) + list(parsing),
+                timeout=timeout,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+
+            for future in done:
+                now = time.monotonic()
+                try:
+                    if future in parsing:
+                        key, status_code, body = parsing.pop(future)
+                        exception = future.exception()
+                        if exception is None:
+                            frames = mux.handle_parsed(
+                                key,
+                                status_code,
+                                future.result(),
+                                size=len(body),
+                                now=now,
+                            )
+                        else:
+                            # Parse inline, to get the error from the handler
+                            log.debug("Offloaded parsing failed: %s", exception)
+                            frames = mux.handle(key, status_code, body, now=now)
+                    else:
+                        key = futures.pop(future)
+                        exception = future.exception()
+                        if exception is None:
+                            status_code, body = future.result()
+                            if offloader is not None and offloader.wants(
+                                mux[key], status_code, body
+                            ):
+                                parsing[offloader.parse(body)] = key, status_code, body
+                                continue
+                            frames = mux.handle(key, status_code, body, now=now)
+                        else:
+                            if not isinstance(exception, requests.RequestException):
+                                raise exception
+                            getattr(mux, _failure_method(exception))(key, now=now)
+                            frames = []
+                except ProtocolError as e:
+                    if on_error is None:
+                        raise
+                    try:
+                        on_error(key, e)
+                    finally:
+                        e.clear_frames()
+                    continue
+                for frame in frames:
+                    on_frame(key, frame)
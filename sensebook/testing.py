@@ -0,0 +1,383 @@
+"""A local stand-in for Facebook's `/pull` endpoint, for load and soak testing.
+
+Speaks the protocol `PullHandler` expects, over plain HTTP/1.1 with keep-alive, so
+any driver can be run end to end on one machine, without network access::
+
+    async with sensebook.testing.FakePullServer(interval=0.1) as server:
+        await sensebook.aio.run(server.handler(), server.connection_pool(), ...)
+
+Or, for blocking drivers, `with server.in_thread(): ...`, or as a separate process
+with `python -m sensebook.testing --port 8080`. Every message frame has the
+server's `clock()` at the time it was sent as `sent`, to measure latency.
+"""
+
+import argparse
+import asyncio
+import attr
+import collections
+import json
+import logging
+import random
+import threading
+import time
+import urllib.parse
+
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from . import aio
+from ._pull_handler import PullHandler, PullRequest
+
+log = logging.getLogger(__name__)
+
+#: The faults that can be injected, see `FakePullServer.faults`
+FAULTS = (
+    "heartbeat",  # No new messages before the long poll ended
+    "backoff",  # `t: backoff`
+    "fullReload",  # `t: fullReload`, without messages
+    "lb",  # `t: lb`, moving the client to a new sticky pool
+    "seq_reset",  # Messages, with `seq` restarting from 1
+    "malformed",  # A `msg`, cut off in the middle
+    "invalid_unicode",  # A `msg`, with a byte that isn't valid UTF-8
+    "no_json",  # A body without any JSON object
+    "503",  # Server unavailable
+    "drop",  # Close the connection without a response
+    "stall",  # Hold the request for `stall_time`, then close the connection
+)
+
+_REASONS = {200: "OK", 400: "Bad Request", 503: "Service Unavailable"}
+_WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def _encode_response(status_code: int, body: bytes) -> bytes:
+    head = "HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}"
+    head = head.format(status_code, _REASONS[status_code], len(body))
+    return head.encode("latin-1") + b"\r\n\r\n" + body
+
+
+def _encode_body(data: Dict[str, Any]) -> bytes:
+    return b"for (;;); " + json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+@attr.s(slots=True, kw_only=True)
+class _Client:
+    seq = attr.ib(0, type=int)
+    pool = attr.ib(0, type=int)
+
+
+@attr.s(slots=True, kw_only=True)
+class FakePullServer:
+    """A fake `/pull` endpoint, with configurable load and fault injection.
+
+    Clients without a sticky token first get an `lb` message. Then every request
+    is held for `interval` seconds, and answered with a `msg` of
+    `frames_per_response` `NewMessage` deltas, or a `batched` of those with
+    probability `batched`. `faults` maps names from `FAULTS` to the probability of
+    injecting them into a response, checked in the order of `FAULTS`.
+    """
+
+    host = attr.ib("127.0.0.1", type=str)
+    #: The port to listen on, 0 for any. Set to the actual port when started
+    port = attr.ib(0, type=int)
+    interval = attr.ib(0.0, type=float)
+    frames_per_response = attr.ib(1, type=int)
+    #: The length of the text of every message
+    payload_size = attr.ib(64, type=int)
+    batched = attr.ib(0.0, type=float)
+    #: The number of `msg` frames in a `batched` response
+    batch_size = attr.ib(3, type=int)
+    faults = attr.ib(factory=dict, type=Dict[str, float])
+    stall_time = attr.ib(90.0, type=float)
+    seed = attr.ib(None, type=Optional[int])
+    clock = attr.ib(time.monotonic, type=Callable[[], float])
+    #: The number of requests, and responses by kind, e.g. `"msg"` or `"503"`
+    requests = attr.ib(0, init=False)
+    responses = attr.ib(factory=collections.Counter, init=False)
+    _rng = attr.ib(init=False, repr=False)
+    _clients = attr.ib(factory=dict, init=False, repr=False)  # type: Dict[str, _Client]
+    _server = attr.ib(None, init=False, repr=False)
+    _loop = attr.ib(None, init=False, repr=False)
+    _tasks = attr.ib(factory=set, init=False, repr=False)  # type: Set[asyncio.Task]
+
+    @_rng.default
+    def _default_rng(self):
+        return random.Random(self.seed)
+
+    @faults.validator
+    def _check_faults(self, attribute, value):
+        unknown = set(value) - set(FAULTS)
+        if unknown:
+            raise ValueError("Unknown faults: {}".format(", ".join(sorted(unknown))))
+
+    # Protocol
+
+    def _new_message(self, client: _Client) -> Dict[str, Any]:
+        rng = self._rng
+        client.seq += 1
+        words = (rng.choice(_WORDS) for _ in range(self.payload_size // 2 + 1))
+        text = " ".join(words)[: self.payload_size]
+        return {
+            "type": "delta",
+            "iseq": client.seq,
+            "sent": self.clock(),
+            "delta": {
+                "attachments": [],
+                "body": text,
+                "irisSeqId": str(client.seq),
+                "messageMetadata": {
+                    "actorFbId": str(rng.randrange(10 ** 14, 10 ** 15)),
+                    "messageId": "mid.$" + "{:032x}".format(rng.getrandbits(128)),
+                    "threadKey": {"otherUserFbId": str(rng.randrange(10 ** 15))},
+                    "timestamp": str(int(time.time() * 1000)),
+                },
+                "class": "NewMessage",
+            },
+        }
+
+    def _msg(self, client: _Client) -> Dict[str, Any]:
+        frames = [self._new_message(client) for _ in range(self.frames_per_response)]
+        return {"t": "msg", "seq": client.seq, "ms": frames}
+
+    def _lb(self, client: _Client) -> Dict[str, Any]:
+        client.pool += 1
+        sticky = "{:x}".format(self._rng.getrandbits(32))
+        pool = "fake_chat-proxy{}".format(client.pool)
+        return {"t": "lb", "lb_info": {"sticky": sticky, "pool": pool}}
+
+    def _fault(self) -> Optional[str]:
+        for fault in FAULTS:
+            probability = self.faults.get(fault)
+            if probability and self._rng.random() < probability:
+                return fault
+        return None
+
+    async def respond(self, target: str) -> Tuple[str, Optional[int], bytes]:
+        """Return the kind, status code and body of the response to `target`.
+
+        The status code is `None` if the connection should be closed instead.
+        """
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        if url.path != PullRequest.target or "clientid" not in query:
+            return "invalid", 400, b""
+        client = self._clients.setdefault(query["clientid"][0], _Client())
+        # `PullHandler` sends "None" until it got an `lb`
+        if query.get("sticky_token", ["None"])[0] == "None":
+            return "lb", 200, _encode_body(self._lb(client))
+
+        fault = self._fault()
+        if fault == "503":
+            return fault, 503, b""
+        if fault == "drop":
+            return fault, None, b""
+        if fault == "stall":
+            await asyncio.sleep(self.stall_time)
+            return fault, None, b""
+        if fault in ("backoff", "fullReload"):
+            return fault, 200, _encode_body({"t": fault})
+        if fault == "lb":
+            return fault, 200, _encode_body(self._lb(client))
+
+        await asyncio.sleep(self.interval)
+        if fault == "heartbeat":
+            return fault, 200, _encode_body({"t": "heartbeat"})
+        if fault == "seq_reset":
+            client.seq = 0
+        if fault == "malformed":
+            body = _encode_body(self._msg(client))
+            return fault, 200, body[: len(body) // 2]
+        if fault == "invalid_unicode":
+            body = _encode_body(self._msg(client))
+            return fault, 200, body[:-2] + b"\xff" + body[-2:]
+        if fault == "no_json":
+            body = _encode_body(self._msg(client))
+            return fault, 200, body.replace(b"{", b"(").replace(b"}", b")")
+        if self.batched and self._rng.random() < self.batched:
+            batches = [self._msg(client) for _ in range(self.batch_size)]
+            data = {"t": "batched", "seq": client.seq, "batches": batches}
+            return "batched", 200, _encode_body(data)
+        return fault or "msg", 200, _encode_body(self._msg(client))
+
+    # Transport
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                self.requests += 1
+                request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+                kind, status_code, body = await self.respond(request_line.split(" ")[1])
+                self.responses[kind] += 1
+                if status_code is None:
+                    break
+                writer.write(_encode_response(status_code, body))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception:
+            log.exception("Fake pull server failed")
+        finally:
+            writer.close()
+
+    def _accept(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = self._loop.create_task(self._handle_connection(reader, writer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_event_loop()
+        self._server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """Stop listening, and close the connections, including held requests."""
+        self._server.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def __aenter__(self) -> "FakePullServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def in_thread(self) -> "_ThreadedServer":
+        """Run the server on its own event loop in a thread, for blocking drivers.
+
+        Use as a context manager, which starts the server, and stops it on exit.
+        """
+        return _ThreadedServer(self)
+
+    def run_forever(self) -> None:
+        """Start the server on a new event loop, and block until interrupted."""
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.start())
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    # Clients
+
+    def connection_pool(self, **kwargs: Any) -> aio.ConnectionPool:
+        """A `sensebook.aio.ConnectionPool` which connects to this server."""
+        addresses = {PullRequest.host: (self.host, self.port)}
+        return aio.ConnectionPool(secure=False, addresses=addresses, **kwargs)
+
+    def handler(self, **kwargs: Any) -> PullHandler:
+        """A `PullHandler`, whose requests are sent to this server.
+
+        Needed by drivers that use the URL of the request, like `sensebook.sync`.
+        """
+        return _LocalPullHandler(address="{}:{}".format(self.host, self.port), **kwargs)
+
+
+@attr.s(slots=True, kw_only=True)
+class _LocalPullRequest(PullRequest):
+    #: The `host:port` of the fake server
+    address = attr.ib(type=str)
+
+    @property
+    def url(self) -> str:
+        # The real URL, with the scheme and host replaced
+        url = urllib.parse.urlsplit(super().url)
+        return urllib.parse.urlunsplit(("http", self.address) + url[2:])
+
+    @property
+    def url_bytes(self) -> bytes:
+        return self.url.encode("ascii")
+
+
+@attr.s(slots=True, kw_only=True)
+class _LocalPullHandler(PullHandler):
+    address = attr.ib(type=str)
+
+    def next_request(self) -> PullRequest:
+        request = super().next_request()
+        return _LocalPullRequest(
+            params=request.params,
+            template=request.template,
+            read_timeout=request.read_timeout,
+            connect_timeout=request.connect_timeout,
+            address=self.address,
+        )
+
+
+class _ThreadedServer:
+    def __init__(self, server: FakePullServer) -> None:
+        self.server = server
+        self._thread = None  # type: Optional[threading.Thread]
+        self._started = threading.Event()
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.server.start())
+            self._started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.server.close())
+        finally:
+            self._started.set()
+            loop.close()
+
+    def __enter__(self) -> FakePullServer:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self.server._server is None:
+            raise RuntimeError("The fake pull server could not be started")
+        return self.server
+
+    def __exit__(self, *exc_info) -> None:
+        self.server._loop.call_soon_threadsafe(self.server._loop.stop)
+        self._thread.join()
+
+
+def _parse_fault(value: str) -> Tuple[str, float]:
+    name, _, probability = value.partition("=")
+    if name not in FAULTS:
+        raise argparse.ArgumentTypeError("Unknown fault {!r}".format(name))
+    try:
+        return name, float(probability or 1)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m sensebook.testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--interval", type=float, default=0.0)
+    parser.add_argument("--frames", type=int, default=1, dest="frames_per_response")
+    parser.add_argument("--payload-size", type=int, default=64)
+    parser.add_argument("--batched", type=float, default=0.0)
+    parser.add_argument(
+        "--fault",
+        type=_parse_fault,
+        action="append",
+        default=[],
+        metavar="NAME=PROBABILITY",
+        help="One of: {}".format(", ".join(FAULTS)),
+    )
+    parser.add_argument("--seed", type=int)
+    args = vars(parser.parse_args(argv))
+    args["faults"] = dict(args.pop("fault"))
+    server = FakePullServer(**args)
+    try:
+        server.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
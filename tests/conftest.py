@@ -0,0 +1,16 @@
+from pytest import fixture
+
+
+class Clock:
+    """A fake clock, returning `now` until it's changed."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@fixture
+def clock():
+    return Clock()
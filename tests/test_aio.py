@@ -0,0 +1,307 @@
+import asyncio
+import gc
+import sensebook
+import sensebook.aio
+import sensebook.testing
+import tracemalloc
+from pytest import fixture, mark, raises
+
+HOST = sensebook.PullRequest.host
+
+
+class StubServer:
+    """Local HTTP server, answering requests with the queued responses."""
+
+    def __init__(self):
+        self.responses = []
+        self.connections = 0
+        self.targets = []
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            self.targets.append(head.split(b" ")[1].decode())
+            response = self.responses.pop(0)
+            if response is None:
+                break  # Drop the connection
+            if isinstance(response, float):
+                await asyncio.sleep(response)
+                break
+            writer.write(response)
+            await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.pool = sensebook.aio.ConnectionPool(
+            secure=False, addresses={HOST: ("127.0.0.1", port)}
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.pool.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def response(body, status=200, headers=b""):
+    return b"HTTP/1.1 %d OK\r\nContent-Length: %d\r\n%s\r\n%s" % (
+        status,
+        len(body),
+        headers,
+        body,
+    )
+
+
+def chunked(*chunks):
+    body = b"".join(b"%x\r\n%s\r\n" % (len(c), c) for c in chunks + (b"",))
+    return b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n" + body
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # Let the server's connection handlers see that the client has closed
+        loop.run_until_complete(asyncio.sleep(0.01))
+        loop.close()
+
+
+def test_pull_keep_alive():
+    async def main():
+        async with StubServer() as server:
+            server.responses = [
+                response(b'for(;;);{"t": "msg", "seq": 1, "ms": [1]}'),
+                chunked(b'for(;;);{"t": "msg", ', b'"seq": 2, "ms": [2]}'),
+            ]
+            handler = sensebook.PullHandler()
+            assert [1] == await sensebook.aio.pull(handler, server.pool)
+            assert [2] == await sensebook.aio.pull(handler, server.pool)
+            assert server.connections == 1
+            assert server.targets[1].startswith("/pull?clientid=")
+            assert "seq=1" in server.targets[1]
+
+    run(main())
+
+
+def test_pull_connection_close():
+    async def main():
+        async with StubServer() as server:
+            body = b'for(;;);{"t": "heartbeat"}'
+            server.responses = [
+                response(body, headers=b"Connection: close\r\n"),
+                response(body),
+            ]
+            handler = sensebook.PullHandler()
+            await sensebook.aio.pull(handler, server.pool)
+            await sensebook.aio.pull(handler, server.pool)
+            assert server.connections == 2
+
+    run(main())
+
+
+def test_pull_stale_connection():
+    async def main():
+        async with StubServer() as server:
+            body = b'for(;;);{"t": "heartbeat"}'
+            server.responses = [response(body), None, response(body)]
+            handler = sensebook.PullHandler()
+            await sensebook.aio.pull(handler, server.pool)
+            # The idle connection is dropped, and the request retried on a new one
+            await sensebook.aio.pull(handler, server.pool)
+            assert server.connections == 2
+
+    run(main())
+
+
+def test_pull_routing():
+    async def main():
+        async with StubServer() as server:
+            body = b'for(;;);{"t": "heartbeat"}'
+            lb = b'for(;;);{"t": "lb", "lb_info": {"sticky": "1", "pool": "c"}}'
+            server.responses = [response(body), response(body), response(lb)]
+            server.responses.append(response(body))
+            a = sensebook.PullHandler(sticky_pool="a")
+            b = sensebook.PullHandler(sticky_pool="b")
+            assert a.next_request().routing_key == "a"
+            await asyncio.gather(
+                sensebook.aio.pull(a, server.pool), sensebook.aio.pull(b, server.pool)
+            )
+            assert server.connections == 2
+            await sensebook.aio.pull(a, server.pool)
+            assert server.pool.reuses == 1
+            # The pool changed, so the connection of another pool is migrated
+            assert a.next_request().routing_key == "c"
+            await sensebook.aio.pull(a, server.pool)
+            assert server.pool.migrations == 1
+            assert server.pool.connects == server.connections == 2
+
+    run(main())
+
+
+def test_pull_timeouts():
+    async def main():
+        async with StubServer() as server:
+            body = b'for(;;);{"t": "heartbeat"}'
+            server.responses = [response(body), response(body)]
+            timeouts = sensebook.AdaptiveTimeouts(min_samples=2)
+            handler = sensebook.PullHandler(timeouts=timeouts)
+            await sensebook.aio.pull(handler, server.pool)
+            await sensebook.aio.pull(handler, server.pool)
+            assert len(timeouts._holds) == 2
+            assert len(timeouts._connect_times) == 1  # The connection was reused
+            assert handler.next_request().read_timeout == timeouts.min_read_timeout
+
+    run(main())
+
+
+@mark.raises(exception=sensebook.Backoff)
+def test_pull_connection_error():
+    async def main():
+        async with StubServer() as server:
+            server.responses = [None]
+            await sensebook.aio.pull(sensebook.PullHandler(), server.pool)
+
+    run(main())
+
+
+@mark.parametrize(
+    "data",
+    [
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nxyz\r\n",
+        b"HTTP/1.1 200 OK\r\nContent-Length: many\r\n\r\n",
+    ],
+)
+def test_request_invalid_framing(data):
+    async def main():
+        async with StubServer() as server:
+            server.responses = [data]
+            with raises(sensebook.aio.TransportError, match="framing"):
+                await server.pool.request(sensebook.PullRequest(params={}))
+
+    run(main())
+
+
+def test_pull_read_timeout():
+    class Handler(sensebook.PullHandler):
+        def next_request(self):
+            params = super().next_request().params
+            return sensebook.PullRequest(params=params, read_timeout=0.05)
+
+    async def main():
+        async with StubServer() as server:
+            server.responses = [1.0]
+            assert [] == await sensebook.aio.pull(Handler(), server.pool)
+
+    run(main())
+
+
+def test_encode_body():
+    request = sensebook.GraphQLBatchRequest(queries={}, form={"a": "b"})
+    head, body = sensebook.aio.ConnectionPool()._encode(request, {}).split(b"\r\n\r\n")
+    assert head.startswith(b"POST /api/graphqlbatch/ HTTP/1.1\r\n")
+    assert b"Content-Length: %d" % len(request.body) in head
+    assert body == request.body
+
+
+@mark.raises(exception=sensebook.aio.ConnectTimeout)
+def test_connect_timeout():
+    async def main():
+        async with StubServer() as server:
+            request = sensebook.PullRequest(params={}, connect_timeout=0.0)
+            await server.pool.request(request)
+
+    run(main())
+
+
+class Stop(Exception):
+    pass
+
+
+def test_run(monkeypatch):
+    frames = []
+
+    async def on_frame(frame):
+        frames.append(frame)
+        if len(frames) == 3:
+            raise Stop
+
+    async def main():
+        async with StubServer() as server:
+            server.responses = [
+                response(b'{"t": "msg", "ms": [1]}'),
+                response(b'{"t": "unknown"}'),
+                response(b'{"t": "backoff"}'),
+                response(b'{"t": "msg", "ms": [2, 3]}'),
+            ]
+            errors = []
+            sleeps = []
+
+            async def sleep(delay):
+                sleeps.append(delay)
+
+            monkeypatch.setattr(sensebook.aio.asyncio, "sleep", sleep)
+            try:
+                await sensebook.aio.run(
+                    sensebook.PullHandler(),
+                    server.pool,
+                    on_frame=on_frame,
+                    on_error=errors.append,
+                )
+            except Stop:
+                pass
+            monkeypatch.undo()
+            assert len(errors) == 1
+            # The `backoff`, and after the error
+            assert len(sleeps) == 2
+            assert sleeps[0] >= 5
+
+    run(main())
+    assert frames == [1, 2, 3]
+
+
+@mark.parametrize("incremental", [False, True])
+@mark.parametrize("fault", ["malformed", "invalid_unicode", "no_json"])
+def test_run_malformed_memory(monkeypatch, fault, incremental):
+    # Errors kept by `on_error` mustn't keep the bodies alive, so the heap stays
+    # bounded during a stream of malformed bodies
+    errors = []
+    traced = []
+
+    def on_error(error):
+        errors.append(error)
+        if len(errors) in (10, 40):
+            gc.collect()
+            traced.append(tracemalloc.get_traced_memory()[0])
+        if len(errors) == 40:
+            raise Stop
+
+    # Don't back off after the errors
+    monkeypatch.setattr(sensebook.Backoff, "max_time", 0)
+
+    async def main():
+        async with sensebook.testing.FakePullServer(
+            faults={fault: 1.0}, payload_size=20000
+        ) as server:
+            pool = server.connection_pool()
+            handler = sensebook.PullHandler(incremental=incremental)
+            try:
+                await sensebook.aio.run(handler, pool, on_frame=None, on_error=on_error)
+            finally:
+                pool.close()
+
+    tracemalloc.start()
+    try:
+        with raises(Stop):
+            run(main())
+    finally:
+        tracemalloc.stop()
+    assert errors[-1].size > 10000
+    # A kept error takes about 3 KiB, or more than 20 KiB if it keeps the body
+    assert traced[1] - traced[0] < 30 * 8 * 1024
@@ -0,0 +1,117 @@
+import attr
+import os
+import sensebook
+from pytest import fixture, mark
+
+
+@attr.s(slots=True, kw_only=True)
+class State(sensebook.State):
+    _cookies = attr.ib()
+
+    @property
+    def cookies(self):
+        return self._cookies
+
+
+def make_data(revision="1", created=1000.0):
+    return sensebook.StateData(
+        revision=revision, fb_dtsg="AB:CD", cookies={"c_user": "1234"}, created=created
+    )
+
+
+def test_state_data_from_state():
+    state = State(revision="1", fb_dtsg="AB:CD", cookies={"c_user": "1234"})
+    data = sensebook.StateData.from_state(state, created=1000.0)
+    assert data == make_data()
+
+
+def test_state_data_dump_load():
+    data = make_data()
+    assert sensebook.StateData.load(data.dump()) == data
+
+
+@mark.parametrize("raw", [b"", b"[1, 2]", b'[2, "1", "AB:CD", {}, 1000.0]', b"\xff"])
+@mark.raises(exception=ValueError)
+def test_state_data_load_invalid(raw):
+    sensebook.StateData.load(raw)
+
+
+@fixture(params=["file", "sqlite"])
+def make_cache(request, tmp_path, clock):
+    clock.now = 1000.0
+
+    def make_cache(**kwargs):
+        if request.param == "file":
+            cache = sensebook.FileStateCache(
+                directory=str(tmp_path / "states"), clock=clock, **kwargs
+            )
+        else:
+            cache = sensebook.SQLiteStateCache(
+                path=str(tmp_path / "states.db"), clock=clock, **kwargs
+            )
+        return cache
+
+    return make_cache
+
+
+def test_cache_get_set(make_cache):
+    cache = make_cache()
+    assert cache.get("a") is None
+    cache.set("a", make_data())
+    assert cache.get("a") == make_data()
+    # Persisted
+    assert make_cache().get("a") == make_data()
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+
+def test_cache_ttl(make_cache):
+    cache = make_cache(ttl=60)
+    cache.set("a", make_data())
+    cache.clock.now += 59
+    assert cache.get("a") == make_data()
+    cache.clock.now += 1
+    assert cache.get("a") is None
+
+
+def test_cache_lru(make_cache):
+    cache = make_cache(max_entries=2)
+    for key in "abc":
+        if key == "c":
+            cache.get("a")  # Makes `b` the least recently used
+        cache.clock.now += 1
+        cache.set(key, make_data(key))
+        cache.clock.now += 1
+    assert cache.get("a") == make_data("a")
+    assert cache.get("b") is None
+    assert cache.get("c") == make_data("c")
+
+
+def test_cache_validate(make_cache):
+    cache = make_cache(validate=lambda data: data.revision != "stale")
+    cache.set("a", make_data("stale"))
+    assert cache.get("a") is None
+    assert cache.get_or_create("a", lambda: make_data("fresh")) == make_data("fresh")
+    assert cache.get_or_create("a", lambda: make_data("other")) == make_data("fresh")
+
+
+@mark.skipif(os.name != "posix", reason="Unix permissions")
+def test_cache_permissions(make_cache, tmp_path):
+    cache = make_cache()
+    cache.set("a", make_data())
+    for path in tmp_path.glob("**/*"):
+        mode = 0o700 if path.is_dir() else 0o600
+        assert path.stat().st_mode & 0o777 == mode
+
+
+def test_file_cache_evicts_occasionally(tmp_path, monkeypatch):
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+    cache = sensebook.FileStateCache(directory=str(tmp_path), max_entries=100)
+    for i in range(300):
+        cache.set(str(i), make_data())
+        assert len(os.listdir(str(tmp_path))) <= 100
+    assert len(scans) <= 30
+    assert cache.get("299") == make_data()
+    assert cache.get("0") is None
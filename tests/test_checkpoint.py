@@ -0,0 +1,36 @@
+import sensebook
+from pytest import mark
+
+
+def test_dump_load_checkpoints():
+    snapshots = {"a": b"1", "æ": b"[1, 2]", "": b""}
+    data = sensebook.dump_checkpoints(snapshots.items())
+    assert sensebook.load_checkpoints(data) == snapshots
+
+
+@mark.parametrize("data", [b"", b"XXXX\x01\x00\x00\x00\x00\x00"])
+@mark.raises(exception=ValueError, message="Invalid")
+def test_load_checkpoints_invalid(data):
+    sensebook.load_checkpoints(data)
+
+
+@mark.raises(exception=ValueError, message="Truncated")
+def test_load_checkpoints_truncated():
+    sensebook.load_checkpoints(sensebook.dump_checkpoints([("a", b"123")])[:-1])
+
+
+@mark.raises(exception=ValueError, message="Unknown checkpoint version")
+def test_load_checkpoints_version():
+    sensebook.load_checkpoints(b"SBCP\x02\x00\x00\x00\x00\x00")
+
+
+def test_write_restore_checkpoints(tmp_path):
+    path = str(tmp_path / "checkpoints")
+    handlers = {str(i): sensebook.PullHandler(seq=i) for i in range(100)}
+    sensebook.write_checkpoints(path, handlers)
+    assert len(sensebook.read_checkpoints(path)) == 100
+
+    restored = {str(i): sensebook.PullHandler() for i in range(50, 150)}
+    assert sensebook.restore_checkpoints(path, restored) == 50
+    assert restored["50"] == handlers["50"]
+    assert restored["100"]._seq == 0
@@ -0,0 +1,149 @@
+import json
+import pytest
+import sensebook
+from pytest import fixture, mark
+
+MESSAGE = {
+    "type": "delta",
+    "delta": {
+        "class": "NewMessage",
+        "body": "Hi",
+        "messageMetadata": {
+            "actorFbId": "1234",
+            "threadKey": {"otherUserFbId": "5678"},
+            "timestamp": "1542333064162",
+        },
+    },
+}
+GROUP_MESSAGE = {
+    "type": "delta",
+    "delta": {
+        "class": "NewMessage",
+        "messageMetadata": {
+            "actorFbId": "1234",
+            "threadKey": {"threadFbId": "9999"},
+            "timestamp": "1542333065162",
+        },
+    },
+}
+READ_RECEIPT = {
+    "type": "delta",
+    "delta": {
+        "class": "ReadReceipt",
+        "actorFbId": "1234",
+        "threadKey": {"otherUserFbId": "5678"},
+        "actionTimestampMs": "1542333066162",
+    },
+}
+TYPING = {"type": "typ", "from": 1234, "st": 1, "to": 5678}
+
+
+@fixture
+def columns():
+    return sensebook.FrameColumns(batch_size=4, payloads=True, clock=lambda: 1000.0)
+
+
+def test_extend(columns):
+    frames = [MESSAGE, GROUP_MESSAGE, READ_RECEIPT]
+    assert columns.extend(frames, source="a") == []
+    assert len(columns) == 3
+    batch = columns.flush()
+    assert len(columns) == 0
+    assert columns.flush() is None
+    assert batch.sources == ("a",)
+    assert list(batch.source) == [0, 0, 0]
+    codes = sensebook.TYPE_CODES
+    assert list(batch.type_code) == [
+        codes["NewMessage"],
+        codes["NewMessage"],
+        codes["ReadReceipt"],
+    ]
+    assert list(batch.timestamp) == [1542333064162, 1542333065162, 1542333066162]
+    assert list(batch.thread_id) == [5678, 9999, 5678]
+    assert list(batch.actor_id) == [1234, 1234, 1234]
+    assert [json.loads(batch.payload_at(i)) for i in range(3)] == frames
+
+
+def test_extend_unknown():
+    columns = sensebook.FrameColumns(payloads=True, clock=lambda: 1000.0)
+    frames = [TYPING, {"type": "new_type"}, {"type": "delta", "delta": {}}, 1, None]
+    assert columns.extend(frames) == []
+    batch = columns.flush()
+    codes = sensebook.TYPE_CODES
+    assert list(batch.type_code) == [codes["typ"], 0, codes["delta"], 0, 0]
+    # Frames without a timestamp get the time they were added
+    assert list(batch.timestamp) == [1000000] * 5
+    assert list(batch.thread_id) == [1234, 0, 0, 0, 0]
+    assert list(batch.actor_id) == [1234, 0, 0, 0, 0]
+    assert batch.payload_at(3) == b"1"
+    assert batch.payload_at(4) == b""
+
+
+def test_invalid_ids(columns):
+    frame = {"type": "typ", "from": "abc", "thread_fbid": str(2 ** 64)}
+    columns.extend([frame])
+    batch = columns.flush()
+    assert list(batch.actor_id) == [0]
+    assert list(batch.thread_id) == [0]
+
+
+def test_invalid_thread_key(columns):
+    metadata = dict(MESSAGE["delta"]["messageMetadata"], threadKey="5678")
+    frame = {
+        "type": "delta",
+        "delta": {"class": "NewMessage", "messageMetadata": metadata},
+    }
+    columns.extend([MESSAGE, frame])
+    batch = columns.flush()
+    assert list(batch.thread_id) == [5678, 0]
+    assert list(batch.actor_id) == [1234, 1234]
+
+
+def test_unencodable_payload(columns):
+    with pytest.raises(TypeError):
+        columns.extend([MESSAGE, {"type": "typ", "from": object()}])
+    batch = columns.flush()
+    assert len(batch) == 1
+    assert list(batch.payload_offsets) == [0, len(batch.payload)]
+
+
+def test_batches(columns):
+    batches = columns.extend([MESSAGE] * 3, source="a")
+    batches += columns.extend([TYPING] * 3, source="b")
+    assert [len(batch) for batch in batches] == [4]
+    assert list(batches[0].source) == [0, 0, 0, 1]
+    assert batches[0].sources == ("a", "b")
+    batch = columns.flush()
+    assert list(batch.source) == [1, 1]
+    assert list(batch.payload_offsets)[0] == 0
+    assert batch.payload_at(1) == json.dumps(TYPING, separators=(",", ":")).encode()
+
+
+def test_typed_frames(columns):
+    frames = [sensebook.wrap_frame(MESSAGE), sensebook.wrap_frame(TYPING)]
+    columns.extend(frames)
+    batch = columns.flush()
+    assert list(batch.thread_id) == [5678, 1234]
+
+
+def test_without_payloads():
+    columns = sensebook.FrameColumns()
+    columns.extend([MESSAGE, TYPING])
+    batch = columns.flush()
+    assert batch.payload == b""
+    assert list(batch.payload_offsets) == [0, 0, 0]
+
+
+@mark.raises(exception=ValueError, message="batch_size")
+def test_invalid_batch_size():
+    sensebook.FrameColumns(batch_size=0)
+
+
+def test_to_numpy(columns):
+    numpy = pytest.importorskip("numpy")
+    columns.extend([MESSAGE, TYPING])
+    batch = columns.flush()
+    arrays = batch.to_numpy()
+    assert arrays["timestamp"].dtype == numpy.int64
+    assert arrays["thread_id"].tolist() == [5678, 1234]
+    assert arrays["payload"].nbytes == len(batch.payload)
@@ -0,0 +1,93 @@
+import random
+import sensebook
+from pytest import fixture
+
+
+@fixture
+def coordinator(clock):
+    return sensebook.BackoffCoordinator(
+        rate=10,
+        burst=5,
+        failure_threshold=3,
+        reset_timeout=30,
+        clock=clock,
+        rng=random.Random(0),
+    )
+
+
+def test_token_bucket(coordinator, clock):
+    assert [coordinator.acquire("a") for _ in range(5)] == [0] * 5
+    delay = coordinator.acquire("a")
+    assert 0.1 <= delay <= 0.6
+    assert coordinator.acquire("b") == 0  # Groups are independent
+    clock.now += 0.1
+    assert coordinator.acquire("a") == 0
+
+
+def test_circuit_breaker(coordinator, clock):
+    coordinator.failure("a")
+    coordinator.failure("a")
+    assert not coordinator.is_open("a")
+    coordinator.failure("a")
+    assert coordinator.is_open("a")
+    assert 30 <= coordinator.acquire("a") <= 30.5
+
+    # Half open, the bucket refills from empty
+    clock.now = 30
+    assert not coordinator.is_open("a")
+    assert coordinator.acquire("a") > 0
+    clock.now = 30.1
+    assert coordinator.acquire("a") == 0
+
+    # Failing while half open opens the circuit again
+    coordinator.failure("a")
+    assert coordinator.is_open("a")
+
+    clock.now = 60
+    coordinator.success("a")
+    assert not coordinator.is_open("a")
+    clock.now = 61
+    assert coordinator.acquire("a") == 0
+
+
+def test_failure_decorrelated_jitter(coordinator):
+    delay = 0.0
+    for _ in range(20):
+        previous, delay = delay, coordinator.failure("a", delay)
+        assert 1 <= delay <= max(1, previous * 3)
+        assert delay <= 320
+    assert delay > 60
+
+
+def test_pull_handler(coordinator, clock):
+    handler = sensebook.PullHandler(coordinator=coordinator, sticky_pool="a")
+    key = (sensebook.PullRequest.host, "a")
+    for _ in range(3):
+        try:
+            list(handler.handle(503, b""))
+        except sensebook.Backoff as e:
+            assert 1 <= e.delay <= 320
+    assert coordinator.is_open(key)
+
+    try:
+        handler.next_request()
+    except sensebook.Backoff as e:
+        assert e.delay >= 30
+    else:
+        assert False, "Not throttled"
+
+    clock.now = 31
+    handler.next_request()
+    list(handler.handle(200, b'for(;;);{"t": "heartbeat"}'))
+    assert not coordinator.is_open(key)
+    assert handler._failure_delay == 0
+
+
+def test_multiplexer(coordinator):
+    mux = sensebook.PullMultiplexer()
+    for i in range(10):
+        handler = sensebook.PullHandler(coordinator=coordinator)
+        mux.add(i, handler, now=0)
+    assert len(mux.ready(now=0)) == 5
+    assert mux.in_flight == 5
+    assert 0 < mux.next_deadline() < 1
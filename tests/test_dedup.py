@@ -0,0 +1,70 @@
+import sensebook
+from pytest import fixture, mark
+
+
+def delta(mid=None, otid=None):
+    return {
+        "delta": {"messageMetadata": {"messageId": mid, "offlineThreadingId": otid}}
+    }
+
+
+@mark.parametrize(
+    "frame, key",
+    [
+        (delta("mid.1", "123"), "mid.1"),
+        (delta(None, "123"), "123"),
+        (delta(), None),
+        ({"delta": {}}, None),
+        ({"type": "typ"}, None),
+        (1, None),
+    ],
+)
+def test_frame_key(frame, key):
+    assert sensebook.frame_key(frame) == key
+
+
+def test_deduplicator():
+    dedup = sensebook.Deduplicator()
+    frames = [delta("a"), delta("b"), delta("a"), {"type": "typ"}, {"type": "typ"}]
+    assert list(dedup.filter(frames)) == frames[:2] + frames[3:]
+    assert dedup.duplicates == 1
+
+
+def test_deduplicator_bounded():
+    dedup = sensebook.Deduplicator(max_size=10)
+    for i in range(1000):
+        assert not dedup.seen(delta(str(i)))
+    assert len(dedup) == 10
+    assert dedup.seen(delta("999"))
+    assert not dedup.seen(delta("0"))
+
+
+def test_deduplicator_lru():
+    dedup = sensebook.Deduplicator(max_size=2)
+    dedup.seen(delta("a"))
+    dedup.seen(delta("b"))
+    dedup.seen(delta("a"))  # `b` is now the oldest
+    dedup.seen(delta("c"))
+    assert dedup.seen(delta("a"))
+    assert not dedup.seen(delta("b"))
+
+
+def test_record_seq():
+    dedup = sensebook.Deduplicator()
+    dedup.record_seq(1, 2)
+    dedup.record_seq(2, 2)
+    assert dedup.seq_regressions == 0
+    dedup.record_seq(2, 0)
+    assert dedup.seq_regressions == 1
+
+
+def test_handler_dedup():
+    handler = sensebook.PullHandler(dedup=sensebook.Deduplicator())
+    data = {"t": "msg", "seq": 5, "ms": [delta("a"), delta("b")]}
+    assert len(list(handler.handle_data(data))) == 2
+    data = {"t": "fullReload", "seq": 1, "ms": [delta("b"), delta("c")]}
+    assert list(handler.handle_data(data)) == [delta("c")]
+    data = {"t": "batched", "batches": [{"t": "msg", "seq": 0, "ms": [delta("c")]}]}
+    assert list(handler.handle_data(data)) == []
+    assert handler.dedup.duplicates == 2
+    assert handler.dedup.seq_regressions == 2
@@ -0,0 +1,93 @@
+import datetime
+import sensebook
+from pytest import mark
+
+NEW_MESSAGE = {
+    "type": "delta",
+    "delta": {
+        "class": "NewMessage",
+        "body": "abc",
+        "messageMetadata": {
+            "actorFbId": "1234",
+            "messageId": "mid.$abc",
+            "threadKey": {"threadFbId": "5678"},
+            "timestamp": "1542333064162",
+        },
+    },
+}
+TYPING = {"type": "typ", "from": 1234, "st": 1, "to": 5678}
+
+
+@mark.parametrize(
+    "raw, cls, kind",
+    [
+        (NEW_MESSAGE, sensebook.NewMessage, "NewMessage"),
+        (TYPING, sensebook.Typing, "typ"),
+        ({"type": "delta", "delta": {"class": "X"}}, sensebook.DeltaFrame, "X"),
+        ({"type": "delta"}, sensebook.Frame, "delta"),
+        ({"type": "x"}, sensebook.Frame, "x"),
+    ],
+)
+def test_wrap_frame(raw, cls, kind):
+    frame = sensebook.wrap_frame(raw)
+    assert type(frame) is cls
+    assert frame.kind == kind
+    assert frame.raw is raw
+
+
+def test_wrap_frame_not_dict():
+    assert sensebook.wrap_frame(1) == 1
+
+
+def test_new_message():
+    frame = sensebook.wrap_frame(NEW_MESSAGE)
+    assert frame.message_id == "mid.$abc"
+    assert frame.author_id == "1234"
+    assert frame.thread_id == "5678"
+    assert frame.is_group
+    assert frame.text == "abc"
+    assert frame.attachments == []
+    assert frame.timestamp == datetime.datetime(2018, 11, 16, 1, 51, 4, 162000)
+
+
+def test_lazy():
+    frame = sensebook.Typing({"type": "typ", "st": 0})
+    assert frame.is_typing is False
+    assert not hasattr(frame, "_author_id")
+
+
+@mark.raises(exception=sensebook.ProtocolError, message="Could not decode author_id")
+def test_lazy_invalid():
+    sensebook.Typing({"type": "typ"}).author_id
+
+
+def test_compact():
+    frame = sensebook.wrap_frame(TYPING).compact()
+    assert frame.raw is None
+    assert frame.kind == "typ"
+    assert frame.author_id == "1234"
+    assert frame.is_typing
+    assert repr(frame) == "Typing(author_id='1234', is_typing=True)"
+
+    other = {"type": "x"}
+    assert sensebook.wrap_frame(other).compact().raw is other
+
+
+def test_wrap_frames():
+    frames = [NEW_MESSAGE, TYPING, 1, {"type": "x"}]
+    assert [type(f) for f in sensebook.wrap_frames(frames)] == [
+        sensebook.NewMessage,
+        sensebook.Typing,
+        int,
+        sensebook.Frame,
+    ]
+    assert [f.raw for f in sensebook.wrap_frames(frames, {sensebook.Typing})] == [
+        TYPING
+    ]
+
+
+def test_pull_handler_typed_frames():
+    handler = sensebook.PullHandler(typed_frames=True)
+    data = {"t": "msg", "ms": [NEW_MESSAGE, TYPING]}
+    frames = list(handler.handle_data(data))
+    assert [type(f) for f in frames] == [sensebook.NewMessage, sensebook.Typing]
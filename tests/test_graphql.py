@@ -0,0 +1,125 @@
+import json
+import sensebook
+import urllib.parse
+from pytest import mark, raises
+
+
+def test_batcher_coalesces():
+    batcher = sensebook.GraphQLBatcher(max_batch_size=2, form={"fb_dtsg": "abc"})
+    batcher.catch_up("1", limit=10)
+    batcher.catch_up("2")
+    batcher.catch_up("1", limit=5)
+    batcher.catch_up("3")
+    assert len(batcher) == 3
+    requests = batcher.requests()
+    assert len(batcher) == 0
+    assert [list(request.queries) for request in requests] == [["1", "2"], ["3"]]
+    assert requests[0].queries["1"].params["message_limit"] == 10
+    assert requests[0].form == {"fb_dtsg": "abc"}
+
+
+def test_batcher_separate_windows():
+    batcher = sensebook.GraphQLBatcher()
+    batcher.catch_up("1", before=100)
+    batcher.catch_up("1", before=1000)
+    batcher.catch_up("1", before=1000, limit=30)
+    batcher.catch_up("1", before=100, limit=10)
+    batcher.catch_up("2")
+    batcher.catch_up("2", before=100)
+    [request] = batcher.requests()
+    windows = {
+        key: (query.params["before"], query.params["message_limit"])
+        for key, query in request.queries.items()
+    }
+    assert windows == {
+        "1": (100, 20),
+        ("1", 1000): (1000, 30),
+        "2": (None, 20),
+        ("2", 100): (100, 20),
+    }
+    assert request.queries["1", 1000].params["id"] == "1"
+
+
+@mark.raises(exception=ValueError, message="max_batch_size")
+def test_batcher_invalid_size():
+    sensebook.GraphQLBatcher(max_batch_size=0)
+
+
+def test_request_body():
+    query = sensebook.GraphQLQuery(doc_id="123", params={"id": "1"})
+    request = sensebook.GraphQLBatchRequest(
+        queries={"a": query, "b": sensebook.thread_messages_query("2")},
+        form={"fb_dtsg": "abc"},
+    )
+    assert request.method == "POST"
+    assert request.url == "https://www.facebook.com/api/graphqlbatch/"
+    form = urllib.parse.parse_qs(request.body.decode("ascii"))
+    assert form["fb_dtsg"] == ["abc"]
+    assert form["batch_name"] == ["MessengerGraphQLThreadFetcher"]
+    queries = json.loads(form["queries"][0])
+    assert queries["q0"] == {"doc_id": "123", "query_params": {"id": "1"}}
+    assert queries["q1"]["query_params"]["id"] == "2"
+    assert request.names == {"q0": "a", "q1": "b"}
+
+
+BODY = (
+    b'for (;;);{"q0":{"response":{"message_thread":{"id":"1"}}}}\r\n'
+    b'{"q1":{"error":1357004,"errorSummary":"Sorry"}}\r\n'
+    b'{"q2":{"data":{"message_thread":{"id":"3"}}}}\r\n'
+    b'{"successful_results":2,"error_results":1,"skipped_results":0}'
+)
+
+
+def make_request(n):
+    return sensebook.GraphQLBatchRequest(
+        queries={str(i + 1): sensebook.thread_messages_query(str(i)) for i in range(n)}
+    )
+
+
+def test_parse_batch_response():
+    names = [name for name, _ in sensebook.parse_batch_response(BODY)]
+    assert names == ["q0", "q1", "q2"]
+
+
+def test_parse():
+    result = make_request(3).parse(BODY)
+    assert result.responses == {
+        "1": {"message_thread": {"id": "1"}},
+        "3": {"message_thread": {"id": "3"}},
+    }
+    assert result.errors == {"2": {"error": 1357004, "errorSummary": "Sorry"}}
+
+
+@mark.raises(
+    exception=sensebook.ProtocolError, message="Missing queries in response: q3"
+)
+def test_parse_missing():
+    make_request(4).parse(BODY)
+
+
+@mark.raises(exception=sensebook.ProtocolError, message="Unknown query")
+def test_parse_unknown():
+    make_request(2).parse(BODY)
+
+
+@mark.parametrize(
+    "body, message",
+    [
+        (BODY[: BODY.rindex(b"{")], "ended early"),
+        (BODY[:-5], "Invalid JSON"),
+        (b'for (;;);{"error":1357001,"errorSummary":"Not logged in"}', "Batch failed"),
+        (b"for (;;);", "No JSON object"),
+        (b"for (;;);[]", "No JSON object"),
+    ],
+)
+def test_parse_batch_response_invalid(body, message):
+    with raises(sensebook.ProtocolError, match=message):
+        list(sensebook.parse_batch_response(body))
+
+
+@mark.parametrize("body", [BODY[:-5], BODY[:-5] + b"\xff"])
+def test_parse_batch_response_drops_document(body):
+    with raises(sensebook.ProtocolError) as excinfo:
+        list(sensebook.parse_batch_response(body))
+    cause = excinfo.value.__cause__
+    assert not getattr(cause, "doc", getattr(cause, "object", b""))
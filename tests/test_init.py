@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import sensebook
+from pytest import mark
+
+
+def test_pull_does_not_import_bs4():
+    code = """
+import sys, sensebook
+handler = sensebook.PullHandler()
+list(handler.handle(200, b'for(;;);{"t": "msg", "ms": [1]}'))
+handler.next_request().url
+assert "bs4" not in sys.modules
+assert "sensebook._login" not in sys.modules
+assert "sqlite3" not in sys.modules
+"""
+    subprocess.check_call([sys.executable, "-c", code])
+
+
+def test_lazy_attributes():
+    assert sensebook.LoginError is sensebook._login.LoginError
+    assert "LoginError" in dir(sensebook)
+
+
+@mark.raises(exception=AttributeError, message="no attribute 'unknown'")
+def test_unknown_attribute():
+    sensebook.unknown
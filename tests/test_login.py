@@ -26,8 +26,7 @@ def test_get_fb_dtsg(html, rev):
     assert sensebook._login.get_fb_dtsg(html) == rev
 
 
-def test_get_form_data():
-    html = """
+FORM_HTML = """
     <form method="post" action="https://m.facebook.com/login/..." class="be bf" id="login_form" novalidate="1">
         <input type="hidden" name="lsd" value="ABC" autocomplete="off" />
         <input type="hidden" name="jazoest" value="123" autocomplete="off" />
@@ -65,11 +64,14 @@ def test_get_form_data():
             <input type="hidden" name="_fb_noscript" value="true" />
         </noscript>
     </form>
-    """
+"""
+
+
+def test_get_form_data():
     email = "<email>"
     password = "<password>"
 
-    method, url, data = sensebook._login.get_form_data(html, email, password)
+    method, url, data = sensebook._login.get_form_data(FORM_HTML, email, password)
 
     assert method == "post"
     assert url == "https://m.facebook.com/login/..."
@@ -90,3 +92,57 @@ def test_get_form_data():
 @mark.raises(exception=sensebook.LoginError)
 def test_invalid_form_data():
     sensebook._login.get_form_data("invalid", None, None)
+
+
+@mark.parametrize(
+    "html",
+    [
+        FORM_HTML,
+        '<form action="/a"><input name="a" value="&amp;"></form><form action="/b">',
+        '<div><FORM ACTION="/a" METHOD="post"><input name="a" value></form></div>',
+        '<form action="/a"><form><input name="a" value="1"></form>'
+        '<input name="b" value="2"></form><input name="c" value="3">',
+    ],
+)
+def test_extract_form(html):
+    assert sensebook.extract_form(html) == sensebook.parse_form(html)
+
+
+@mark.parametrize("html", ["invalid", "<form><input name='a' value='1'></form>"])
+@mark.raises(exception=ValueError, message="Could not find")
+def test_extract_form_invalid(html):
+    sensebook.extract_form(html)
+
+
+TOKENS_HTML = """
+<script>{"server_revision":123,"client_revision":456,...}</script>
+<input type="hidden" name="fb_dtsg" value="12:34" />
+<script>{"content":"<input name=\\"h\\" value=\\"abc\\">"}</script>
+"""
+
+
+@mark.parametrize(
+    "html",
+    [
+        TOKENS_HTML,
+        # Tokens can't span multiple lines, so the second occurrence is used
+        '"client_revision":\n1,"client_revision":2,' + TOKENS_HTML,
+        TOKENS_HTML + 'name="fb_dtsg" value="other"',
+    ],
+)
+def test_get_tokens(html):
+    assert sensebook._login.get_tokens(html) == {
+        "revision": sensebook._login.get_revision(html),
+        "fb_dtsg": sensebook._login.get_fb_dtsg(html),
+        "logout_h": sensebook._login.get_logout_h(html),
+    }
+
+
+def test_get_tokens_subset():
+    assert {"fb_dtsg": "12:34"} == sensebook._login.get_tokens(TOKENS_HTML, ["fb_dtsg"])
+
+
+@mark.parametrize("html", ["invalid", '"client_revision":\n1,' + TOKENS_HTML[60:]])
+@mark.raises(exception=sensebook.LoginError, message="revision")
+def test_get_tokens_missing(html):
+    sensebook._login.get_tokens(html)
@@ -0,0 +1,68 @@
+import sensebook
+from pytest import fixture, mark
+
+
+@fixture
+def metrics():
+    return sensebook.InMemoryMetrics(buckets=(0.1, 1.0))
+
+
+def test_counters(metrics):
+    metrics.increment("a")
+    metrics.increment("a", 2)
+    metrics.increment("a", labels={"x": "1", "y": "2"})
+    metrics.increment("a", labels={"y": "2", "x": "1"})
+    assert metrics.counter("a") == 3
+    assert metrics.counter("a", {"x": "1", "y": "2"}) == 2
+    assert metrics.counter("b") == 0
+
+
+def test_to_prometheus(metrics):
+    metrics.increment("a_total", labels={"type": 'quote"d'})
+    metrics.observe("b_seconds", 0.05)
+    metrics.observe("b_seconds", 0.5)
+    metrics.observe("b_seconds", 5)
+    assert metrics.to_prometheus() == (
+        "# TYPE a_total counter\n"
+        'a_total{type="quote\\"d"} 1\n'
+        "# TYPE b_seconds histogram\n"
+        'b_seconds_bucket{le="0.1"} 1\n'
+        'b_seconds_bucket{le="1.0"} 2\n'
+        'b_seconds_bucket{le="+Inf"} 3\n'
+        "b_seconds_sum 5.55\n"
+        "b_seconds_count 3\n"
+    )
+
+
+def test_handler_metrics(metrics):
+    handler = sensebook.PullHandler(metrics=metrics)
+    body = (
+        b'for(;;);{"t": "batched", "batches": [{"t": "lb", "lb_info": {"sticky": "1"'
+        b', "pool": "a"}}, {"t": "msg", "ms": [1, 2]}]}'
+    )
+    assert [1, 2] == list(handler.handle(200, body))
+    try:
+        handler.handle_connect_timeout()
+    except sensebook.Backoff:
+        pass
+
+    assert metrics.counter("sensebook_pull_responses_total", {"status": "200"}) == 1
+    assert metrics.counter("sensebook_pull_bytes_total") == len(body)
+    assert metrics.counter("sensebook_parse_body_bytes_total") == len(body)
+    for type_ in ["batched", "lb", "msg"]:
+        assert metrics.counter("sensebook_pull_frames_total", {"type": type_}) == 1
+    assert metrics.counter("sensebook_pull_sticky_token_changes_total") == 1
+    assert metrics.counter("sensebook_pull_sticky_pool_changes_total") == 1
+    labels = {"reason": "Connection lost"}
+    assert metrics.counter("sensebook_pull_backoffs_total", labels) == 1
+    assert "sensebook_parse_body_seconds_count 1" in metrics.to_prometheus()
+    assert "sensebook_pull_backoff_delay_seconds_sum" in metrics.to_prometheus()
+
+
+def test_handler_metrics_stream(metrics):
+    handler = sensebook.PullHandler(stream=True, metrics=metrics)
+    chunks = [b'for(;;);{"t": "heartbeat"}for(;;);{"t": "heartb', b'eat"}']
+    for chunk in chunks:
+        list(handler.feed(chunk))
+    assert metrics.counter("sensebook_pull_bytes_total") == sum(map(len, chunks))
+    assert metrics.counter("sensebook_pull_frames_total", {"type": "heartbeat"}) == 2
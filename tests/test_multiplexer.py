@@ -0,0 +1,110 @@
+import sensebook
+from pytest import fixture, mark, raises
+
+
+@fixture
+def mux():
+    return sensebook.PullMultiplexer()
+
+
+def test_ready(mux):
+    handlers = [sensebook.PullHandler() for _ in range(3)]
+    for i, handler in enumerate(handlers):
+        mux.add(i, handler, now=i)
+    assert len(mux) == 3
+    assert mux.next_deadline() == 0
+
+    ready = mux.ready(now=1)
+    assert [key for key, _ in ready] == [0, 1]
+    assert ready[0][1].params["clientid"] == handlers[0]._clientid
+    assert mux.in_flight == 2
+    assert mux.ready(now=1) == []
+    assert mux.next_deadline() == 2
+
+
+@mark.raises(exception=ValueError, message="already added")
+def test_add_twice(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.add("a", sensebook.PullHandler(), now=0)
+
+
+def test_remove(mux):
+    handler = sensebook.PullHandler()
+    mux.add("a", handler, now=0)
+    mux.add("b", sensebook.PullHandler(), now=1)
+    assert mux.remove("a") is handler
+    assert "a" not in mux
+    assert mux.next_deadline() == 1
+    assert [key for key, _ in mux.ready(now=1)] == ["b"]
+
+
+def test_handle(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.ready(now=0)
+    body = b'for(;;);{"t": "msg", "seq": 2, "ms": [1, 2]}'
+    assert mux.handle("a", 200, body, now=5) == [1, 2]
+    assert mux["a"]._seq == 2
+    assert mux.next_deadline() == 5
+
+
+def test_handle_backoff(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.ready(now=0)
+    assert mux.handle("a", 503, b"", now=10) == []
+    assert mux.next_deadline() == 70
+    assert mux.ready(now=69) == []
+
+
+def test_handle_batched_backoff(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.ready(now=0)
+    body = b'{"t": "batched", "batches": [{"t": "msg", "ms": [1]}, {"t": "backoff"}]}'
+    assert mux.handle("a", 200, body, now=0) == [1]
+    assert mux.next_deadline() > 5
+
+
+@mark.raises(exception=sensebook.ProtocolError)
+def test_handle_protocol_error(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.ready(now=0)
+    try:
+        mux.handle("a", 500, b"", now=3)
+    finally:
+        assert 8 <= mux.next_deadline() <= 10.5
+
+
+def test_handle_consecutive_errors(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    now = 0
+    for delay in (5, 10, 20):
+        mux.ready(now=now)
+        with raises(sensebook.ProtocolError):
+            mux.handle("a", 200, b"for(;;);{", now=now)
+        assert now + delay <= mux.next_deadline() <= now + delay * 1.5
+        now = mux.next_deadline()
+    mux.ready(now=now)
+    mux.handle("a", 200, b'for(;;);{"t": "heartbeat"}', now=now)
+    assert mux.next_deadline() == now
+    mux.ready(now=now)
+    with raises(sensebook.ProtocolError):
+        mux.handle("a", 200, b"for(;;);{", now=now)
+    assert mux.next_deadline() <= now + 7.5
+
+
+@mark.raises(exception=ValueError, message="No request in flight")
+def test_handle_not_in_flight(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.handle_read_timeout("a", now=0)
+
+
+def test_handle_timeouts(mux):
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.ready(now=0)
+    mux.handle_read_timeout("a", now=1)
+    assert mux.next_deadline() == 1
+    mux.ready(now=1)
+    mux.handle_connect_timeout("a", now=2)
+    assert mux.next_deadline() == 62
+    mux.ready(now=62)
+    mux.handle_connection_error("a", now=62)
+    assert mux.next_deadline() > 62
@@ -0,0 +1,63 @@
+import concurrent.futures
+import sensebook
+from pytest import fixture, mark
+
+BODY = b'for(;;);{"t": "msg", "seq": 3, "ms": [' + b"1, " * 1000 + b"2]}"
+
+
+@fixture(scope="module")
+def offloader():
+    offloader = sensebook.ParseOffloader(
+        executor=concurrent.futures.ProcessPoolExecutor(1), threshold=1024
+    )
+    yield offloader
+    offloader.close()
+
+
+def test_wants(offloader, monkeypatch):
+    monkeypatch.setattr(
+        sensebook._utils, "_json_backend", sensebook.JSON_BACKENDS["json"]
+    )
+    handler = sensebook.PullHandler()
+    assert offloader.wants(handler, 200, BODY)
+    assert not offloader.wants(handler, 200, b'for(;;);{"t": "heartbeat"}')
+    assert not offloader.wants(handler, 500, BODY)
+    assert not offloader.wants(sensebook.PullHandler(stream=True), 200, BODY)
+
+
+@mark.skipif("orjson" not in sensebook.JSON_BACKENDS, reason="orjson not installed")
+def test_wants_not_with_orjson(offloader, monkeypatch):
+    monkeypatch.setattr(
+        sensebook._utils, "_json_backend", sensebook.JSON_BACKENDS["orjson"]
+    )
+    assert not offloader.wants(sensebook.PullHandler(), 200, BODY)
+
+
+def test_parse(offloader):
+    data = offloader.parse(BODY).result()
+    assert data["seq"] == 3
+    assert len(data["ms"]) == 1001
+
+
+@mark.raises(exception=sensebook.ProtocolError, message="Invalid JSON data")
+def test_parse_invalid(offloader):
+    offloader.parse(b"for(;;);{" + b" " * 2000).result()
+
+
+def test_handle_parsed():
+    metrics = sensebook.InMemoryMetrics()
+    handler = sensebook.PullHandler(metrics=metrics)
+    data = sensebook._pull_handler.parse_body(BODY)
+    assert len(list(handler.handle_parsed(200, data, size=len(BODY)))) == 1001
+    assert handler._seq == 3
+    assert metrics.counter("sensebook_pull_bytes_total") == len(BODY)
+
+
+def test_multiplexer_handle_parsed():
+    mux = sensebook.PullMultiplexer()
+    mux.add("a", sensebook.PullHandler(), now=0)
+    mux.ready(now=0)
+    data = {"t": "msg", "seq": 3, "ms": [1, 2]}
+    assert mux.handle_parsed("a", 200, data, now=1) == [1, 2]
+    assert mux["a"]._seq == 3
+    assert mux.next_deadline() == 1
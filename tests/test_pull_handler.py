@@ -1,5 +1,6 @@
+import hashlib
 import sensebook
-from pytest import fixture, mark, param
+from pytest import fixture, mark, param, raises
 
 
 @fixture
@@ -42,16 +43,59 @@ def test_parse_body():
     assert sensebook._pull_handler.parse_body(b'for(;;);{"a":2}') == {"a": 2}
 
 
-@mark.raises(exception=sensebook.ProtocolError)
-def test_parse_body_invalid_unicode():
-    sensebook._pull_handler.parse_body(bytes([255, 255]))
+@mark.parametrize("body", [bytes([255, 255]), b'for(;;);{"a": "\xff"}'])
+@mark.raises(exception=sensebook.ProtocolError, message="Invalid unicode")
+def test_parse_body_invalid_unicode(body):
+    sensebook._pull_handler.parse_body(body)
 
 
-@mark.raises(exception=sensebook.ProtocolError)
+@mark.raises(exception=sensebook.ProtocolError, message="Invalid JSON")
 def test_parse_body_invalid_json():
     sensebook._pull_handler.parse_body(b"invalid JSON")
 
 
+def test_protocol_error_small_data():
+    error = sensebook.ProtocolError("Bad", {"t": "abc"})
+    assert error.type == "abc"
+    assert error.data == {"t": "abc"}
+    assert error.preview == '{"t": "abc"}'
+    assert error.size == len(error.preview)
+    assert error.sample_path is None
+
+
+def test_protocol_error_bounded():
+    body = b"x" * 10000
+    error = sensebook.ProtocolError("Bad", body)
+    assert error.data is None
+    assert error.preview == "x" * sensebook.ProtocolError.max_preview
+    assert error.size == 10000
+    assert error.digest == hashlib.sha256(body).hexdigest()
+
+
+def test_protocol_error_sample(monkeypatch, tmp_path):
+    monkeypatch.setattr(sensebook.ProtocolError, "sample_dir", str(tmp_path))
+    body = b"x" * 10000
+    error = sensebook.ProtocolError("Bad", body)
+    assert error.sample_path == str(tmp_path / (error.digest + ".bin"))
+    assert (tmp_path / (error.digest + ".bin")).read_bytes() == body
+    monkeypatch.setattr(sensebook.ProtocolError, "sample_rate", 0.0)
+    assert sensebook.ProtocolError("Bad", body).sample_path is None
+
+
+def test_protocol_error_clear_frames():
+    body = b"for(;;);{" + b"x" * 10000
+    with raises(sensebook.ProtocolError) as excinfo:
+        sensebook._pull_handler.parse_body(body)
+    error = excinfo.value
+    assert error.__cause__.doc == ""
+    error.clear_frames()
+    tb = error.__traceback__.tb_next  # Skip this test's own, running frame
+    assert tb is not None
+    while tb is not None:
+        assert "body" not in tb.tb_frame.f_locals
+        tb = tb.tb_next
+
+
 @mark.raises(exception=sensebook.ProtocolError, message="Unknown")
 def test_handle_unknown_data_type(handler):
     handler.handle_data({"t": "unknown"})
@@ -64,9 +108,23 @@ def test_handle_type_backoff(handler):
 
 def test_handle_type_batched(handler, mocker):
     m = mocker.spy(sensebook.PullHandler, "handle_data")
-    data = {"t": "batched", "batches": [{"t": "msg", "ms": []}, {"t": "msg", "ms": []}]}
-    list(handler.handle_data(data))
-    assert m.call_count == 3
+    data = {
+        "t": "batched",
+        "batches": [
+            {"t": "msg", "seq": 1, "ms": [1]},
+            {"t": "batched", "batches": [{"t": "msg", "seq": 2, "ms": [2]}]},
+            {"t": "msg", "seq": 3, "ms": [3]},
+        ],
+    }
+    assert [1, 2, 3] == list(handler.handle_data(data))
+    assert handler._seq == 3
+    # The batches are dispatched iteratively
+    assert m.call_count == 1
+
+
+@mark.raises(exception=sensebook.ProtocolError, message="Unknown")
+def test_handle_type_batched_unknown(handler):
+    list(handler.handle_data({"t": "batched", "batches": [{"t": "unknown"}]}))
 
 
 @mark.raises(exception=sensebook.ProtocolError, message="Unused")
@@ -113,6 +171,36 @@ def test_handle_type_test_streaming(handler):
     handler.handle_data({"t": "test_streaming"})
 
 
+def test_type_handlers():
+    table = sensebook.PullHandler.type_handlers()
+    assert table["msg"] is sensebook.PullHandler._handle_type_msg
+    assert table["refreshDelay"] is sensebook.PullHandler._handle_type_refresh
+    assert sensebook.PullHandler.type_handlers() is table
+
+
+def test_register_type_handler():
+    class Handler(sensebook.PullHandler):
+        pass
+
+    class SubHandler(Handler):
+        def _handle_type_custom(self, data):
+            return ["overridden"]
+
+    assert Handler.type_handlers()
+    assert SubHandler.type_handlers()
+
+    @Handler.register_type_handler("custom")
+    def handle_custom(handler, data):
+        return [data["value"]]
+
+    Handler.register_type_handler("test_streaming", lambda handler, data: None)
+
+    assert [1] == list(Handler().handle_data({"t": "custom", "value": 1}))
+    assert [] == list(Handler().handle_data({"t": "test_streaming"}))
+    assert ["overridden"] == list(SubHandler().handle_data({"t": "custom"}))
+    assert "custom" not in sensebook.PullHandler.type_handlers()
+
+
 def test_request():
     params = {
         "clientid": "deadbeef",
@@ -129,6 +217,23 @@ def test_request():
     assert request.params == params
 
 
+def test_next_request_template():
+    handler = sensebook.PullHandler(clientid="a b", sticky_token=None, seq=1)
+    request = handler.next_request()
+    assert request.template is not None
+    assert request.url == sensebook.build_url(
+        host=request.host, target=request.target, params=request.params
+    )
+    assert request.url_bytes == request.url.encode("ascii")
+
+    handler.handle_data({"t": "lb", "lb_info": {"sticky": "1234", "pool": "abc"}})
+    request = handler.next_request()
+    assert "sticky_token=1234&sticky_pool=abc" in request.url
+    assert request.url == sensebook.build_url(
+        host=request.host, target=request.target, params=request.params
+    )
+
+
 @mark.raises(exception=sensebook.Backoff)
 def test_handle_connection_error(handler):
     handler.handle_connection_error()
@@ -147,3 +252,133 @@ def test_handle(handler):
     assert [1, 2, 3] == list(
         handler.handle(200, b'for(;;);{"t": "msg", "ms": [1, 2, 3]}')
     )
+
+
+def test_request_stream():
+    handler = sensebook.PullHandler(stream=True)
+    request = handler.next_request()
+    assert request.params["mode"] == "stream"
+    assert request.params["format"] == "json"
+
+
+@mark.parametrize(
+    "body",
+    [
+        b'for(;;);{"t": "msg", "seq": 1, "ms": [1, {"a": "]} \\" ,"}, [2]]}',
+        b'for(;;);{"ms": [1, {"a": "]} \\" ,"}, [2]], "seq": 1, "t": "msg"}',
+        b'for(;;);{"t":"batched","batches":[{"t":"msg","ms":[1],"seq":1},'
+        b'{"t":"batched","batches":[{"t":"msg","seq":2,"ms":[{"a":"\xc3\xa6"}]}]},'
+        b'{"seq":3,"t":"msg","ms":[]}]}',
+        b'for(;;);\n{ "t" : "fullReload" , "ms" : [ ] , "seq" : 4 }\n',
+        b'for(;;);{"t": "heartbeat"}',
+        b'for(;;);{"t": "msg", "seq": 1, "ms": [{"a": [1]}, 2], "x": [3], "y": 5}',
+        b'for(;;);{"t":"batched","batches":[{"t":"msg","ms":[1],"seq":1},'
+        b'{"t":"msg","seq":2,"ms":[2,[3]],"x":{}},{"t":"msg","seq":3,"ms":[4]}]}',
+    ],
+)
+def test_handle_incremental(body):
+    expected = sensebook.PullHandler()
+    handler = sensebook.PullHandler(incremental=True)
+    assert list(expected.handle(200, body)) == list(handler.handle(200, body))
+    assert expected._seq == handler._seq
+    assert expected._backoff_tries == handler._backoff_tries
+
+
+@mark.parametrize(
+    "body, message",
+    [
+        (b"for(;;);", "Invalid JSON data"),
+        (b'for(;;);{"t": "msg", "ms": [1, 2', "Invalid JSON data"),
+        (b'for(;;);{"t": "msg", "ms": [1 2]}', "Invalid JSON data"),
+        (b'for(;;);{"t": "msg", "ms": ["\xff"]}', "Invalid unicode data"),
+    ],
+)
+def test_handle_incremental_invalid(body, message):
+    handler = sensebook.PullHandler(incremental=True)
+    with raises(sensebook.ProtocolError, match=message):
+        list(handler.handle(200, body))
+
+
+def test_handle_incremental_lazy():
+    handler = sensebook.PullHandler(incremental=True)
+    frames = handler.handle(200, b'for(;;);{"t": "msg", "seq": 1, "ms": [1, 2}')
+    # The frames are decoded as they're consumed, so the error comes after them
+    assert next(frames) == 1
+    with raises(sensebook.ProtocolError, match="Invalid JSON data"):
+        next(frames)
+
+
+def test_handle_incremental_invalid_data():
+    handler = sensebook.PullHandler(incremental=True)
+    with raises(ValueError, match="invalid literal"):
+        list(handler.handle(200, b'for(;;);{"t": "msg", "seq": "a", "ms": [1]}'))
+
+
+STREAM_BODY = (
+    b'for(;;);{"t": "msg", "seq": 1, "ms": [{"text": "a \\" } {"}]}'
+    b'for(;;);{"t": "heartbeat"}'
+    b'for(;;);{"t": "msg", "seq": 3, "ms": [{"text": "\\\\"}, 2]}'
+)
+
+
+@mark.parametrize("size", [1, 2, 7, len(STREAM_BODY)])
+def test_feed(size):
+    handler = sensebook.PullHandler(stream=True)
+    frames = []
+    for i in range(0, len(STREAM_BODY), size):
+        frames.extend(handler.feed(STREAM_BODY[i : i + size]))
+    frames.extend(handler.end())
+    assert frames == [{"text": 'a " } {'}, {"text": "\\"}, 2]
+    assert handler._seq == 3
+
+
+def test_stream_reset_after_error():
+    handler = sensebook.PullHandler(stream=True)
+    body = (
+        b'for(;;);{"t":"unknown"}for(;;);{"t":"msg","ms":["stale"]}'
+        b'for(;;);{"t":"msg","ms":["x"'
+    )
+    with raises(sensebook.ProtocolError, match="Unknown protocol message"):
+        list(handler.handle(200, body))
+    body = b'for(;;);{"t":"msg","seq":2,"ms":["fresh"]}'
+    assert list(handler.handle(200, body)) == ["fresh"]
+    with raises(sensebook.ProtocolError, match="Unknown protocol message"):
+        list(handler.feed(body.replace(b"msg", b"unknown") + b'for(;;);{"t":'))
+    assert list(handler.feed(body)) == ["fresh"]
+    assert list(handler.end()) == []
+
+
+def test_feed_unconsumed(handler):
+    handler.feed(b'for(;;);{"t": "msg", "ms": [1]}')
+    assert [1, 2] == list(handler.feed(b'for(;;);{"t": "msg", "ms": [2]}'))
+
+
+@mark.raises(exception=sensebook.ProtocolError, message="Stream ended")
+def test_end_incomplete(handler):
+    list(handler.feed(b'for(;;);{"t": "msg", "ms": [1'))
+    list(handler.end())
+
+
+def test_handle_stream():
+    handler = sensebook.PullHandler(stream=True)
+    assert [{"text": 'a " } {'}, {"text": "\\"}, 2] == list(
+        handler.handle(200, STREAM_BODY)
+    )
+
+
+def test_snapshot_restore():
+    handler = sensebook.PullHandler(
+        clientid="deadbeef", sticky_token=1234, sticky_pool="abc", seq=6
+    )
+    handler._backoff_tries = 2
+    restored = sensebook.PullHandler()
+    restored.restore(handler.snapshot())
+    assert restored == handler
+
+
+@mark.parametrize(
+    "snapshot", [b"", b"[]", b'{"a": 1}', b'[2, "a", null, null, 0, 0]', b"[1, 2]"]
+)
+@mark.raises(exception=ValueError)
+def test_restore_invalid(handler, snapshot):
+    handler.restore(snapshot)
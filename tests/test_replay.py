@@ -0,0 +1,107 @@
+import sensebook
+from pytest import mark
+
+BODY = b'for(;;);{"t": "msg", "seq": 1, "ms": [1, 2, 3]}'
+
+
+def record(path, responses):
+    times = iter(range(100))
+    recorder = sensebook.Recorder(
+        handler=sensebook.PullHandler(), path=path, clock=lambda: next(times)
+    )
+    for status_code, body in responses:
+        recorder.next_request()
+        try:
+            list(recorder.handle(status_code, body))
+        except (sensebook.Backoff, sensebook.ProtocolError):
+            pass
+    recorder.close()
+    return recorder
+
+
+def test_recorder(tmp_path):
+    path = str(tmp_path / "recording")
+    recorder = record(path, [(200, BODY), (503, b"")])
+    assert recorder._seq == 1  # Delegated to the handler
+    record(path, [(500, b"abc")])  # Appends
+
+    with open(path, "rb") as f:
+        records = list(sensebook.iter_recording(f.read()))
+    assert [(r.sent, r.received, r.status_code) for r in records] == [
+        (0, 1, 200),
+        (2, 3, 503),
+        (0, 1, 500),
+    ]
+    assert [bytes(r.body) for r in records] == [BODY, b"", b"abc"]
+
+
+def test_recorder_stream(tmp_path):
+    path = str(tmp_path / "recording")
+    recorder = sensebook.Recorder(
+        handler=sensebook.PullHandler(stream=True), path=path, clock=lambda: 1
+    )
+    recorder.next_request()
+    assert list(recorder.feed(BODY[:20])) == []
+    assert list(recorder.feed(BODY[20:])) == [1, 2, 3]
+    assert list(recorder.end()) == []
+    recorder.close()
+    with open(path, "rb") as f:
+        [record] = sensebook.iter_recording(f.read())
+    assert (record.status_code, bytes(record.body)) == (200, BODY)
+
+
+@mark.raises(exception=TypeError, message="Can't record parsed data")
+def test_recorder_handle_parsed(tmp_path):
+    recorder = sensebook.Recorder(
+        handler=sensebook.PullHandler(), path=str(tmp_path / "recording")
+    )
+    recorder.handle_parsed(200, {"t": "heartbeat"})
+
+
+def test_iter_recording_truncated(tmp_path):
+    path = str(tmp_path / "recording")
+    record(path, [(200, BODY), (200, BODY)])
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(list(sensebook.iter_recording(data[:-1]))) == 1
+
+
+@mark.parametrize("data", [b"", b"XXXX\x01\x00"])
+@mark.raises(exception=ValueError, message="Invalid")
+def test_iter_recording_invalid(data):
+    list(sensebook.iter_recording(data))
+
+
+@mark.raises(exception=ValueError, message="Unknown recording version")
+def test_iter_recording_version():
+    list(sensebook.iter_recording(b"SBRC\x02\x00"))
+
+
+def test_replay(tmp_path):
+    path = str(tmp_path / "recording")
+    record(path, [(200, BODY), (503, b""), (200, b"for(;;);{"), (200, BODY)])
+    handlers = [sensebook.PullHandler(), sensebook.PullHandler(stream=True)]
+    frames = []
+    stats = sensebook.replay(path, handlers, on_frame=frames.append)
+    assert stats.records == 4
+    assert stats.frames == 12
+    assert frames == [1, 2, 3] * 4
+    assert stats.backoffs == 2
+    assert stats.errors == 2
+    assert stats.frames_per_second > 0
+
+
+def test_replay_paced(tmp_path):
+    path = str(tmp_path / "recording")
+    record(path, [(200, BODY)] * 3)  # Received at 1, 3 and 5
+    sleeps = []
+    stats = sensebook.replay(
+        path,
+        [sensebook.PullHandler()],
+        paced=True,
+        speed=2,
+        clock=lambda: 0,
+        sleep=sleeps.append,
+    )
+    assert stats.records == 3
+    assert sleeps == [1, 2]
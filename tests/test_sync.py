@@ -0,0 +1,161 @@
+import http.server
+import socketserver
+import threading
+import time
+import pytest
+import sensebook
+from pytest import fixture, mark
+
+requests = pytest.importorskip("requests")
+import sensebook.sync
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        response = self.server.responses.pop(0) if self.server.responses else 0.2
+        if isinstance(response, float):
+            time.sleep(response)
+            response = b'for(;;);{"t": "heartbeat"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    # Like `http.server.ThreadingHTTPServer`, which needs Python 3.7
+    daemon_threads = True
+
+
+@fixture
+def server():
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    server.responses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@fixture
+def pool():
+    pool = sensebook.sync.SessionPool(max_connections=2)
+    yield pool
+    pool.close()
+
+
+def make_handler(server):
+    port = server.server_address[1]
+
+    class Request(sensebook.PullRequest):
+        host = "127.0.0.1:{}".format(port)
+
+        @property
+        def url(self):
+            return super().url.replace("https", "http")
+
+    class Handler(sensebook.PullHandler):
+        def next_request(self):
+            return Request(params=super().next_request().params, read_timeout=0.1)
+
+    return Handler()
+
+
+def test_pull(server, pool):
+    server.responses = [b'for(;;);{"t": "msg", "seq": 1, "ms": [1, 2]}']
+    handler = make_handler(server)
+    assert [1, 2] == list(sensebook.sync.pull(handler, pool))
+    assert handler._seq == 1
+    assert server.requests[0].startswith("/pull?clientid=")
+
+
+def test_pull_read_timeout(server, pool):
+    server.responses = [0.5]
+    assert [] == list(sensebook.sync.pull(make_handler(server), pool))
+
+
+@mark.raises(exception=sensebook.Backoff)
+def test_pull_connection_error(server, pool):
+    handler = make_handler(server)
+    server.shutdown()
+    server.server_close()
+    sensebook.sync.pull(handler, pool)
+
+
+def test_saturation(pool):
+    assert pool.saturation() == 0
+    assert pool.peak == 0
+    assert pool.overflows == 0
+
+
+def test_run_many(server, pool):
+    server.responses = [
+        b'for(;;);{"t": "msg", "ms": [1]}',
+        b'for(;;);{"t": "unknown"}',
+        b'for(;;);{"t": "msg", "ms": [2]}',
+    ]
+    handlers = {i: make_handler(server) for i in range(3)}
+    frames = []
+    errors = []
+    stop = threading.Event()
+
+    def on_frame(key, frame):
+        frames.append(frame)
+        if len(frames) == 2 and errors:
+            stop.set()
+
+    def on_error(key, e):
+        errors.append(e)
+        if len(frames) == 2:
+            stop.set()
+
+    sensebook.sync.run_many(
+        handlers, pool, on_frame=on_frame, on_error=on_error, stop=stop
+    )
+    assert sorted(frames) == [1, 2]
+    assert len(errors) == 1
+    assert 0 < pool.peak <= 2
+
+
+def test_run_many_offloader(server, pool, monkeypatch):
+    import concurrent.futures
+
+    # Nothing is offloaded with orjson
+    monkeypatch.setattr(
+        sensebook._utils, "_json_backend", sensebook.JSON_BACKENDS["json"]
+    )
+
+    server.responses = [
+        b'for(;;);{"t": "msg", "seq": 3, "ms": [' + b"1, " * 1000 + b"2]}",
+        b"for(;;);{" + b" " * 2000,
+    ]
+    handler = make_handler(server)
+    frames = []
+    errors = []
+    stop = threading.Event()
+
+    def on_error(key, e):
+        errors.append(e)
+        stop.set()
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        offloader = sensebook.ParseOffloader(executor=executor, threshold=1024)
+        sensebook.sync.run_many(
+            {"a": handler},
+            pool,
+            on_frame=lambda key, frame: frames.append(frame),
+            on_error=on_error,
+            stop=stop,
+            offloader=offloader,
+        )
+    assert len(frames) == 1001
+    assert handler._seq == 3
+    assert str(errors[0]) == "Invalid JSON data"
@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+import sensebook
+import sensebook.aio
+import sensebook.testing
+from pytest import mark, raises
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def pull_all(n, **kwargs):
+    """Pull `n` times from a fresh server, and return the results and the server."""
+
+    async def main():
+        async with sensebook.testing.FakePullServer(seed=0, **kwargs) as server:
+            handler = sensebook.PullHandler()
+            pool = server.connection_pool()
+            results = []
+            try:
+                for _ in range(n):
+                    try:
+                        results.append(await sensebook.aio.pull(handler, pool))
+                    except sensebook.Backoff as e:
+                        results.append(e)
+            finally:
+                pool.close()
+            return results, handler, server
+
+    return run(main())
+
+
+def test_protocol():
+    results, handler, server = pull_all(3, frames_per_response=2, payload_size=10)
+    assert results[0] == []  # `lb`
+    assert handler._sticky_pool == "fake_chat-proxy1"
+    assert [frame["iseq"] for frame in results[1] + results[2]] == [1, 2, 3, 4]
+    assert len(results[1][0]["delta"]["body"]) == 10
+    assert "sent" in results[1][0]
+    assert handler._seq == 4
+    assert server.requests == 3
+    assert server.responses == {"lb": 1, "msg": 2}
+
+
+def test_batched():
+    results, handler, server = pull_all(2, batched=1.0, batch_size=2)
+    assert [frame["iseq"] for frame in results[1]] == [1, 2]
+    assert handler._seq == 2
+    assert server.responses["batched"] == 1
+
+
+@mark.parametrize(
+    "fault,result",
+    [
+        ("heartbeat", []),
+        ("fullReload", []),
+        ("backoff", sensebook.Backoff),
+        ("503", sensebook.Backoff),
+        ("drop", sensebook.Backoff),
+    ],
+)
+def test_faults(fault, result):
+    results, handler, server = pull_all(2, faults={fault: 1.0})
+    if isinstance(result, type):
+        assert isinstance(results[1], result)
+    else:
+        assert results[1] == result
+    # A dropped keep-alive connection is retried once on a new connection
+    assert server.responses[fault] == (2 if fault == "drop" else 1)
+
+
+def test_fault_lb():
+    results, handler, server = pull_all(2, faults={"lb": 1.0})
+    assert handler._sticky_pool == "fake_chat-proxy2"
+
+
+def test_fault_seq_reset():
+    results, handler, server = pull_all(4, faults={"seq_reset": 0.5})
+    assert server.responses["seq_reset"] > 0
+    assert handler._seq == results[-1][-1]["iseq"]
+
+
+def test_fault_stall():
+    async def main():
+        async with sensebook.testing.FakePullServer(
+            faults={"stall": 1.0}, stall_time=10
+        ) as server:
+            handler = sensebook.PullHandler()
+            pool = server.connection_pool()
+            await sensebook.aio.pull(handler, pool)  # `lb`
+            params = handler.next_request().params
+            request = sensebook.PullRequest(params=params, read_timeout=0.05)
+            with raises(sensebook.aio.ReadTimeout):
+                await pool.request(request)
+            pool.close()
+        # Closing the server doesn't wait for the held request
+
+    run(main())
+
+
+@mark.raises(exception=ValueError, message="Unknown faults: nope")
+def test_unknown_fault():
+    sensebook.testing.FakePullServer(faults={"nope": 1.0})
+
+
+def test_in_thread():
+    requests = pytest.importorskip("requests")
+    import sensebook.sync
+
+    server = sensebook.testing.FakePullServer(frames_per_response=3)
+    with server.in_thread():
+        pool = sensebook.sync.SessionPool(max_connections=1)
+        handler = server.handler()
+        assert list(sensebook.sync.pull(handler, pool)) == []
+        frames = list(sensebook.sync.pull(handler, pool))
+        assert [frame["iseq"] for frame in frames] == [1, 2, 3]
+        pool.close()
+    assert server.responses == {"lb": 1, "msg": 1}
+
+
+def test_parse_fault():
+    assert sensebook.testing._parse_fault("503=0.5") == ("503", 0.5)
+    assert sensebook.testing._parse_fault("drop") == ("drop", 1.0)
@@ -0,0 +1,104 @@
+import sensebook
+from pytest import fixture
+
+
+@fixture
+def timeouts(clock):
+    return sensebook.AdaptiveTimeouts(clock=clock)
+
+
+def test_defaults_until_enough_samples(timeouts):
+    timeouts.observe_hold(1)
+    timeouts.observe_hold(1)
+    timeouts.observe_connect(0.1)
+    assert timeouts.read_timeout == 60
+    assert timeouts.connect_timeout == 10
+
+
+def test_adapts_to_slowest_hold(timeouts):
+    for seconds in (0.5, 1, 0.5):
+        timeouts.observe_connect(seconds)
+    assert timeouts.connect_timeout == 3
+    for seconds in (48, 50, 49):
+        timeouts.observe_hold(seconds)
+    # The hold, and a margin of 2 seconds and two round trips
+    assert timeouts.read_timeout == 54
+
+
+def test_short_holds(timeouts):
+    # E.g. a proxy closing idle connections after 20 seconds
+    for _ in range(3):
+        timeouts.observe_hold(20)
+        timeouts.observe_connect(0.1)
+    assert timeouts.read_timeout == 22.2
+
+
+def test_bounds(timeouts):
+    for _ in range(3):
+        timeouts.observe_hold(0.1)
+        timeouts.observe_connect(0.01)
+    assert timeouts.read_timeout == 5
+    assert timeouts.connect_timeout == 1
+    for _ in range(3):
+        timeouts.observe_hold(100)
+        timeouts.observe_connect(100)
+    assert timeouts.read_timeout == 60
+    assert timeouts.connect_timeout == 10
+
+
+def test_window_forgets_old_samples(clock):
+    timeouts = sensebook.AdaptiveTimeouts(window=5, clock=clock)
+    timeouts.observe_hold(30)
+    for _ in range(5):
+        timeouts.observe_hold(10)
+    assert timeouts.read_timeout == 12
+
+
+def test_timeout_widens(timeouts):
+    for _ in range(3):
+        timeouts.observe_hold(10)
+        timeouts.observe_connect(1)
+    assert timeouts.read_timeout == 14
+    timeouts.read_timed_out()
+    assert timeouts.read_timeout == 32
+    timeouts.connect_timed_out()
+    assert timeouts.connect_timeout == 6
+
+
+def test_pull_handler(timeouts, clock):
+    handler = sensebook.PullHandler(timeouts=timeouts)
+    for seconds in (48, 50, 49):
+        request = handler.next_request()
+        assert request.read_timeout == 60
+        assert request.connect_timeout == 10
+        clock.now += seconds
+        list(handler.handle(200, b'{"t": "heartbeat"}'))
+        handler.observe_connect(0.5)
+    request = handler.next_request()
+    assert request.read_timeout == 53
+    assert request.connect_timeout == 1.5
+    handler.handle_read_timeout()
+    assert handler.next_request().read_timeout == 60
+
+
+def test_pull_handler_burst_then_idle_poll(timeouts, clock):
+    handler = sensebook.PullHandler(timeouts=timeouts)
+    for _ in range(3):
+        handler.next_request()
+        clock.now += 50
+        list(handler.handle(200, b'{"t": "heartbeat"}'))
+    for seq in range(1, 31):
+        handler.next_request()
+        clock.now += 0.1
+        body = '{{"t": "msg", "seq": {}, "ms": [{{}}]}}'.format(seq)
+        list(handler.handle(200, body.encode()))
+    # The idle poll after the burst is held ~50 seconds again
+    assert handler.next_request().read_timeout == 52
+
+
+def test_pull_handler_without_timeouts():
+    handler = sensebook.PullHandler()
+    handler.observe_connect(0.5)
+    request = handler.next_request()
+    assert request.read_timeout == 60
+    assert request.connect_timeout == 10
@@ -13,6 +13,26 @@ def test_build_url():
     )
 
 
+@mark.parametrize(
+    "params",
+    [
+        {},
+        {"seq": 5},
+        {"a": "x y", "seq": 5, "b": None, "c": b"\xff&", "d": 1.5},
+        {"seq": "5", "e": "æ"},
+    ],
+)
+def test_request_template(params):
+    template = sensebook.RequestTemplate("example.com", "/path", params, ["seq"])
+    url = sensebook.build_url(host="example.com", target="/path", params=params)
+    assert template.url(params) == url
+    assert template.url_bytes(params) == url.encode("ascii")
+    if "seq" in params:
+        params = dict(params, seq=6)
+        url = sensebook.build_url(host="example.com", target="/path", params=params)
+        assert template.url(params) == url
+
+
 def test_strip_json_cruft():
     assert sensebook.strip_json_cruft('for(;;);{"a":2}') == '{"a":2}'
 
@@ -22,6 +42,40 @@ def test_strip_json_cruft_invalid():
     sensebook.strip_json_cruft("not really json")
 
 
+def test_strip_json_cruft_bytes():
+    assert bytes(sensebook.strip_json_cruft_bytes(b'for(;;);{"a":2}')) == b'{"a":2}'
+
+
+@mark.raises(exception=ValueError, message="No JSON object found")
+def test_strip_json_cruft_bytes_invalid():
+    sensebook.strip_json_cruft_bytes(b"not really json")
+
+
+@fixture(params=list(sensebook.JSON_BACKENDS))
+def json_backend(request):
+    sensebook.set_json_backend(request.param)
+    yield request.param
+    sensebook.set_json_backend(None)
+
+
+@mark.parametrize("data", ['{"a": "\u00e6"}', b'{"a": "\xc3\xa6"}'])
+def test_load_json(json_backend, data):
+    assert sensebook.load_json(data) == {"a": "\u00e6"}
+    if isinstance(data, bytes):
+        assert sensebook.load_json(memoryview(data)) == {"a": "\u00e6"}
+
+
+@mark.parametrize("data", ["invalid", b"{", b'{"a": "\xff"}', b'{"a": "\xed\xa0\x80"}'])
+@mark.raises(exception=ValueError)
+def test_load_json_invalid(json_backend, data):
+    sensebook.load_json(data)
+
+
+@mark.raises(exception=ValueError, message="not available")
+def test_set_json_backend_unknown():
+    sensebook.set_json_backend("unknown")
+
+
 def test_time_from_millis():
     dt = datetime.datetime(2018, 11, 16, 1, 51, 4, 162000)
     assert sensebook.time_from_millis(1542333064162) == dt